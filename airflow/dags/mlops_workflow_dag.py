@@ -5,12 +5,12 @@ import subprocess
 
 
 def run_etl():
-    subprocess.run(['python', 'etl/data_ingestion.py'], check=True)
-    subprocess.run(['python', 'etl/data_preprocessing.py'], check=True)
+    # Fused ingestion + preprocessing; writes only data/processed.parquet
+    subprocess.run(['python', 'etl/pipeline.py', '--cache'], check=True)
 
 
 def run_training():
-    subprocess.run(['python', 'training/train_model.py'], check=True)
+    subprocess.run(['python', 'training/train_model.py', '--cache'], check=True)
 
 
 def run_deployment():
@@ -0,0 +1,141 @@
+"""
+ETL backend benchmark: pandas vs Arrow for ingestion and preprocessing.
+
+For each row count, writes a synthetic CSV (with duplicate and incomplete
+rows to clean), then runs ``load_data`` and ``preprocess_data`` with each
+backend in a fresh process, recording wall time per stage and peak resident
+memory. The two backends' outputs are compared value for value.
+
+    python benchmarks/etl_backends.py --rows 1000000 10000000 100000000 --output backends.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pyarrow.parquet as pq
+
+# Add repository root to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl.synthetic import SyntheticSpec, generate
+
+BACKENDS = ('pandas', 'arrow')
+
+CHUNK_ROWS = 1_000_000
+
+# Event-like data: two float features, a count, a category and a target,
+# with 1% of rows repeated and 1% missing feature1
+EVENT_FEATURES = [
+    {'name': 'feature1', 'distribution': 'normal', 'mean': 50, 'std': 10, 'null_rate': 0.01},
+    {'name': 'feature2', 'distribution': 'normal', 'mean': 75, 'std': 15, 'decimals': 2},
+    {'name': 'count', 'distribution': 'integer', 'low': 0, 'high': 1000},
+    {'name': 'region', 'distribution': 'category', 'values': ['north', 'south', 'east', 'west']},
+]
+
+
+def write_synthetic_csv(path: str, rows: int, seed: int = 0):
+    spec = SyntheticSpec(rows, seed=seed, features=EVENT_FEATURES, duplicate_rate=0.01,
+                         target={'function': 'none', 'noise': 1.0})
+    generate(spec, path)
+
+
+def _run_backend(backend: str, source: str, work_dir: str, queue):
+    from etl.data_ingestion import load_data
+    from etl.data_preprocessing import preprocess_data
+
+    ingested = os.path.join(work_dir, backend, 'ingested.parquet')
+    processed = os.path.join(work_dir, backend, 'processed.parquet')
+    start = time.perf_counter()
+    load_data(source, ingested, backend=backend)
+    ingest_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    preprocess_data(ingested, processed, backend=backend)
+    queue.put({
+        'ingest_seconds': ingest_seconds,
+        'preprocess_seconds': time.perf_counter() - start,
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    })
+
+
+def outputs_match(work_dir: str, rtol: float = 1e-12) -> bool:
+    """Same rows, in the same order, with values equal to ``rtol``"""
+    pandas_file = pq.ParquetFile(os.path.join(work_dir, 'pandas', 'processed.parquet'))
+    arrow_file = pq.ParquetFile(os.path.join(work_dir, 'arrow', 'processed.parquet'))
+    if pandas_file.metadata.num_rows != arrow_file.metadata.num_rows:
+        return False
+    columns = pandas_file.schema_arrow.names
+    batches = zip(pandas_file.iter_batches(CHUNK_ROWS, columns=columns),
+                  arrow_file.iter_batches(CHUNK_ROWS, columns=columns))
+    for left, right in batches:
+        for name in columns:
+            a = left.column(name).to_numpy(zero_copy_only=False)
+            b = right.column(name).to_numpy(zero_copy_only=False)
+            if a.dtype.kind == 'f' or b.dtype.kind == 'f':
+                if not np.allclose(a, b, rtol=rtol, atol=rtol):
+                    return False
+            elif not np.array_equal(a, b):
+                return False
+    return True
+
+
+def run(row_counts, work_dir: str = None) -> dict:
+    """
+    Benchmark both backends at every row count
+
+    Returns:
+        Mapping of row count to per-backend measurements, input size and
+        whether the outputs match
+    """
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for rows in row_counts:
+        with tempfile.TemporaryDirectory(dir=work_dir) as scratch:
+            source = os.path.join(scratch, 'raw.csv')
+            write_synthetic_csv(source, rows)
+            result = {'csv_bytes': os.path.getsize(source)}
+            for backend in BACKENDS:
+                queue = context.Queue()
+                process = context.Process(target=_run_backend, args=(backend, source, scratch, queue))
+                process.start()
+                process.join()
+                result[backend] = queue.get() if process.exitcode == 0 else {'failed': process.exitcode}
+            completed = all('failed' not in result[b] for b in BACKENDS)
+            result['outputs_match'] = outputs_match(scratch) if completed else None
+            results[rows] = result
+    return results
+
+
+def print_results(results: dict):
+    header = f"{'rows':>12}{'backend':>9}{'ingest s':>10}{'preprocess s':>14}{'peak MB':>9}"
+    print(header)
+    print('-' * len(header))
+    for rows, result in results.items():
+        for backend in BACKENDS:
+            r = result[backend]
+            if 'failed' in r:
+                print(f"{rows:>12,}{backend:>9}  failed (exit code {r['failed']})")
+                continue
+            print(f"{rows:>12,}{backend:>9}{r['ingest_seconds']:>10.2f}"
+                  f"{r['preprocess_seconds']:>14.2f}{r['peak_rss_mb']:>9.0f}")
+        print(f"{'':>12}outputs match: {result['outputs_match']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 10_000_000, 100_000_000])
+    parser.add_argument('--work-dir', help='Scratch directory for the CSV and outputs')
+    parser.add_argument('--output', help='Write results as JSON to this path')
+    args = parser.parse_args()
+
+    results = run(args.rows, args.work_dir)
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
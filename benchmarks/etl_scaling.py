@@ -0,0 +1,290 @@
+"""
+ETL scaling benchmark: throughput and peak memory across data sizes and cores.
+
+Runs each ETL stage (``load_data``, ``preprocess_data``), both in sequence,
+and the fused streaming ``run_pipeline`` over a ladder of dataset sizes and
+core counts. Every run gets a fresh process pinned to that many cores, with
+Arrow's thread pool sized to match, and records wall time, rows/sec, peak
+resident memory and the bytes it read and wrote (at the system call level,
+from ``/proc/self/io``). Inputs come from ``etl/synthetic.py`` with the same
+spec as ``etl_backends.py``.
+
+    python benchmarks/etl_scaling.py run --rows 100000 1000000 10000000 --cores 1 4 --output results.json
+    python benchmarks/etl_scaling.py compare baseline.json results.json
+
+``compare`` lists every run in both files and exits with status 1 if any of
+them got slower or used more memory than the tolerances allow, or if a run
+failed or a run measured in the baseline is missing from the results.
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+# Add repository root to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.etl_backends import write_synthetic_csv
+
+STAGES = ('ingest', 'preprocess', 'etl', 'pipeline')
+
+DEFAULT_ROWS = [100_000, 1_000_000, 10_000_000]
+
+# Relative slowdown / memory growth beyond which compare reports a regression
+DEFAULT_TIME_TOLERANCE = 0.10
+DEFAULT_MEMORY_TOLERANCE = 0.10
+
+
+def _io_counters() -> dict:
+    """Bytes this process has read and written through system calls"""
+    counters = {}
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                name, value = line.split(':')
+                counters[name] = int(value)
+    except OSError:
+        pass
+    return {'read': counters.get('rchar', 0), 'written': counters.get('wchar', 0)}
+
+
+def _peak_rss_mb() -> float:
+    """
+    Peak resident memory of this process image. VmHWM starts afresh at exec,
+    unlike ru_maxrss, which a spawned child inherits from its parent.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_stage(stage: str, cores: int, backend: str, source: str, ingested: str, work_dir: str, queue):
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, sorted(os.sched_getaffinity(0))[:cores])
+    import pyarrow as pa
+    pa.set_cpu_count(cores)
+    pa.set_io_thread_count(cores)
+
+    from etl.data_ingestion import load_data
+    from etl.data_preprocessing import preprocess_data
+    from etl.pipeline import run_pipeline
+
+    ingest_output = os.path.join(work_dir, 'ingested.parquet')
+    processed = os.path.join(work_dir, 'processed.parquet')
+    io_before = _io_counters()
+    start = time.perf_counter()
+    if stage == 'ingest':
+        load_data(source, ingest_output, backend=backend)
+    elif stage == 'preprocess':
+        preprocess_data(ingested, processed, backend=backend)
+    elif stage == 'etl':
+        load_data(source, ingest_output, backend=backend)
+        preprocess_data(ingest_output, processed, backend=backend)
+    else:
+        run_pipeline(source, processed)
+    seconds = time.perf_counter() - start
+    io_after = _io_counters()
+    queue.put({
+        'seconds': seconds,
+        'peak_rss_mb': _peak_rss_mb(),
+        'bytes_read': io_after['read'] - io_before['read'],
+        'bytes_written': io_after['written'] - io_before['written']
+    })
+
+
+def _measure(context, repeats: int, *args) -> dict:
+    """Best wall time and highest peak memory over ``repeats`` fresh processes"""
+    best = None
+    for _ in range(repeats):
+        queue = context.Queue()
+        process = context.Process(target=_run_stage, args=args + (queue,))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            return {'failed': process.exitcode}
+        result = queue.get()
+        if best is None:
+            best = result
+        else:
+            best['seconds'] = min(best['seconds'], result['seconds'])
+            best['peak_rss_mb'] = max(best['peak_rss_mb'], result['peak_rss_mb'])
+    return best
+
+
+def environment() -> dict:
+    from importlib import metadata
+
+    versions = {}
+    for package in ('numpy', 'pandas', 'pyarrow', 'scikit-learn'):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'host': platform.node(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'packages': versions
+    }
+
+
+def run(row_counts, cores_list, stages=STAGES, backend: str = 'pandas', repeats: int = 1,
+        work_dir: str = None) -> dict:
+    """
+    Run every stage at every size and core count
+
+    Returns:
+        ``{'environment': ..., 'backend': ..., 'results': [...]}`` with one
+        result per (stage, rows, cores); core counts above what this
+        machine offers are recorded as skipped
+    """
+    from etl.data_ingestion import load_data
+
+    context = multiprocessing.get_context('spawn')
+    available = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    results = []
+    for rows in row_counts:
+        with tempfile.TemporaryDirectory(dir=work_dir) as scratch:
+            source = os.path.join(scratch, 'raw.csv')
+            write_synthetic_csv(source, rows)
+            # Preprocessing starts from ingestion's output, prepared once per size
+            ingested = os.path.join(scratch, 'input.parquet')
+            ingested_rows = len(load_data(source, ingested, backend='arrow'))
+            for cores in cores_list:
+                for stage in stages:
+                    result = {'stage': stage, 'rows': rows, 'cores': cores}
+                    if cores > available:
+                        result['skipped'] = f"only {available} cores available"
+                    else:
+                        result.update(_measure(context, repeats, stage, cores, backend, source, ingested, scratch))
+                    if 'seconds' in result:
+                        stage_rows = ingested_rows if stage == 'preprocess' else rows
+                        result['rows_per_sec'] = stage_rows / result['seconds'] if result['seconds'] > 0 else 0.0
+                    results.append(result)
+    return {'environment': environment(), 'backend': backend, 'results': results}
+
+
+def _key(result: dict) -> tuple:
+    return result['stage'], result['rows'], result['cores']
+
+
+def compare(baseline: dict, current: dict, time_tolerance: float = DEFAULT_TIME_TOLERANCE,
+            memory_tolerance: float = DEFAULT_MEMORY_TOLERANCE) -> list:
+    """
+    Match runs by stage, rows and cores and compare time and peak memory
+
+    A run that failed, or that the baseline measured but the current
+    results did not (skipped or absent), is a regression too.
+
+    Returns:
+        One row per run measured in both files, with the time and memory
+        ratios (current / baseline), and one per failed or missing run
+        with ratios of None; each has a ``status`` (``ok``, ``failed``,
+        ``skipped`` or ``missing``) and a ``regression`` flag
+    """
+    if baseline['backend'] != current['backend']:
+        raise ValueError(f"Cannot compare a {current['backend']} run with a {baseline['backend']} baseline")
+    previous = {_key(r): r for r in baseline['results'] if 'seconds' in r}
+    rows = []
+    for result in current['results']:
+        before = previous.pop(_key(result), None)
+        if 'failed' in result or (before is not None and 'seconds' not in result):
+            rows.append(_unmeasured(result, 'failed' if 'failed' in result else 'skipped'))
+            continue
+        if before is None or 'seconds' not in result:
+            continue
+        time_ratio = result['seconds'] / before['seconds'] if before['seconds'] > 0 else 1.0
+        memory_ratio = result['peak_rss_mb'] / before['peak_rss_mb'] if before['peak_rss_mb'] > 0 else 1.0
+        rows.append({
+            'stage': result['stage'], 'rows': result['rows'], 'cores': result['cores'],
+            'status': 'ok',
+            'time_ratio': time_ratio,
+            'memory_ratio': memory_ratio,
+            'regression': time_ratio > 1 + time_tolerance or memory_ratio > 1 + memory_tolerance
+        })
+    rows.extend(_unmeasured(before, 'missing') for before in previous.values())
+    return rows
+
+
+def _unmeasured(result: dict, status: str) -> dict:
+    return {'stage': result['stage'], 'rows': result['rows'], 'cores': result['cores'],
+            'status': status, 'time_ratio': None, 'memory_ratio': None, 'regression': True}
+
+
+def print_results(results: dict):
+    header = (f"{'stage':>11}{'rows':>12}{'cores':>6}{'seconds':>9}{'rows/sec':>12}"
+              f"{'peak MB':>9}{'read MB':>9}{'write MB':>10}")
+    print(header)
+    print('-' * len(header))
+    for r in results['results']:
+        prefix = f"{r['stage']:>11}{r['rows']:>12,}{r['cores']:>6}"
+        if 'skipped' in r:
+            print(f"{prefix}  skipped ({r['skipped']})")
+        elif 'failed' in r:
+            print(f"{prefix}  failed (exit code {r['failed']})")
+        else:
+            print(f"{prefix}{r['seconds']:>9.2f}{r['rows_per_sec']:>12,.0f}{r['peak_rss_mb']:>9.0f}"
+                  f"{r['bytes_read'] / 1e6:>9.0f}{r['bytes_written'] / 1e6:>10.0f}")
+
+
+def print_comparison(rows: list):
+    header = f"{'stage':>11}{'rows':>12}{'cores':>6}{'time':>8}{'memory':>8}"
+    print(header)
+    print('-' * len(header))
+    for r in rows:
+        prefix = f"{r['stage']:>11}{r['rows']:>12,}{r['cores']:>6}"
+        if r['status'] != 'ok':
+            print(f"{prefix}  {r['status']}  REGRESSION")
+            continue
+        flag = '  REGRESSION' if r['regression'] else ''
+        print(f"{prefix}{r['time_ratio']:>7.2f}x{r['memory_ratio']:>7.2f}x{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='Measure and optionally save results')
+    run_parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS)
+    run_parser.add_argument('--cores', type=int, nargs='+', default=sorted({1, os.cpu_count() or 1}))
+    run_parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    run_parser.add_argument('--backend', choices=('pandas', 'arrow'), default='pandas')
+    run_parser.add_argument('--repeats', type=int, default=1, help='Keep the best of this many runs')
+    run_parser.add_argument('--work-dir', help='Scratch directory for inputs and outputs')
+    run_parser.add_argument('--output', help='Write results as JSON to this path')
+    compare_parser = commands.add_parser('compare', help='Flag regressions against a baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--time-tolerance', type=float, default=DEFAULT_TIME_TOLERANCE)
+    compare_parser.add_argument('--memory-tolerance', type=float, default=DEFAULT_MEMORY_TOLERANCE)
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        results = run(args.rows, args.cores, args.stages, args.backend, args.repeats, args.work_dir)
+        print_results(results)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        rows = compare(baseline, current, args.time_tolerance, args.memory_tolerance)
+        print_comparison(rows)
+        regressions = sum(r['regression'] for r in rows)
+        print(f"{regressions} regressions in {len(rows)} runs")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,150 @@
+"""
+Intermediate format benchmark: Parquet vs memory-mapped Arrow IPC handoff.
+
+For each row count, a cleaned ingestion-like table is written as the
+intermediate in each format by one process and read back by another, the
+way preprocessing picks up ingestion's output. The reader touches every
+numeric value as NumPy, so lazily mapped pages are actually read. Recorded
+per format: write and read wall time, file size, the reader's peak resident
+memory and its anonymous (non file-backed) memory after the read, and the
+wall time of the full ``preprocess_data`` stage on that input.
+
+    python benchmarks/intermediate_formats.py --rows 1000000 10000000 --output formats.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Add repository root to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.etl_backends import EVENT_FEATURES
+from etl.synthetic import SyntheticSpec, generate_chunk
+
+FORMATS = {'parquet': 'intermediate.parquet', 'ipc': 'intermediate.arrow'}
+
+
+def synthetic_table(rows: int, seed: int = 0) -> pa.Table:
+    """The ETL backend benchmark's data as ingestion leaves it: no nulls or duplicates"""
+    features = [{k: v for k, v in f.items() if k != 'null_rate'} for f in EVENT_FEATURES]
+    spec = SyntheticSpec(rows, seed=seed, features=features, target={'function': 'none', 'noise': 1.0})
+    return pa.concat_tables([generate_chunk(spec, i) for i in range(spec.num_chunks)])
+
+
+def _anonymous_rss_mb() -> float:
+    """Private memory of this process; mapped file pages are excluded"""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('RssAnon:'):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+
+def _write(fmt: str, rows: int, path: str, queue):
+    from etl.arrow_ipc import write_ipc_table
+
+    table = synthetic_table(rows)
+    start = time.perf_counter()
+    if fmt == 'ipc':
+        write_ipc_table(table, path)
+    else:
+        pq.write_table(table, path)
+    queue.put({'write_seconds': time.perf_counter() - start, 'file_bytes': os.path.getsize(path)})
+
+
+def _read(fmt: str, path: str, queue):
+    from etl.arrow_ipc import read_ipc_table
+
+    start = time.perf_counter()
+    table = read_ipc_table(path) if fmt == 'ipc' else pq.read_table(path)
+    checksum = 0.0
+    for field in table.schema:
+        if pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+            for chunk in table.column(field.name).chunks:
+                checksum += float(chunk.to_numpy().sum())
+    queue.put({
+        'read_seconds': time.perf_counter() - start,
+        'anon_rss_mb': _anonymous_rss_mb(),
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'checksum': checksum
+    })
+
+
+def _preprocess(path: str, output_path: str, queue):
+    from etl.data_preprocessing import preprocess_data
+
+    start = time.perf_counter()
+    preprocess_data(path, output_path, backend='arrow')
+    queue.put({'preprocess_seconds': time.perf_counter() - start})
+
+
+def _in_process(context, target, *args) -> dict:
+    queue = context.Queue()
+    process = context.Process(target=target, args=args + (queue,))
+    process.start()
+    process.join()
+    return queue.get() if process.exitcode == 0 else {'failed': process.exitcode}
+
+
+def run(row_counts, work_dir: str = None) -> dict:
+    """
+    Benchmark both formats at every row count
+
+    Returns:
+        Mapping of row count to per-format measurements
+    """
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for rows in row_counts:
+        result = {}
+        with tempfile.TemporaryDirectory(dir=work_dir) as scratch:
+            for fmt, name in FORMATS.items():
+                path = os.path.join(scratch, name)
+                measured = _in_process(context, _write, fmt, rows, path)
+                for target, args in ((_read, (fmt, path)),
+                                     (_preprocess, (path, os.path.join(scratch, 'processed.parquet')))):
+                    if 'failed' not in measured:
+                        measured.update(_in_process(context, target, *args))
+                result[fmt] = measured
+                os.remove(path)
+        results[rows] = result
+    return results
+
+
+def print_results(results: dict):
+    header = (f"{'rows':>12}{'format':>9}{'write s':>9}{'read s':>8}{'file MB':>9}"
+              f"{'peak MB':>9}{'anon MB':>9}{'preprocess s':>14}")
+    print(header)
+    print('-' * len(header))
+    for rows, result in results.items():
+        for fmt in FORMATS:
+            r = result[fmt]
+            if 'failed' in r:
+                print(f"{rows:>12,}{fmt:>9}  failed (exit code {r['failed']})")
+                continue
+            print(f"{rows:>12,}{fmt:>9}{r['write_seconds']:>9.2f}{r['read_seconds']:>8.2f}"
+                  f"{r['file_bytes'] / 1e6:>9.0f}{r['peak_rss_mb']:>9.0f}{r['anon_rss_mb']:>9.0f}"
+                  f"{r['preprocess_seconds']:>14.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 10_000_000])
+    parser.add_argument('--work-dir', help='Scratch directory for the intermediate files')
+    parser.add_argument('--output', help='Write results as JSON to this path')
+    args = parser.parse_args()
+
+    results = run(args.rows, args.work_dir)
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
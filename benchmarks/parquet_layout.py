@@ -0,0 +1,128 @@
+"""
+Parquet layout benchmark: write/read throughput and file size per layout.
+
+Writes the same synthetic table with several ``ParquetLayout`` settings and
+measures write time, file size, a full read, and a selective read (a 1% range
+of ``event_time``) that can skip row groups using min/max statistics.
+
+    python benchmarks/parquet_layout.py --rows 2000000 --output layout.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Add repository root to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl.parquet_layout import ParquetLayout
+
+ROW_GROUP_ROWS = 128 * 1024
+
+LAYOUTS = {
+    'pyarrow_default': ParquetLayout(),
+    'snappy_small_groups': ParquetLayout(row_group_size=ROW_GROUP_ROWS),
+    'zstd_sorted': ParquetLayout(row_group_size=ROW_GROUP_ROWS, compression='zstd',
+                                 sort_by=['event_time'], write_page_index=True),
+    'lz4_sorted': ParquetLayout(row_group_size=ROW_GROUP_ROWS, compression='lz4',
+                                sort_by=['event_time'], write_page_index=True),
+    'mixed_codecs_sorted': ParquetLayout(row_group_size=ROW_GROUP_ROWS, compression='lz4',
+                                         column_compression={'region': 'zstd', 'event_time': 'zstd'},
+                                         use_dictionary=['region'], sort_by=['event_time'],
+                                         write_page_index=True),
+}
+
+
+def synthetic_table(rows: int, seed: int = 0) -> pa.Table:
+    """Unordered event data: a time key, two features, a low-cardinality string and a target"""
+    rng = np.random.default_rng(seed)
+    return pa.table({
+        'event_time': rng.permutation(rows).astype(np.int64),
+        'feature1': rng.normal(50, 10, rows),
+        'feature2': rng.normal(75, 15, rows).round(2),
+        'region': rng.choice(['north', 'south', 'east', 'west'], rows),
+        'target': rng.normal(size=rows),
+    })
+
+
+def _best_of(fn, repeats: int):
+    best, result = float('inf'), None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def row_groups_overlapping(path: str, column: str, low, high) -> int:
+    """Row groups whose min/max statistics overlap [low, high]"""
+    metadata = pq.read_metadata(path)
+    index = metadata.schema.to_arrow_schema().get_field_index(column)
+    count = 0
+    for i in range(metadata.num_row_groups):
+        stats = metadata.row_group(i).column(index).statistics
+        if stats is None or not stats.has_min_max or (stats.min <= high and stats.max >= low):
+            count += 1
+    return count
+
+
+def run(rows: int = 2_000_000, repeats: int = 3, work_dir: str = None) -> dict:
+    """
+    Benchmark every layout in ``LAYOUTS``
+
+    Returns:
+        Mapping of layout name to its settings and measurements
+    """
+    table = synthetic_table(rows)
+    low, high = rows // 2, rows // 2 + rows // 100
+    results = {}
+    with tempfile.TemporaryDirectory(dir=work_dir) as scratch:
+        for name, layout in LAYOUTS.items():
+            path = os.path.join(scratch, f'{name}.parquet')
+            write_seconds, _ = _best_of(lambda: layout.write_table(table, path), repeats)
+            read_seconds, _ = _best_of(lambda: pq.read_table(path), repeats)
+            filter_seconds, selected = _best_of(
+                lambda: pq.read_table(path, filters=[('event_time', '>=', low), ('event_time', '<', high)]),
+                repeats)
+            size = os.path.getsize(path)
+            results[name] = {
+                'layout': layout.to_dict(),
+                'file_bytes': size,
+                'row_groups': pq.read_metadata(path).num_row_groups,
+                'row_groups_scanned_by_filter': row_groups_overlapping(path, 'event_time', low, high - 1),
+                'write_mb_per_sec': table.nbytes / write_seconds / 1e6,
+                'read_mb_per_sec': table.nbytes / read_seconds / 1e6,
+                'filtered_read_ms': filter_seconds * 1000,
+                'filtered_rows': selected.num_rows,
+            }
+    return results
+
+
+def print_results(results: dict):
+    header = f"{'layout':<22}{'MB':>8}{'groups':>8}{'scanned':>9}{'write MB/s':>12}{'read MB/s':>11}{'filter ms':>11}"
+    print(header)
+    print('-' * len(header))
+    for name, r in results.items():
+        print(f"{name:<22}{r['file_bytes'] / 1e6:>8.1f}{r['row_groups']:>8}"
+              f"{r['row_groups_scanned_by_filter']:>9}{r['write_mb_per_sec']:>12.0f}"
+              f"{r['read_mb_per_sec']:>11.0f}{r['filtered_read_ms']:>11.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output', help='Write results as JSON to this path')
+    args = parser.parse_args()
+
+    results = run(args.rows, args.repeats)
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'rows': args.rows, 'results': results}, f, indent=2)
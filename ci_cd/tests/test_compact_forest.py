@@ -0,0 +1,357 @@
+import pytest
+import numpy as np
+import pandas as pd
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from sklearn.ensemble import RandomForestRegressor
+import joblib
+
+from deployment.app.compact_forest import CompactForest, export_compact_forest
+from deployment.app.engines import (CALIBRATION_BATCH_SIZES, MAX_POOL_WORKERS, ProcessPoolEngine,
+                                    build_engines, select_engine)
+from deployment.app.feature_transform import FeatureTransform, transform_path_for
+from deployment.app.grid_surrogate import GridSurrogate
+from deployment.app.model_loader import ModelLoader
+from deployment.app.predictor_cache import PredictorCache
+from etl.data_preprocessing import preprocess_data
+
+
+@pytest.fixture(scope="module")
+def forest_and_data():
+    """Small forest trained on two named features"""
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({
+        'feature1': rng.normal(50, 10, 500),
+        'feature2': rng.normal(75, 15, 500)
+    })
+    y = X['feature1'] * 2.5 + X['feature2'] * 1.8 + rng.normal(0, 5, 500)
+    model = RandomForestRegressor(n_estimators=20, max_depth=8, random_state=42)
+    model.fit(X, y)
+    return model, X
+
+
+class TestCompactForest:
+    """Test compact forest conversion and serialization"""
+
+    def test_predictions_match_sklearn(self, forest_and_data):
+        """Test compact predictions match the original forest"""
+        model, X = forest_and_data
+        forest = CompactForest.from_sklearn(model)
+
+        np.testing.assert_allclose(forest.predict(X), model.predict(X), rtol=1e-5)
+
+    def test_narrow_dtypes(self, forest_and_data):
+        """Test node arrays use narrow dtypes"""
+        model, _ = forest_and_data
+        forest = CompactForest.from_sklearn(model)
+
+        assert forest.threshold.dtype == np.float32
+        assert forest.value.dtype == np.float32
+        assert forest.children_left.dtype in (np.int8, np.int16, np.int32)
+        assert forest.feature.dtype == np.int8
+
+    def test_save_and_load_roundtrip(self, forest_and_data, tmp_path):
+        """Test exported artifact is smaller and loads with equal predictions"""
+        model, X = forest_and_data
+        pkl_path = tmp_path / "model.pkl"
+        npz_path = tmp_path / "model.npz"
+        joblib.dump(model, pkl_path)
+
+        forest = export_compact_forest(model, str(npz_path), X_check=X)
+        loaded = CompactForest.load(str(npz_path))
+
+        assert os.path.getsize(npz_path) < os.path.getsize(pkl_path)
+        assert loaded.feature_names == ['feature1', 'feature2']
+        np.testing.assert_array_equal(loaded.predict(X), forest.predict(X))
+
+    def test_columns_matched_by_name(self, forest_and_data):
+        """Test DataFrame columns are reordered to the training order"""
+        model, X = forest_and_data
+        forest = CompactForest.from_sklearn(model)
+
+        reordered = X[['feature2', 'feature1']]
+        np.testing.assert_array_equal(forest.predict(reordered), forest.predict(X))
+
+        with pytest.raises(ValueError):
+            forest.predict(X[['feature1']])
+
+    def test_narrow_columns_predict_like_float64(self, forest_and_data):
+        """Test downcast DataFrame columns give the same predictions"""
+        model, X = forest_and_data
+        forest = CompactForest.from_sklearn(model)
+        narrow = X.astype({'feature1': np.float32, 'feature2': np.float32}).round().astype(
+            {'feature1': np.int32})
+
+        np.testing.assert_array_equal(forest.predict(narrow), forest.predict(narrow.astype(np.float64)))
+        assert forest.as_matrix(narrow).dtype == np.float32
+
+    def test_model_loader_loads_compact_artifact(self, forest_and_data, tmp_path):
+        """Test ModelLoader serves the compact format directly"""
+        model, X = forest_and_data
+        npz_path = tmp_path / "model.npz"
+        export_compact_forest(model, str(npz_path))
+
+        loader = ModelLoader(model_path=str(npz_path))
+        predictions = loader.predict(X.head(3))
+
+        assert isinstance(loader.model, CompactForest)
+        assert len(predictions) == 3
+        assert loader.get_model_info()["memory_bytes"] > 0
+
+
+class TestPredictorCache:
+    """Test the on-disk predictor snapshot cache"""
+
+    def test_second_load_hits_memory_mapped_snapshot(self, forest_and_data, tmp_path):
+        """Test a second loader start reuses the cached arrays"""
+        model, X = forest_and_data
+        pkl_path = tmp_path / "model.pkl"
+        joblib.dump(model, pkl_path)
+        cache_dir = tmp_path / "cache"
+
+        first = ModelLoader(model_path=str(pkl_path), cache_dir=str(cache_dir))
+        second = ModelLoader(model_path=str(pkl_path), cache_dir=str(cache_dir))
+
+        assert first.cache_hit is False
+        assert second.cache_hit is True
+        assert isinstance(second.model.threshold, np.memmap)
+        np.testing.assert_allclose(second.predict(X), model.predict(X), rtol=1e-5)
+
+    def test_changed_model_invalidates_entry(self, forest_and_data, tmp_path):
+        """Test the cache key follows the artifact content"""
+        model, X = forest_and_data
+        pkl_path = tmp_path / "model.pkl"
+        cache = PredictorCache(str(tmp_path / "cache"))
+
+        joblib.dump(model, pkl_path)
+        old_key = cache.key_for(str(pkl_path))
+        joblib.dump(RandomForestRegressor(n_estimators=3, random_state=0).fit(X, X['feature1']), pkl_path)
+
+        assert cache.key_for(str(pkl_path)) != old_key
+
+    def test_lru_eviction_respects_size_limit(self, forest_and_data, tmp_path):
+        """Test least recently used entries are evicted first"""
+        model, _ = forest_and_data
+        forest = CompactForest.from_sklearn(model)
+        cache = PredictorCache(str(tmp_path / "cache"), max_bytes=int(forest.nbytes * 2.5))
+
+        cache.put("a", forest)
+        cache.put("b", forest)
+        os.utime(tmp_path / "cache" / "a", (1, 1))
+        os.utime(tmp_path / "cache" / "b", (2, 2))
+        assert cache.get("a") is not None
+        cache.put("c", forest)
+
+        assert sorted(key for key, _, _ in cache.entries()) == ["a", "c"]
+
+
+class TestSlimServing:
+    """Test the NumPy-only serving mode"""
+
+    def test_slim_app_never_imports_sklearn_or_pandas(self, forest_and_data, tmp_path):
+        """Test the API serves a compact model without sklearn or pandas"""
+        model, _ = forest_and_data
+        npz_path = tmp_path / "model.npz"
+        export_compact_forest(model, str(npz_path))
+
+        script = (
+            "import sys\n"
+            "from app.main import model_loader\n"
+            "pred = model_loader.predict_records([{'feature1': 50.0, 'feature2': 75.0}])\n"
+            "assert len(pred) == 1\n"
+            "print(sorted(m for m in ('sklearn', 'pandas', 'joblib') if m in sys.modules))\n"
+        )
+        env = dict(os.environ, PULSEFLOW_SLIM="1", MODEL_PATH=str(npz_path), PREDICTOR_CACHE_DIR="")
+        deployment_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../deployment'))
+        result = subprocess.run([sys.executable, "-c", script], cwd=deployment_dir, env=env,
+                                capture_output=True, text=True)
+
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip().splitlines()[-1] == "[]"
+
+    def test_slim_loader_rejects_pickles(self, tmp_path):
+        """Test slim mode refuses artifacts that need unpickling"""
+        pkl_path = tmp_path / "model.pkl"
+        pkl_path.write_bytes(b"")
+
+        with pytest.raises(ValueError):
+            ModelLoader(model_path=str(pkl_path), slim=True)
+
+
+class TestEngineSelection:
+    """Test load-time inference engine calibration"""
+
+    def test_calibration_builds_dispatch_table(self, forest_and_data, tmp_path):
+        """Test calibration picks an available engine for each batch size"""
+        model, X = forest_and_data
+        pkl_path = tmp_path / "model.pkl"
+        joblib.dump(model, pkl_path)
+
+        loader = ModelLoader(model_path=str(pkl_path), calibrate=True, pool_workers=1)
+
+        sizes = [entry["max_batch_size"] for entry in loader.dispatch_table]
+        assert sizes == list(CALIBRATION_BATCH_SIZES)
+        assert set(loader.engines) == {"numpy", "sklearn"}
+        assert all(entry["engine"] in loader.engines for entry in loader.dispatch_table)
+        np.testing.assert_allclose(loader.predict(X), model.predict(X), rtol=1e-5)
+        assert loader.get_model_info()["dispatch_table"] == loader.dispatch_table
+
+    def test_pool_only_on_request_and_closed_when_not_dispatched(self, forest_and_data, tmp_path, monkeypatch):
+        """Test the pool is opt-in, capped, and shut down unless calibration picks it"""
+        model, X = forest_and_data
+        forest = CompactForest.from_sklearn(model)
+        monkeypatch.setattr(os, "cpu_count", lambda: 64)
+
+        assert "process_pool" not in build_engines(model, forest)
+        assert build_engines(model, forest, pool_workers=1000)["process_pool"].workers == MAX_POOL_WORKERS
+
+        joblib.dump(model, tmp_path / "model.pkl")
+        loader = ModelLoader(model_path=str(tmp_path / "model.pkl"), calibrate=True, pool_workers=2)
+        pool = loader.engines["process_pool"]
+        dispatched = {entry["engine"] for entry in loader.dispatch_table}
+        assert (pool._pool is not None) == ("process_pool" in dispatched)
+        pool.close()
+
+    def test_select_engine_by_batch_size(self):
+        """Test batch sizes map to the first covering table entry"""
+        table = [
+            {"max_batch_size": 1, "engine": "numpy"},
+            {"max_batch_size": 1024, "engine": "sklearn"},
+        ]
+
+        assert select_engine(table, 1) == "numpy"
+        assert select_engine(table, 500) == "sklearn"
+        assert select_engine(table, 10 ** 6) == "sklearn"
+
+    def test_process_pool_engine_matches_in_process(self, forest_and_data):
+        """Test chunked process pool predictions equal in-process ones"""
+        model, X = forest_and_data
+        forest = CompactForest.from_sklearn(model)
+        engine = ProcessPoolEngine(forest, workers=2)
+        try:
+            np.testing.assert_array_equal(engine.predict(X), forest.predict(X))
+        finally:
+            engine.close()
+
+
+def exact_predictor(model, columns):
+    """Wrap a forest fitted on named columns to accept plain arrays"""
+    return lambda rows: model.predict(pd.DataFrame(rows, columns=columns))
+
+
+class TestGridSurrogate:
+    """Test the lookup-table surrogate predictor"""
+
+    def test_out_of_grid_rows_use_exact_model(self, forest_and_data):
+        """Test rows outside the observed ranges fall back to the forest"""
+        model, X = forest_and_data
+        exact = exact_predictor(model, X.columns)
+        surrogate = GridSurrogate.build(exact, X.to_numpy(), resolution=64,
+                                        feature_names=list(X.columns))
+        outside = pd.DataFrame({'feature1': [1000.0], 'feature2': [-1000.0]})
+
+        result = surrogate.predict(outside, fallback=exact)
+
+        np.testing.assert_allclose(result, model.predict(outside))
+        with pytest.raises(ValueError):
+            surrogate.predict(outside)
+
+    def test_validation_error_is_recorded_and_saved(self, forest_and_data, tmp_path):
+        """Test held-out error is measured and persisted with the table"""
+        model, X = forest_and_data
+        exact = exact_predictor(model, X.columns)
+        surrogate = GridSurrogate.build(exact, X.to_numpy(), resolution=128, mode="linear")
+        report = surrogate.validate(X.to_numpy(), exact)
+
+        path = tmp_path / "model.grid.npz"
+        surrogate.save(str(path))
+        loaded = GridSurrogate.load(str(path))
+        error = np.abs(loaded.predict(X.to_numpy()) - model.predict(X))
+
+        assert loaded.mode == "linear"
+        assert loaded.metadata["max_abs_error"] == report["max_abs_error"]
+        assert error.max() <= report["max_abs_error"] + 1e-6
+
+    def test_model_loader_serves_through_surrogate(self, forest_and_data, tmp_path):
+        """Test ModelLoader answers from the table when a surrogate is configured"""
+        model, X = forest_and_data
+        npz_path = tmp_path / "model.npz"
+        grid_path = tmp_path / "model.grid.npz"
+        export_compact_forest(model, str(npz_path))
+        GridSurrogate.build(exact_predictor(model, X.columns), X.to_numpy(), resolution=64,
+                            feature_names=list(X.columns)).save(str(grid_path))
+
+        loader = ModelLoader(model_path=str(npz_path), surrogate_path=str(grid_path))
+        records = [{'feature1': 50.0, 'feature2': 75.0}, {'feature1': 1e6, 'feature2': 75.0}]
+        predictions = loader.predict_records(records)
+
+        assert predictions[0] == pytest.approx(loader.surrogate.predict(np.array([[50.0, 75.0]]))[0])
+        assert predictions[1] == pytest.approx(loader.forest.predict(np.array([[1e6, 75.0]]))[0])
+
+
+class TestFeatureTransform:
+    """Test the persisted preprocessing transform applied at serving time"""
+
+    def test_serving_scales_raw_inputs_like_preprocessing(self, tmp_path):
+        """Test raw records score as the preprocessed rows the model saw"""
+        rng = np.random.default_rng(0)
+        raw = pd.DataFrame({'feature1': rng.normal(50, 10, 300), 'feature2': rng.normal(75, 15, 300)})
+        raw['target'] = raw['feature1'] * 2 + raw['feature2']
+        raw.to_parquet(tmp_path / "raw.parquet", index=False)
+        processed = preprocess_data(str(tmp_path / "raw.parquet"), str(tmp_path / "processed.parquet"))
+        X = processed.drop('target', axis=1)
+        model = RandomForestRegressor(n_estimators=10, random_state=0).fit(X, processed['target'])
+        export_compact_forest(model, str(tmp_path / "model.npz"))
+        FeatureTransform.load(transform_path_for(str(tmp_path / "processed.parquet"))).bound_to(
+            list(X.columns)).save(transform_path_for(str(tmp_path / "model.npz")))
+
+        loader = ModelLoader(model_path=str(tmp_path / "model.npz"))
+        features = raw[['feature1', 'feature2']]
+
+        np.testing.assert_allclose(loader.predict_records(features.to_dict('records')),
+                                   model.predict(X), rtol=1e-5)
+        np.testing.assert_array_equal(loader.predict(features[['feature2', 'feature1']]),
+                                      loader.predict_records(features.to_dict('records')))
+
+    def test_sidecar_of_another_model_is_refused(self, tmp_path):
+        """Test a stale or mismatched sidecar next to the model fails to load instead of scaling"""
+        X = pd.DataFrame({'feature1': [1.0, 2.0, 3.0, 4.0], 'feature2': [4.0, 3.0, 2.0, 1.0]})
+        model = RandomForestRegressor(n_estimators=3, random_state=0).fit(X, X['feature1'])
+        export_compact_forest(model, str(tmp_path / "model.npz"))
+        transform = FeatureTransform(['feature1', 'feature2'], [1.0, 2.0], [3.0, 4.0])
+        sidecar = transform_path_for(str(tmp_path / "model.npz"))
+
+        transform.save(sidecar)
+        with pytest.raises(ValueError, match="not bound"):
+            ModelLoader(model_path=str(tmp_path / "model.npz"))
+        transform.bound_to(['feature2', 'feature1']).save(sidecar)
+        with pytest.raises(ValueError, match="Refusing"):
+            ModelLoader(model_path=str(tmp_path / "model.npz"))
+        transform.bound_to(['feature1', 'feature2']).save(sidecar)
+        assert ModelLoader(model_path=str(tmp_path / "model.npz")).transform.model_features == ['feature1', 'feature2']
+
+    def test_apply_matches_scaler_and_leaves_caller_data(self, tmp_path):
+        """Test apply equals StandardScaler and predict never mutates its input"""
+        from sklearn.preprocessing import StandardScaler
+        rng = np.random.default_rng(1)
+        X = rng.normal(10, 3, (200, 2))
+        scaler = StandardScaler().fit(X)
+        transform = FeatureTransform.from_scaler(['a', 'b'], scaler)
+
+        np.testing.assert_array_equal(transform.apply(X.copy()), scaler.transform(X))
+        aligned = transform.aligned(['b', 'c', 'a'])
+        assert aligned.mean.tolist() == [scaler.mean_[1], 0.0, scaler.mean_[0]]
+        assert aligned.scale[1] == 1.0
+
+        model = RandomForestRegressor(n_estimators=3, random_state=0).fit(X, X[:, 0])
+        export_compact_forest(model, str(tmp_path / "model.npz"))
+        transform.save(str(tmp_path / "scaler.json"))
+        loader = ModelLoader(model_path=str(tmp_path / "model.npz"),
+                             transform_path=str(tmp_path / "scaler.json"))
+        before = X.copy()
+        loader.predict(X)
+        np.testing.assert_array_equal(X, before)
@@ -1,12 +1,33 @@
 import pytest
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import glob
+import json
 import os
 import sys
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
-from etl.data_ingestion import load_data
-from etl.data_preprocessing import preprocess_data
+from benchmarks.etl_scaling import compare
+from etl.arrow_backend import drop_duplicates
+from etl.arrow_ipc import read_ipc_table
+from etl.data_ingestion import load_data, load_data_streaming
+from etl.dedup import ExternalDeduplicator
+from etl.downcast import downcast_parquet, report_path_for
+from etl.enrichment import Dimension, Enricher, enrich_streaming
+from etl.keyed_dataset import KeyedDataset
+from etl.incremental_ingestion import ingest_incremental, load_manifest
+from etl.parallel_ingestion import ingest_parallel
+from etl.parquet_layout import ParquetLayout
+from etl.pipeline import run_pipeline, run_staged
+from etl.profile import DataProfile, load_profile
+from etl.data_preprocessing import preprocess_data, preprocess_data_streaming
+from etl.stage_cache import StageCache, run_stage
+from etl.stats import RunningMoments
+from etl.synthetic import SyntheticSpec, generate, generate_chunk
+from etl.validation import Validator
 
 
 class TestDataIngestion:
@@ -69,3 +90,825 @@ class TestDataPreprocessing:
         # Check that features are scaled (mean ~0, std ~1)
         assert abs(result_df['feature1'].mean()) < 0.1
         assert abs(result_df['feature2'].mean()) < 0.1
+
+
+class TestStreamingPreprocessing:
+    """Test the two-pass row-group scaler"""
+
+    def test_matches_in_memory_preprocessing(self, tmp_path):
+        """Test streaming output equals StandardScaler on the whole file"""
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({
+            'feature1': rng.normal(1e4, 3, 5000),
+            'feature2': rng.integers(0, 100, 5000),
+            'constant': 7.0,
+            'target': rng.normal(size=5000)
+        })
+        input_file = tmp_path / "input.parquet"
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), input_file, row_group_size=700)
+
+        expected = preprocess_data(str(input_file), str(tmp_path / "in_memory.parquet"))
+        stats = preprocess_data_streaming(str(input_file), str(tmp_path / "streamed.parquet"))
+
+        result = pd.read_parquet(tmp_path / "streamed.parquet")
+        assert stats['row_groups'] == 8
+        assert pq.ParquetFile(tmp_path / "streamed.parquet").num_row_groups == 8
+        pd.testing.assert_frame_equal(result, expected, rtol=1e-9, atol=1e-9)
+
+    def test_merged_moments_match_numpy(self):
+        """Test merging partial moments equals moments of the whole"""
+        rng = np.random.default_rng(1)
+        X = rng.normal(50, 10, (1000, 2))
+        X[::7, 1] = np.nan
+        left, right = RunningMoments(2), RunningMoments(2)
+        for chunk in np.array_split(X[:300], 4):
+            left.update(chunk)
+        right.update(X[300:])
+        left.merge(right)
+
+        np.testing.assert_allclose(left.mean, np.nanmean(X, axis=0))
+        np.testing.assert_allclose(left.variance, np.nanvar(X, axis=0))
+        assert left.count.tolist() == [1000, np.sum(~np.isnan(X[:, 1]))]
+
+class TestParallelPreprocessing:
+    """Test the row-group parallel transform pass"""
+
+    def _write_input(self, path, rows=4000, row_group_size=500):
+        rng = np.random.default_rng(3)
+        table = pa.table({'feature1': rng.normal(50, 10, rows), 'feature2': rng.integers(0, 100, rows),
+                          'target': rng.normal(size=rows)})
+        pq.write_table(table, path, row_group_size=row_group_size)
+
+    def test_workers_give_identical_output(self, tmp_path):
+        """Test a process pool writes the same row groups, in order, with the same profile"""
+        self._write_input(tmp_path / "in.parquet")
+
+        serial = preprocess_data_streaming(str(tmp_path / "in.parquet"), str(tmp_path / "serial.parquet"))
+        parallel = preprocess_data_streaming(str(tmp_path / "in.parquet"), str(tmp_path / "parallel.parquet"),
+                                             workers=3)
+
+        assert parallel['mean'] == serial['mean'] and parallel['scale'] == serial['scale']
+        assert pq.read_table(tmp_path / "parallel.parquet").equals(pq.read_table(tmp_path / "serial.parquet"))
+        assert pq.ParquetFile(tmp_path / "parallel.parquet").num_row_groups == 8
+        assert load_profile(str(tmp_path / "parallel.parquet")) == load_profile(str(tmp_path / "serial.parquet"))
+
+    def test_part_files_are_written_by_workers(self, tmp_path):
+        """Test an output directory gets one ordered part file per row group"""
+        self._write_input(tmp_path / "in.parquet")
+        preprocess_data_streaming(str(tmp_path / "in.parquet"), str(tmp_path / "serial.parquet"))
+
+        preprocess_data_streaming(str(tmp_path / "in.parquet"), str(tmp_path / "processed"), workers=2)
+
+        parts = sorted(os.listdir(tmp_path / "processed"))
+        assert parts == ["_profile.json"] + [f"part-{i:05d}.parquet" for i in range(8)]
+        assert pq.read_table(tmp_path / "processed").equals(pq.read_table(tmp_path / "serial.parquet"))
+        assert (tmp_path / "processed.transform.json").exists()
+
+
+class TestStreamingIngestion:
+    """Test memory-bounded streaming ingestion"""
+
+    def test_streaming_matches_in_memory_load(self, tmp_path):
+        """Test streaming output equals load_data and is split into row groups"""
+        input_file = tmp_path / "test_input.csv"
+        df = pd.DataFrame({
+            'feature1': range(200),
+            'feature2': [x * 1.5 for x in range(200)],
+            'target': [x * 3 + 5 for x in range(200)]
+        })
+        df.loc[5, 'feature2'] = None
+        df.to_csv(input_file, index=False)
+
+        expected = load_data(str(input_file), str(tmp_path / "in_memory.parquet"))
+        output_file = tmp_path / "streamed.parquet"
+        stats = load_data_streaming(str(input_file), str(output_file), block_size=1024)
+
+        result = pd.read_parquet(output_file)
+        pd.testing.assert_frame_equal(result, expected.reset_index(drop=True), check_dtype=False)
+        assert pq.ParquetFile(output_file).num_row_groups == stats['batches'] > 1
+        assert stats['rows_read'] == 200
+        assert stats['rows_written'] == 199
+        assert stats['rows_per_sec'] > 0
+
+
+class TestExternalDeduplication:
+    """Test out-of-core duplicate removal"""
+
+    def test_keep_mask_matches_drop_duplicates(self, tmp_path):
+        """Test the spilled fingerprint partitions find the same first occurrences"""
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({
+            'feature1': rng.integers(0, 5, 1000),
+            'feature2': rng.integers(0, 5, 1000).astype(float),
+            'target': rng.integers(0, 3, 1000)
+        })
+        df.loc[0, 'feature2'] = -0.0
+        df.loc[1, 'feature2'] = 0.0
+
+        dedup = ExternalDeduplicator(str(tmp_path / "work"), num_partitions=4)
+        for start in range(0, len(df), 128):
+            dedup.add(df.iloc[start:start + 128])
+        keep = dedup.keep_mask()
+
+        expected = ~df.duplicated()
+        np.testing.assert_array_equal(np.asarray(keep), expected.to_numpy())
+
+    def test_streaming_removes_duplicates_across_batches(self, tmp_path):
+        """Test streaming ingestion output equals load_data with cross-batch duplicates"""
+        rng = np.random.default_rng(1)
+        input_file = tmp_path / "dupes.csv"
+        df = pd.DataFrame({
+            'feature1': rng.integers(0, 20, 2000),
+            'feature2': rng.integers(0, 20, 2000),
+            'target': rng.integers(0, 2, 2000)
+        })
+        df.to_csv(input_file, index=False)
+
+        expected = load_data(str(input_file), str(tmp_path / "in_memory.parquet"))
+        stats = load_data_streaming(str(input_file), str(tmp_path / "streamed.parquet"),
+                                    block_size=2048, num_partitions=8)
+
+        result = pd.read_parquet(tmp_path / "streamed.parquet")
+        assert stats['batches'] > 1
+        pd.testing.assert_frame_equal(result, expected.reset_index(drop=True))
+
+
+class TestIncrementalIngestion:
+    """Test manifest-driven incremental ingestion"""
+
+    def _write_csv(self, path, start, rows=10):
+        pd.DataFrame({
+            'feature1': range(start, start + rows),
+            'feature2': [x * 1.5 for x in range(start, start + rows)],
+            'target': [x * 3 for x in range(start, start + rows)]
+        }).to_csv(path, index=False)
+
+    def test_only_new_and_changed_files_are_processed(self, tmp_path):
+        """Test reruns skip processed files and pick up new or modified ones"""
+        raw = tmp_path / "raw"
+        raw.mkdir()
+        output_dir = tmp_path / "ingested"
+        self._write_csv(raw / "day1.csv", 0)
+
+        first = ingest_incremental(str(raw), str(output_dir))
+        second = ingest_incremental(str(raw), str(output_dir))
+        self._write_csv(raw / "day2.csv", 100)
+        self._write_csv(raw / "day1.csv", 0, rows=5)
+        third = ingest_incremental(str(raw), str(output_dir))
+
+        assert (first['new'], first['rows_written']) == (1, 10)
+        assert (second['new'], second['changed'], second['unchanged']) == (0, 0, 1)
+        assert (third['new'], third['changed']) == (1, 1)
+
+        dataset = pd.read_parquet(output_dir)
+        assert sorted(dataset['feature1']) == list(range(5)) + list(range(100, 110))
+        assert 'ingest_date' in dataset.columns
+        assert sorted(os.path.basename(p) for p in load_manifest(str(output_dir))['files']) == [
+            'day1.csv', 'day2.csv']
+
+
+class TestParallelIngestion:
+    """Test multi-file ingestion into a partitioned dataset"""
+
+    def test_cross_file_duplicates_removed(self, tmp_path):
+        """Test the dataset matches deduplicating the concatenated inputs"""
+        raw = tmp_path / "raw"
+        raw.mkdir()
+        rng = np.random.default_rng(0)
+        frames = []
+        for i in range(4):
+            df = pd.DataFrame({
+                'region': rng.integers(0, 3, 500),
+                'feature1': rng.integers(0, 10, 500).astype(float),
+                'target': rng.integers(0, 5, 500).astype(float)
+            })
+            df.to_csv(raw / f"shard{i}.csv", index=False)
+            frames.append(df)
+        output_dir = tmp_path / "dataset"
+
+        stats = ingest_parallel(str(raw), str(output_dir), workers=2, partition_cols=['region'])
+
+        expected = pd.concat(frames).drop_duplicates()
+        result = pd.read_parquet(output_dir)
+        result['region'] = result['region'].astype(int)
+        columns = list(expected.columns)
+        assert stats['rows_written'] == len(expected)
+        pd.testing.assert_frame_equal(
+            result[columns].sort_values(columns).reset_index(drop=True),
+            expected.sort_values(columns).reset_index(drop=True)
+        )
+        assert (output_dir / "region=0").is_dir()
+
+    def test_metadata_summarizes_all_parts(self, tmp_path):
+        """Test _metadata lists every row group of the dataset"""
+        raw = tmp_path / "raw"
+        raw.mkdir()
+        for i in range(3):
+            pd.DataFrame({'feature1': range(i * 10, i * 10 + 10), 'target': 1.0}).to_csv(
+                raw / f"shard{i}.csv", index=False)
+        output_dir = tmp_path / "dataset"
+
+        ingest_parallel(str(raw), str(output_dir), workers=2)
+
+        metadata = pq.read_metadata(output_dir / "_metadata")
+        assert metadata.num_rows == 30
+        assert metadata.num_row_groups == 3
+        with pytest.raises(ValueError):
+            ingest_parallel(str(raw), str(output_dir), workers=2)
+
+
+class TestFusedPipeline:
+    """Test the single-pass ingestion + preprocessing entry point"""
+
+    def test_matches_staged_run_without_intermediate(self, tmp_path):
+        """Test fused output equals ingestion followed by preprocessing"""
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({
+            'feature1': rng.integers(0, 50, 3000),
+            'feature2': rng.normal(size=3000).round(2),
+            'target': rng.normal(size=3000)
+        })
+        df.loc[::40, 'feature2'] = np.nan
+        pd.concat([df, df.head(500)]).to_csv(tmp_path / "raw.csv", index=False)
+
+        staged = run_staged(str(tmp_path / "raw.csv"), str(tmp_path / "staged" / "processed.parquet"),
+                            str(tmp_path / "staged" / "intermediate.parquet"), block_size=16 * 1024)
+        fused = run_pipeline(str(tmp_path / "raw.csv"), str(tmp_path / "fused" / "processed.parquet"),
+                             block_size=16 * 1024)
+
+        pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / "fused" / "processed.parquet"),
+                                      pd.read_parquet(tmp_path / "staged" / "processed.parquet"))
+        assert sorted(os.listdir(tmp_path / "fused")) == ['processed.parquet', 'processed.profile.json', 'processed.transform.json']
+        assert fused['rows_written'] == staged['rows_written']
+        assert fused['bytes_read'] < staged['bytes_read']
+        assert fused['bytes_written'] < staged['bytes_written']
+
+    def test_intermediate_written_on_request(self, tmp_path):
+        """Test the debugging intermediate holds the cleaned, unscaled rows"""
+        pd.DataFrame({'feature1': [1, 1, 2, 3], 'target': [1.0, 1.0, 2.0, None]}).to_csv(
+            tmp_path / "raw.csv", index=False)
+
+        run_pipeline(str(tmp_path / "raw.csv"), str(tmp_path / "processed.parquet"),
+                     intermediate_path=str(tmp_path / "intermediate.parquet"))
+
+        assert pd.read_parquet(tmp_path / "intermediate.parquet")['feature1'].tolist() == [1, 2]
+
+
+class TestDowncast:
+    """Test dtype narrowing and its footprint report"""
+
+    def test_columns_narrowed_within_tolerance(self, tmp_path):
+        """Test ints, floats and repeated strings shrink without losing values"""
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({
+            'count': rng.integers(0, 200, 1000),
+            'offset': rng.integers(-1000, 1000, 1000),
+            'feature1': rng.normal(size=1000),
+            'city': rng.choice(['north', 'south'], 1000),
+            'target': rng.normal(size=1000)
+        })
+        df.to_parquet(tmp_path / "input.parquet", index=False)
+
+        report = downcast_parquet(str(tmp_path / "input.parquet"), str(tmp_path / "narrow.parquet"))
+
+        result = pd.read_parquet(tmp_path / "narrow.parquet")
+        assert result.dtypes.astype(str).to_dict() == {
+            'count': 'uint8', 'offset': 'int16', 'feature1': 'float32', 'city': 'category', 'target': 'float64'
+        }
+        np.testing.assert_array_equal(result['offset'], df['offset'])
+        np.testing.assert_allclose(result['feature1'], df['feature1'], rtol=1e-6)
+        assert (result['city'].astype(str) == df['city']).all()
+        assert report['bytes_after'] < report['bytes_before'] / 2
+        assert os.path.exists(report_path_for(str(tmp_path / "narrow.parquet")))
+
+    def test_zero_tolerance_keeps_inexact_floats(self, tmp_path):
+        """Test floats stay float64 unless float32 holds them within rtol"""
+        df = pd.DataFrame({'exact': [0.5, 1.25, 3.0], 'inexact': [0.1, 0.2, 0.3]})
+        df.to_parquet(tmp_path / "input.parquet", index=False)
+
+        report = downcast_parquet(str(tmp_path / "input.parquet"), str(tmp_path / "input.parquet"), rtol=0.0)
+
+        assert report['columns']['exact']['to'] == 'float'
+        assert report['columns']['inexact']['to'] == 'double'
+
+    def test_pipeline_layout_survives_downcast(self, tmp_path):
+        """Test the narrowed output keeps the layout's row-group size and codec"""
+        rng = np.random.default_rng(0)
+        pd.DataFrame({'feature1': rng.integers(0, 100, 5000), 'feature2': rng.normal(size=5000),
+                      'target': rng.normal(size=5000)}).to_csv(tmp_path / "raw.csv", index=False)
+
+        run_pipeline(str(tmp_path / "raw.csv"), str(tmp_path / "processed.parquet"), downcast=True,
+                     layout=ParquetLayout(row_group_size=1000, compression='zstd'))
+
+        metadata = pq.ParquetFile(tmp_path / "processed.parquet").metadata
+        assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [1000] * 5
+        assert metadata.row_group(0).column(0).compression == 'ZSTD'
+        assert pq.read_schema(tmp_path / "processed.parquet").field('feature1').type == pa.float32()
+
+
+class TestParquetLayout:
+    """Test configurable Parquet output layout"""
+
+    def test_streaming_output_uses_row_groups_codecs_and_clustering(self, tmp_path):
+        """Test streamed output honours row-group size, codecs and sort order"""
+        rng = np.random.default_rng(0)
+        pd.DataFrame({
+            'feature1': rng.permutation(5000),
+            'feature2': rng.normal(size=5000),
+            'target': rng.normal(size=5000)
+        }).to_csv(tmp_path / "raw.csv", index=False)
+        layout = ParquetLayout(row_group_size=1000, compression='zstd',
+                               column_compression={'target': 'lz4'}, sort_by=['feature1'],
+                               write_page_index=True)
+
+        load_data_streaming(str(tmp_path / "raw.csv"), str(tmp_path / "out.parquet"),
+                            block_size=16 * 1024, layout=layout)
+
+        metadata = pq.read_metadata(tmp_path / "out.parquet")
+        row_group = metadata.row_group(0)
+        assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [1000] * 5
+        assert row_group.column(0).compression == 'ZSTD'
+        assert row_group.column(2).compression == 'LZ4'
+        assert row_group.column(0).has_column_index
+        assert row_group.sorting_columns[0].column_index == 0
+        values = pd.read_parquet(tmp_path / "out.parquet")['feature1'].to_numpy()
+        for i in range(5):
+            assert (np.diff(values[i * 1000:(i + 1) * 1000]) >= 0).all()
+
+    def test_whole_table_sort_gives_disjoint_statistics(self, tmp_path):
+        """Test in-memory writes sort globally so row groups can be skipped"""
+        df = pd.DataFrame({'feature1': np.random.default_rng(1).permutation(4000), 'target': 1.0})
+        df.to_csv(tmp_path / "raw.csv", index=False)
+
+        load_data(str(tmp_path / "raw.csv"), str(tmp_path / "out.parquet"),
+                  layout=ParquetLayout(row_group_size=1000, sort_by=['feature1']))
+
+        metadata = pq.read_metadata(tmp_path / "out.parquet")
+        ranges = [(metadata.row_group(i).column(0).statistics.min,
+                   metadata.row_group(i).column(0).statistics.max) for i in range(4)]
+        assert ranges == [(0, 999), (1000, 1999), (2000, 2999), (3000, 3999)]
+        with pytest.raises(ValueError):
+            ParquetLayout(compression='zip')
+
+
+class TestDataProfile:
+    """Test streaming data profiles"""
+
+    def test_merged_profile_matches_exact_statistics(self):
+        """Test profiles of two halves merge into accurate whole-data statistics"""
+        rng = np.random.default_rng(0)
+        table = pa.table({
+            'feature1': pa.array(np.append(rng.normal(50, 10, 99_999), np.nan)),
+            'region': pa.array(rng.choice(['north', 'south', None], 100_000)),
+            'count': pa.array(rng.integers(0, 5000, 100_000))
+        })
+        first, second = DataProfile(table.schema), DataProfile(table.schema)
+        first.update(table.slice(0, 30_000))
+        second.update(table.slice(30_000).to_batches()[0])
+        first.merge(second)
+        columns = first.to_dict()['columns']
+
+        values = table['feature1'].to_numpy()[:-1]
+        assert first.rows == 100_000
+        assert columns['feature1']['mean'] == pytest.approx(values.mean())
+        assert columns['feature1']['std'] == pytest.approx(values.std())
+        assert columns['feature1']['min'] == values.min()
+        for q, value in columns['feature1']['quantiles'].items():
+            assert abs((values < value).mean() - float(q)) < 0.02
+        assert columns['region']['nulls'] == table['region'].null_count
+        assert columns['region']['distinct'] == 2
+        assert columns['count']['distinct'] == pytest.approx(len(np.unique(table['count'])), rel=0.05)
+
+    def test_etl_outputs_carry_profile_sidecars(self, tmp_path):
+        """Test ingestion and the fused pipeline profile exactly the rows they write"""
+        df = pd.DataFrame({'feature1': [1.0, 2.0, 2.0, None, 4.0], 'target': [1, 2, 2, 3, 4]})
+        df.to_csv(tmp_path / "raw.csv", index=False)
+
+        load_data_streaming(str(tmp_path / "raw.csv"), str(tmp_path / "ingested.parquet"))
+        run_pipeline(str(tmp_path / "raw.csv"), str(tmp_path / "processed.parquet"), downcast=True)
+
+        ingested = load_profile(str(tmp_path / "ingested.parquet"))
+        assert ingested['rows'] == 3
+        assert ingested['columns']['feature1']['max'] == 4.0
+        assert ingested['columns']['target']['distinct'] == 3
+        processed = load_profile(str(tmp_path / "processed.profile.json"))
+        assert processed['columns']['feature1']['mean'] == pytest.approx(0.0)
+        assert processed['columns']['feature1']['type'] == 'float'
+
+
+class TestArrowBackend:
+    """Test the Arrow compute backend against the pandas backend"""
+
+    def test_backends_write_the_same_data(self, tmp_path):
+        """Test cleaning and scaling give the same rows, order and values"""
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({
+            'feature1': rng.normal(50, 10, 2000).round(1),
+            'count': rng.integers(0, 5, 2000).astype(float),
+            'region': rng.choice(['north', 'south'], 2000),
+            'target': rng.normal(size=2000)
+        })
+        df = pd.concat([df, df.sample(200, random_state=0)], ignore_index=True)
+        df.loc[df.sample(50, random_state=1).index, 'feature1'] = np.nan
+        df.loc[0, 'feature1'], df.loc[1] = 0.0, df.loc[0].copy()
+        df.loc[1, 'feature1'] = -0.0
+        df.to_csv(tmp_path / "raw.csv", index=False)
+
+        for backend in ('pandas', 'arrow'):
+            load_data(str(tmp_path / "raw.csv"), str(tmp_path / backend / "ingested.parquet"), backend=backend)
+            preprocess_data(str(tmp_path / backend / "ingested.parquet"),
+                            str(tmp_path / backend / "processed.parquet"), backend=backend)
+
+        for name in ('ingested', 'processed'):
+            expected = pd.read_parquet(tmp_path / "pandas" / f"{name}.parquet")
+            actual = pd.read_parquet(tmp_path / "arrow" / f"{name}.parquet")
+            pd.testing.assert_frame_equal(actual, expected, check_exact=False, rtol=1e-12)
+
+    def test_drop_duplicates_keeps_first_occurrence(self):
+        """Test duplicate removal matches pandas' order and float equality"""
+        table = pa.table({'a': [1.0, -0.0, 1.0, 0.0, 2.0], 'b': ['x', 'y', 'x', 'y', 'x']})
+        result = drop_duplicates(table).to_pandas()
+        pd.testing.assert_frame_equal(result, table.to_pandas().drop_duplicates().reset_index(drop=True))
+
+        with pytest.raises(ValueError):
+            load_data("raw.csv", "out.parquet", backend='polars')
+
+
+class TestValidation:
+    """Test the validation stage"""
+
+    def test_failing_rows_are_quarantined_with_reasons(self, tmp_path):
+        """Test bad rows go to quarantine with the first failed check, good rows are typed"""
+        (tmp_path / "raw.csv").write_text(
+            "feature1,feature2,target\n"
+            "1.5,10,1\n"
+            "oops,20,2\n"
+            ",30,3\n"
+            "2000,40,4\n"
+            "2.5,1,5\n"
+            "3.5,50,6\n"
+        )
+        validator = Validator.from_dict({
+            'columns': {'feature1': {'type': 'float64', 'min': 0, 'max': 1000}},
+            'rules': [{'name': 'feature2_covers_feature1', 'expr': 'feature2 >= feature1 * 2'}]
+        })
+
+        stats = load_data_streaming(str(tmp_path / "raw.csv"), str(tmp_path / "out.parquet"),
+                                    validator=validator)
+
+        output = pq.read_table(tmp_path / "out.parquet")
+        assert output.schema.field('feature1').type == pa.float64()
+        assert output.column('feature1').to_pylist() == [1.5, 3.5]
+        quarantine = pd.read_parquet(tmp_path / "out.quarantine.parquet")
+        assert quarantine['_reason'].tolist() == ['type:feature1', 'null:feature1', 'range:feature1',
+                                                  'rule:feature2_covers_feature1']
+        assert quarantine['_source_row'].tolist() == [1, 2, 3, 4]
+        assert stats['validation']['rows_quarantined'] == 4
+
+        # A reused validator counts each run on its own
+        stats = load_data_streaming(str(tmp_path / "raw.csv"), str(tmp_path / "out.parquet"),
+                                    validator=validator)
+        assert stats['validation']['rows_checked'] == 6
+        assert stats['validation']['failures']['type:feature1'] == 1
+        assert pd.read_parquet(tmp_path / "out.quarantine.parquet")['_source_row'].tolist() == [1, 2, 3, 4]
+
+        (tmp_path / "raw.csv").write_text("feature1,feature2,other,target\n1.5,10,x,1\n")
+        stats = load_data_streaming(str(tmp_path / "raw.csv"), str(tmp_path / "out.parquet"),
+                                    validator=validator)
+        assert stats['validation']['rows_checked'] == 1
+        assert stats['validation']['quarantine_path'] is None
+        assert not (tmp_path / "out.quarantine.parquet").exists()
+
+    def test_null_rate_limit_and_invalid_rules(self, tmp_path):
+        """Test the stage fails on too many nulls and rejects bad rule definitions"""
+        pd.DataFrame({'feature1': [1.0, None, None, 4.0], 'target': [1, 2, 3, 4]}).to_csv(
+            tmp_path / "raw.csv", index=False)
+        validator = Validator.from_dict({'columns': {'feature1': {'max_null_rate': 0.25}}})
+
+        with pytest.raises(ValueError, match="Null rate"):
+            run_pipeline(str(tmp_path / "raw.csv"), str(tmp_path / "processed.parquet"), validator=validator)
+        assert pq.read_table(tmp_path / "processed.quarantine.parquet").num_rows == 2
+        with pytest.raises(ValueError, match="Null rate"):
+            load_data_streaming(str(tmp_path / "raw.csv"), str(tmp_path / "intermediate.parquet"),
+                                validator=validator)
+        # The failed runs leave no output for later stages to pick up
+        assert sorted(p.name for p in tmp_path.iterdir()) == [
+            'intermediate.quarantine.parquet', 'processed.quarantine.parquet', 'raw.csv']
+
+        with pytest.raises(ValueError):
+            Validator(rules=[{'name': 'bad', 'expr': '__import__("os")'}])
+        with pytest.raises(ValueError):
+            Validator(columns={'feature1': {'type': 'decimal'}})
+
+    def test_integers_out_of_range_are_quarantined(self, tmp_path):
+        """Test a well-formed integer too large for its declared type is a type failure"""
+        (tmp_path / "raw.csv").write_text("feature1,target\n12,1\n300,2\n-128,3\n99999999999999999999,4\n")
+        validator = Validator.from_dict({'columns': {'feature1': {'type': 'int8'}}})
+
+        stats = load_data_streaming(str(tmp_path / "raw.csv"), str(tmp_path / "out.parquet"),
+                                    validator=validator)
+
+        assert pq.read_table(tmp_path / "out.parquet").column('feature1').to_pylist() == [12, -128]
+        quarantine = pd.read_parquet(tmp_path / "out.quarantine.parquet")
+        assert quarantine['_reason'].tolist() == ['type:feature1', 'type:feature1']
+        assert quarantine['_source_row'].tolist() == [1, 3]
+        assert stats['validation']['rows_quarantined'] == 2
+
+    def test_type_rule_on_missing_column_is_reported(self, tmp_path):
+        """Test a typed column absent from the data fails with the validator's own error"""
+        pd.DataFrame({'feature1': [1.0, 2.0], 'target': [1, 2]}).to_csv(tmp_path / "raw.csv", index=False)
+        validator = Validator.from_dict({'columns': {'feature9': {'type': 'float64'}}})
+
+        with pytest.raises(ValueError, match="not in the data"):
+            run_pipeline(str(tmp_path / "raw.csv"), str(tmp_path / "processed.parquet"), validator=validator)
+
+
+class TestArrowIpcIntermediate:
+    """Test handing intermediates over as Arrow IPC files"""
+
+    def test_stages_match_parquet_handoff(self, tmp_path):
+        """Test both stages and both preprocessing modes give the same output through IPC"""
+        pd.DataFrame({
+            'feature1': [1.0, 2.0, 2.0, None, 5.0, 7.0],
+            'feature2': [10, 20, 20, 30, 50, 70],
+            'target': [0, 1, 1, 0, 1, 0]
+        }).to_csv(tmp_path / "raw.csv", index=False)
+
+        for suffix in ('parquet', 'arrow'):
+            load_data_streaming(str(tmp_path / "raw.csv"), str(tmp_path / f"intermediate.{suffix}"),
+                                block_size=32)
+            preprocess_data_streaming(str(tmp_path / f"intermediate.{suffix}"),
+                                      str(tmp_path / f"streamed_{suffix}.parquet"))
+            preprocess_data(str(tmp_path / f"intermediate.{suffix}"),
+                            str(tmp_path / f"batch_{suffix}.parquet"), backend='arrow')
+
+        assert read_ipc_table(str(tmp_path / "intermediate.arrow")).equals(
+            pq.read_table(tmp_path / "intermediate.parquet"))
+        assert (tmp_path / "intermediate.profile.json").exists()
+        expected = pd.read_parquet(tmp_path / "streamed_parquet.parquet")
+        for name in ('streamed_arrow', 'batch_arrow'):
+            pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / f"{name}.parquet"), expected)
+
+    def test_fused_and_in_memory_handoff(self, tmp_path):
+        """Test the fused pipeline's intermediate and load_data write IPC, and layouts are refused"""
+        pd.DataFrame({'feature1': [3.0, 1.0, 2.0], 'target': [1, 2, 3]}).to_csv(tmp_path / "raw.csv", index=False)
+
+        run_pipeline(str(tmp_path / "raw.csv"), str(tmp_path / "processed.parquet"),
+                     intermediate_path=str(tmp_path / "fused.arrow"))
+        load_data(str(tmp_path / "raw.csv"), str(tmp_path / "loaded.arrow"))
+
+        for name in ('fused.arrow', 'loaded.arrow'):
+            table = read_ipc_table(str(tmp_path / name))
+            assert table.column('feature1').to_pylist() == [3.0, 1.0, 2.0]
+        with pytest.raises(ValueError, match="layout"):
+            load_data(str(tmp_path / "raw.csv"), str(tmp_path / "x.arrow"), layout=ParquetLayout())
+
+
+class TestStageCache:
+    """Test the stage output cache"""
+
+    def test_hit_restores_outputs_without_rerunning(self, tmp_path):
+        """Test a repeated run restores the outputs and a changed input or parameter reruns"""
+        source, output = tmp_path / "raw.csv", tmp_path / "out.parquet"
+        pd.DataFrame({'feature1': [1.0, 2.0, 2.0], 'target': [0, 1, 1]}).to_csv(source, index=False)
+        cache = StageCache(str(tmp_path / "cache"))
+        calls = []
+
+        def stage():
+            calls.append(1)
+            return load_data(str(source), str(output))
+
+        def ingest(params=None):
+            return run_stage('ingestion', stage,
+                             inputs=[str(source)], outputs=[str(output), str(tmp_path / "out.profile.json")],
+                             params=params, cache=cache)
+
+        ingest()
+        assert len(calls) == 1
+        expected = pd.read_parquet(output)
+        os.remove(output)
+        os.remove(tmp_path / "out.profile.json")
+        ingest()
+        assert len(calls) == 1
+        pd.testing.assert_frame_equal(pd.read_parquet(output), expected)
+        assert (tmp_path / "out.profile.json").exists()
+        assert len(cache.entries()) == 1
+
+        ingest({'backend': 'arrow'})
+        assert len(calls) == 2
+        pd.DataFrame({'feature1': [3.0], 'target': [1]}).to_csv(source, index=False)
+        ingest()
+        assert len(calls) == 3
+        assert pd.read_parquet(output)['feature1'].tolist() == [3.0]
+        assert len(cache.entries()) == 3
+
+    def test_lru_eviction_and_clear(self, tmp_path):
+        """Test entries beyond the size limit are evicted least recently used first"""
+        cache = StageCache(str(tmp_path / "cache"), max_bytes=2500)
+        output = tmp_path / "blob.bin"
+
+        def write(content):
+            output.write_bytes(content)
+            return len(content)
+
+        for i, stage in enumerate(['a', 'b', 'c']):
+            run_stage(stage, lambda: write(bytes(1000)), inputs=[], outputs=[str(output)],
+                      params={'i': i}, cache=cache)
+            if stage == 'b':
+                # Reading 'a' makes 'b' the least recently used
+                assert run_stage('a', lambda: write(b''), inputs=[], outputs=[str(output)],
+                                 params={'i': 0}, cache=cache) == 1000
+        assert sorted(e['stage'] for e in cache.entries()) == ['a', 'c']
+        assert cache.clear('a') == 1
+        assert [e['stage'] for e in cache.entries()] == ['c']
+
+    def test_digest_memo_is_saved_per_key_and_survives_corruption(self, tmp_path):
+        """Test input digests are written once per key and a truncated memo is ignored"""
+        inputs = []
+        for i in range(3):
+            (tmp_path / f"part{i}.csv").write_text(f"feature1\n{i}\n")
+            inputs.append(str(tmp_path / f"part{i}.csv"))
+        memo = tmp_path / "cache" / "digests.json"
+        memo.parent.mkdir()
+        memo.write_text('{"truncated": ')
+
+        key = StageCache(str(tmp_path / "cache")).key('ingestion', inputs)
+
+        assert sorted(os.path.basename(p) for p in json.loads(memo.read_text())) == [
+            'part0.csv', 'part1.csv', 'part2.csv']
+        assert StageCache(str(tmp_path / "cache")).key('ingestion', inputs) == key
+        assert [p.name for p in memo.parent.iterdir()] == ['digests.json']
+
+
+class TestSyntheticData:
+    """Test the synthetic dataset generator"""
+
+    def test_output_is_reproducible_across_workers_and_formats(self, tmp_path):
+        """Test the same spec gives identical rows for any worker count, as CSV or Parquet parts"""
+        spec = SyntheticSpec.from_dict({'rows': 2500, 'seed': 7, 'features': 3, 'duplicate_rate': 0.02,
+                                        'null_rate': 0.05, 'target': {}, 'chunk_rows': 1000})
+
+        generate(spec, str(tmp_path / "one.csv"), workers=1)
+        generate(spec, str(tmp_path / "two.csv"), workers=2)
+        generate(spec, str(tmp_path / "parts"), workers=2)
+
+        assert (tmp_path / "one.csv").read_bytes() == (tmp_path / "two.csv").read_bytes()
+        csv = pd.read_csv(tmp_path / "one.csv")
+        parts = pd.read_parquet(tmp_path / "parts")
+        assert len(csv) == 2500 and len(os.listdir(tmp_path / "parts")) == 3
+        pd.testing.assert_frame_equal(parts, csv, check_exact=False, rtol=1e-12)
+
+        # Regenerating a smaller dataset replaces the old parts
+        smaller = SyntheticSpec.from_dict({'rows': 1000, 'seed': 7, 'features': 3, 'chunk_rows': 1000})
+        stats = generate(smaller, str(tmp_path / "parts"), workers=1)
+        assert len(pd.read_parquet(tmp_path / "parts")) == 1000
+        assert stats['bytes_written'] == os.path.getsize(tmp_path / "parts" / os.listdir(tmp_path / "parts")[0])
+
+    def test_rates_and_target(self):
+        """Test duplicate and null rates, the target function, and spec validation"""
+        spec = SyntheticSpec(10000, features=[
+            {'name': 'x', 'distribution': 'uniform', 'low': -1, 'high': 1},
+            {'name': 'n', 'distribution': 'integer', 'low': 0, 'high': 10, 'null_rate': 0.0},
+            {'name': 'kind', 'distribution': 'category', 'values': ['a', 'b']}
+        ], duplicate_rate=0.1, null_rate=0.2, target={'coefficients': [3.0, 0.5], 'intercept': 1.0, 'noise': 0})
+
+        df = generate_chunk(spec, 0).to_pandas()
+
+        assert df.duplicated().sum() == 1000
+        assert 0.17 < df['x'].isna().mean() < 0.23 and df['n'].notna().all()
+        complete = df.dropna()
+        np.testing.assert_allclose(complete['target'], 1.0 + 3.0 * complete['x'] + 0.5 * complete['n'])
+        with pytest.raises(ValueError):
+            SyntheticSpec(10, features=[{'name': 'x', 'distribution': 'zipf'}])
+        with pytest.raises(ValueError):
+            SyntheticSpec.from_dict({'rows': 10, 'features': 2, 'target': {'function': 'friedman'}})
+
+
+class TestKeyedDataset:
+    """Test keyed upserts, compaction and snapshot reads"""
+
+    def _records(self, ids, value):
+        return pd.DataFrame({'record_id': ids, 'feature1': np.full(len(ids), value), 'target': 1.0})
+
+    def test_upserts_merge_on_read_and_snapshots_stay_fixed(self, tmp_path):
+        """Test newer rows replace older ones while an opened snapshot keeps its view"""
+        dataset = KeyedDataset(str(tmp_path / "processed"), key=['record_id'], num_buckets=4)
+        dataset.upsert(self._records(np.arange(1000), 0.0))
+        before = dataset.snapshot()
+
+        dataset.upsert(self._records(np.array([5, 500, 5, 2000]), 1.0))
+        dataset.compact()
+
+        table = dataset.snapshot().to_table().sort_by('record_id')
+        assert table.num_rows == 1001
+        assert table.filter(pa.compute.field('feature1') == 1.0)['record_id'].to_pylist() == [5, 500, 2000]
+        assert {f['kind'] for f in dataset.snapshot().files} == {'base'}
+        assert before.to_table()['feature1'].to_pylist() == [0.0] * 1000
+
+    def test_compaction_keeps_deltas_committed_since_and_expire_cleans_up(self, tmp_path):
+        """Test a delta committed during compaction still wins and expired files are removed"""
+        root = tmp_path / "processed"
+        dataset = KeyedDataset(str(root), key=['record_id'], num_buckets=2)
+        dataset.upsert(self._records(np.arange(100), 0.0))
+        dataset.upsert(self._records(np.arange(10), 1.0))
+        planned = dataset.snapshot
+
+        def snapshot_then_upsert(version=None):
+            # An upsert lands between compaction reading the snapshot and committing
+            snapshot = planned(version)
+            if version is None and snapshot.version == 2:
+                dataset.snapshot = planned
+                dataset.upsert(self._records(np.arange(3), 2.0))
+            return snapshot
+
+        dataset.snapshot = snapshot_then_upsert
+        summary = dataset.compact()
+
+        assert summary['version'] == 4
+        values = dataset.snapshot().to_table().sort_by('record_id')['feature1'].to_pylist()
+        assert values == [2.0] * 3 + [1.0] * 7 + [0.0] * 90
+        dataset.expire(keep=1)
+        assert dataset.versions() == [4]
+        on_disk = {os.path.relpath(p, root) for p in glob.glob(str(root / "bucket-*" / "*.parquet"))}
+        assert on_disk == {f['path'] for f in dataset.snapshot().files}
+        with pytest.raises(ValueError):
+            dataset.upsert(pd.DataFrame({'feature1': [1.0], 'target': [1.0]}))
+
+
+class TestEnrichment:
+    """Test the streaming broadcast hash join with dimension tables"""
+
+    def _facts(self, path):
+        pd.DataFrame({
+            'store_id': [1, 2, 9, 1, 2, 3],
+            'sku': ['a', 'b', 'a', 'c', 'a', 'b'],
+            'feature1': np.arange(6, dtype=float),
+            'target': np.arange(6, dtype=float) * 2
+        }).to_csv(path, index=False)
+
+    def test_left_join_streams_batches_and_counts_hits(self, tmp_path):
+        """Test lookups on single and composite keys match a pandas merge, with defaults for misses"""
+        self._facts(tmp_path / "facts.csv")
+        stores = pa.table({'store_id': pa.array([1, 2, 3], pa.int32()), 'region': ['n', 's', 'e']})
+        prices = pa.table({'store_id': [1, 2], 'product': ['a', 'a'], 'price': [10.0, 20.0]})
+        dimensions = [Dimension('stores', stores, 'store_id', prefix='store_'),
+                      Dimension('prices', prices, ['store_id', 'product'], fact_key=['store_id', 'sku'],
+                                defaults={'price': 0.0})]
+
+        stats = enrich_streaming(str(tmp_path / "facts.csv"), str(tmp_path / "enriched.parquet"), dimensions,
+                                 block_size=64)
+
+        table = pq.read_table(tmp_path / "enriched.parquet")
+        assert stats['batches'] > 1
+        assert table['store_region'].to_pylist() == ['n', 's', None, 'n', 's', 'e']
+        assert table['price'].to_pylist() == [10.0, 0.0, 0.0, 0.0, 20.0, 0.0]
+        assert stats['joins']['stores'] == {'hits': 5, 'misses': 1, 'hit_rate': 5 / 6}
+        assert stats['joins']['prices']['hits'] == 2
+        assert load_profile(str(tmp_path / "enriched.parquet"))['rows'] == 6
+
+    def test_pipeline_joins_before_scaling_and_rejects_bad_dimensions(self, tmp_path):
+        """Test the fused pipeline scales joined features and inner joins drop misses"""
+        self._facts(tmp_path / "facts.csv")
+        stores = pa.table({'store_id': [1, 2, 3], 'store_size': [100.0, 200.0, 300.0]})
+        enricher = Enricher([Dimension('stores', stores, 'store_id')], how='inner')
+
+        stats = run_pipeline(str(tmp_path / "facts.csv"), str(tmp_path / "processed.parquet"), enricher=enricher)
+
+        df = pd.read_parquet(tmp_path / "processed.parquet")
+        assert stats['rows_written'] == 5
+        assert stats['joins']['stores']['misses'] == 1
+        assert abs(df['store_size'].mean()) < 1e-9
+        with pytest.raises(ValueError):
+            Dimension('stores', pa.table({'store_id': [1, 1], 'store_size': [1.0, 2.0]}), 'store_id')
+        with pytest.raises(ValueError):
+            Enricher([Dimension('stores', stores, 'store_id')]).output_schema(stores.schema)
+
+
+class TestScalingCompare:
+    """Test the ETL scaling benchmark's regression gate"""
+
+    def test_slower_failed_and_missing_runs_are_regressions(self):
+        """Test a slowdown, a crashed stage and a dropped run are flagged; others pass"""
+        def run(stage, rows, **measured):
+            return {'stage': stage, 'rows': rows, 'cores': 1, **measured}
+
+        baseline = {'backend': 'pandas', 'results': [
+            run('ingest', 100, seconds=1.0, peak_rss_mb=100),
+            run('preprocess', 100, seconds=1.0, peak_rss_mb=100),
+            run('etl', 100, seconds=1.0, peak_rss_mb=100),
+            run('pipeline', 100, seconds=1.0, peak_rss_mb=100)
+        ]}
+        current = {'backend': 'pandas', 'results': [
+            run('ingest', 100, seconds=1.05, peak_rss_mb=100),
+            run('preprocess', 100, seconds=1.5, peak_rss_mb=100),
+            run('etl', 100, failed=1),
+            run('ingest', 1000, seconds=9.0, peak_rss_mb=100)
+        ]}
+
+        rows = {row['stage']: row for row in compare(baseline, current)}
+
+        assert {stage: (row['status'], row['regression']) for stage, row in rows.items()} == {
+            'ingest': ('ok', False), 'preprocess': ('ok', True),
+            'etl': ('failed', True), 'pipeline': ('missing', True)}
+        with pytest.raises(ValueError):
+            compare(baseline, {'backend': 'arrow', 'results': []})
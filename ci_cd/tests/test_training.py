@@ -0,0 +1,93 @@
+import pytest
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from sklearn.ensemble import RandomForestRegressor
+import joblib
+
+from etl.keyed_dataset import KeyedDataset
+from etl.parquet_layout import ParquetLayout
+from training.data_reader import read_training_data
+from training.evaluate_model import evaluate_model
+
+
+@pytest.fixture
+def sorted_dataset(tmp_path):
+    """Parquet file sorted by event_time in 8 row groups, with an unused column"""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'event_time': np.arange(8000),
+        'feature1': rng.normal(50, 10, 8000),
+        'feature2': rng.normal(75, 15, 8000),
+        'notes': rng.normal(size=8000),
+    })
+    df['target'] = df['feature1'] * 2 + df['feature2']
+    path = tmp_path / "processed.parquet"
+    ParquetLayout(row_group_size=1000).write_table(pa.Table.from_pandas(df, preserve_index=False), str(path))
+    return str(path), df
+
+
+class TestDataReader:
+    """Test column and row filter pushdown for training data"""
+
+    def test_columns_and_filters_skip_data_on_disk(self, sorted_dataset):
+        """Test only requested columns and matching row groups are read"""
+        path, df = sorted_dataset
+
+        X, y, stats = read_training_data(path, columns=['feature1'], filters=[('event_time', '<', 1500)])
+
+        assert list(X.columns) == ['feature1']
+        np.testing.assert_array_equal(y, df['target'][:1500])
+        assert (stats['row_groups_read'], stats['row_groups_total']) == (2, 8)
+        assert stats['bytes_read'] < stats['bytes_total'] / 4
+
+    def test_partitioned_dataset_defaults_to_numeric_features(self, tmp_path):
+        """Test hive partition values filter files and are not used as features"""
+        for day, start in (('2025-01-01', 0), ('2025-01-02', 10)):
+            part = tmp_path / f"ingest_date={day}"
+            part.mkdir()
+            pd.DataFrame({'feature1': range(start, start + 10), 'target': 1.0}).to_parquet(
+                part / "part-0.parquet", index=False)
+
+        X, _, stats = read_training_data(str(tmp_path), filters=[('ingest_date', '=', '2025-01-02')])
+
+        assert list(X.columns) == ['feature1']
+        assert X['feature1'].tolist() == list(range(10, 20))
+        assert stats['row_groups_read'] == 1
+
+    def test_keyed_dataset_reads_latest_snapshot(self, tmp_path):
+        """Test upserted rows replace old ones before filtering and keys are not features"""
+        dataset = KeyedDataset(str(tmp_path / "processed"), key=['record_id'], num_buckets=2)
+        dataset.upsert(pd.DataFrame({'record_id': range(10), 'feature1': 1.0, 'target': 0.0}))
+        dataset.upsert(pd.DataFrame({'record_id': [3], 'feature1': -1.0, 'target': 0.0}))
+
+        X, _, stats = read_training_data(str(tmp_path / "processed"), filters=[('feature1', '>', 0)])
+
+        assert list(X.columns) == ['feature1']
+        assert len(X) == 9
+        assert stats['snapshot'] == 2
+
+
+class TestEvaluateModel:
+    """Test model evaluation"""
+
+    def test_evaluates_on_model_features_and_logs_bytes(self, sorted_dataset, tmp_path):
+        """Test evaluation reads only the model's features and records bytes read"""
+        path, df = sorted_dataset
+        model = RandomForestRegressor(n_estimators=5, random_state=0).fit(
+            df[['feature1', 'feature2']], df['target'])
+        joblib.dump(model, tmp_path / "model.pkl")
+        metrics_path = tmp_path / "metrics.json"
+
+        metrics = evaluate_model(str(tmp_path / "model.pkl"), path, str(metrics_path),
+                                 filters=[('event_time', '>=', 7000)])
+
+        assert metrics['r2_score'] > 0.9
+        assert 0 < metrics['data_bytes_read'] < metrics['data_bytes_total']
+        assert json.loads(metrics_path.read_text()) == metrics
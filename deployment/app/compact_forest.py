@@ -0,0 +1,378 @@
+"""
+Compact, inference-only representation of a tree ensemble.
+
+A fitted scikit-learn forest carries per-node training metadata (impurity,
+sample counts, weighted counts, full value arrays) that prediction never
+reads. ``CompactForest`` keeps only what tree traversal needs, stored in
+narrow dtypes, and predicts with NumPy alone.
+"""
+import json
+import os
+import sys
+from typing import List, Optional
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+# Bump whenever traversal semantics change so cached snapshots are rebuilt.
+ENGINE_VERSION = "1"
+
+SUPPORTED_MODELS = ("RandomForestRegressor", "ExtraTreesRegressor", "DecisionTreeRegressor")
+
+# Rows traversed per chunk; bounds the (rows x trees) node-index matrix.
+PREDICT_CHUNK_ROWS = 8192
+
+
+def _narrow_int_dtype(max_value: int) -> np.dtype:
+    """Smallest signed integer dtype able to hold ``max_value``"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if max_value <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _float32_floor(values: np.ndarray) -> np.ndarray:
+    """
+    Round float64 thresholds down to the nearest float32.
+
+    scikit-learn casts inputs to float32 and tests ``x <= threshold`` against
+    a float64 threshold. For any float32 ``x`` that test is equivalent to
+    ``x <= floor32(threshold)``, so the narrowed thresholds route every
+    sample exactly as the original tree does.
+    """
+    narrowed = values.astype(np.float32)
+    too_high = narrowed.astype(np.float64) > values
+    narrowed[too_high] = np.nextafter(narrowed[too_high], np.float32(-np.inf))
+    return narrowed
+
+
+def features_to_matrix(features, feature_names: Optional[List[str]], n_features: int,
+                       dtype=np.float32) -> np.ndarray:
+    """
+    Coerce a DataFrame or array-like into a 2-D matrix in model column order
+
+    DataFrames are matched by column name when ``feature_names`` is known;
+    arrays are assumed to already be in training column order.
+    """
+    if hasattr(features, "columns"):
+        if feature_names is not None:
+            missing = [c for c in feature_names if c not in features.columns]
+            if missing:
+                raise ValueError(f"Missing feature columns: {missing}")
+            features = features[feature_names]
+        # Convert straight to the target dtype: mixed narrow columns (e.g.
+        # int16 and float32) would otherwise go through a float64 copy
+        features = features.to_numpy(dtype=dtype)
+    X = np.asarray(features, dtype=dtype)
+    if X.ndim == 1:
+        X = X.reshape(1, -1)
+    if X.shape[1] != n_features:
+        raise ValueError(f"Expected {n_features} features, got {X.shape[1]}")
+    return X
+
+
+class CompactForest:
+    """
+    Flattened tree ensemble used for serving.
+
+    All trees are concatenated into shared node arrays. Child indices are
+    local to their tree and ``roots`` holds each tree's offset. Leaves point
+    to themselves, so a fixed number of vectorized steps (the maximum tree
+    depth) walks every sample to its leaf in every tree at once.
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray,
+                 children_left: np.ndarray, children_right: np.ndarray,
+                 value: np.ndarray, roots: np.ndarray, max_depth: int,
+                 n_features: int, feature_names: Optional[List[str]] = None,
+                 missing_left: Optional[np.ndarray] = None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children_left = children_left
+        self.children_right = children_right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        self.missing_left = missing_left
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the node arrays"""
+        arrays = [self.feature, self.threshold, self.children_left,
+                  self.children_right, self.value, self.roots]
+        if self.missing_left is not None:
+            arrays.append(self.missing_left)
+        return sum(a.nbytes for a in arrays)
+
+    @classmethod
+    def from_sklearn(cls, model) -> "CompactForest":
+        """
+        Convert a fitted scikit-learn tree regressor
+
+        Args:
+            model: Fitted RandomForestRegressor, ExtraTreesRegressor or
+                DecisionTreeRegressor with a single output
+
+        Returns:
+            CompactForest with identical predictions
+        """
+        model_type = type(model).__name__
+        if model_type not in SUPPORTED_MODELS:
+            raise ValueError(f"Unsupported model type for compact export: {model_type}")
+
+        estimators = getattr(model, "estimators_", [model])
+        trees = [est.tree_ for est in estimators]
+        if any(t.n_outputs != 1 for t in trees):
+            raise ValueError("Compact export supports single-output regressors only")
+
+        sizes = np.array([t.node_count for t in trees])
+        roots = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        n_features = int(model.n_features_in_)
+
+        index_dtype = _narrow_int_dtype(int(sizes.max()))
+        feature_dtype = _narrow_int_dtype(n_features)
+
+        feature, threshold, left, right, value, missing = [], [], [], [], [], []
+        for t in trees:
+            is_leaf = t.children_left < 0
+            local = np.arange(t.node_count)
+            feature.append(np.where(is_leaf, 0, t.feature))
+            threshold.append(np.where(is_leaf, 0.0, t.threshold))
+            left.append(np.where(is_leaf, local, t.children_left))
+            right.append(np.where(is_leaf, local, t.children_right))
+            value.append(t.value[:, 0, 0])
+            if hasattr(t, "missing_go_to_left"):
+                missing.append(np.where(is_leaf, 0, t.missing_go_to_left).astype(bool))
+
+        missing_left = np.concatenate(missing) if len(missing) == len(trees) else None
+        if missing_left is not None and not missing_left.any():
+            missing_left = None
+
+        feature_names = getattr(model, "feature_names_in_", None)
+        return cls(
+            feature=np.concatenate(feature).astype(feature_dtype),
+            threshold=_float32_floor(np.concatenate(threshold)),
+            children_left=np.concatenate(left).astype(index_dtype),
+            children_right=np.concatenate(right).astype(index_dtype),
+            value=np.concatenate(value).astype(np.float32),
+            roots=roots.astype(np.int64),
+            max_depth=max(t.max_depth for t in trees),
+            n_features=n_features,
+            feature_names=[str(n) for n in feature_names] if feature_names is not None else None,
+            missing_left=missing_left,
+        )
+
+    def as_matrix(self, features) -> np.ndarray:
+        """Coerce a DataFrame or array-like into a float32 matrix in model column order"""
+        return features_to_matrix(features, self.feature_names, self.n_features)
+
+    def matrix_from_records(self, records: List[dict], dtype=np.float32) -> np.ndarray:
+        """Build an input matrix from feature dictionaries, in model column order"""
+        if self.feature_names is None:
+            raise ValueError("Model has no feature names; pass a 2-D array instead")
+        missing = [c for c in self.feature_names if any(c not in r for r in records)]
+        if missing:
+            raise ValueError(f"Missing feature columns: {missing}")
+        X = np.empty((len(records), self.n_features), dtype=dtype)
+        for i, record in enumerate(records):
+            X[i] = [record[name] for name in self.feature_names]
+        return X
+
+    def _predict_chunk(self, X: np.ndarray) -> np.ndarray:
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_trees))
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[nodes]]
+            go_left = x <= self.threshold[nodes]
+            if self.missing_left is not None:
+                go_left |= np.isnan(x) & self.missing_left[nodes]
+            local = np.where(go_left, self.children_left[nodes], self.children_right[nodes])
+            nodes = self.roots + local
+        return self.value[nodes].mean(axis=1, dtype=np.float64)
+
+    def predict(self, features) -> np.ndarray:
+        """
+        Predict with the flattened forest
+
+        Args:
+            features: DataFrame (matched by column name) or 2-D array
+
+        Returns:
+            Array of predictions
+        """
+        X = self.as_matrix(features)
+        if len(X) <= PREDICT_CHUNK_ROWS:
+            return self._predict_chunk(X)
+        return np.concatenate([
+            self._predict_chunk(X[start:start + PREDICT_CHUNK_ROWS])
+            for start in range(0, len(X), PREDICT_CHUNK_ROWS)
+        ])
+
+    def _arrays(self) -> dict:
+        arrays = {
+            "feature": self.feature,
+            "threshold": self.threshold,
+            "children_left": self.children_left,
+            "children_right": self.children_right,
+            "value": self.value,
+            "roots": self.roots,
+        }
+        if self.missing_left is not None:
+            arrays["missing_left"] = self.missing_left
+        return arrays
+
+    @classmethod
+    def _from_arrays(cls, arrays: dict, metadata: dict, source: str) -> "CompactForest":
+        if metadata.get("format_version") != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported compact model format {metadata.get('format_version')} in {source}"
+            )
+        return cls(
+            feature=arrays["feature"],
+            threshold=arrays["threshold"],
+            children_left=arrays["children_left"],
+            children_right=arrays["children_right"],
+            value=arrays["value"],
+            roots=arrays["roots"],
+            max_depth=metadata["max_depth"],
+            n_features=metadata["n_features"],
+            feature_names=metadata["feature_names"],
+            missing_left=arrays.get("missing_left"),
+        )
+
+    def _metadata(self) -> dict:
+        return {
+            "format_version": FORMAT_VERSION,
+            "max_depth": self.max_depth,
+            "n_features": self.n_features,
+            "feature_names": self.feature_names,
+        }
+
+    def save(self, path: str):
+        """Write the forest as an uncompressed ``.npz`` archive"""
+        arrays = self._arrays()
+        arrays["metadata"] = np.array(json.dumps(self._metadata()))
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "CompactForest":
+        """Load a forest written by :meth:`save`"""
+        with np.load(path, allow_pickle=False) as data:
+            metadata = json.loads(str(data["metadata"]))
+            arrays = {name: data[name] for name in data.files if name != "metadata"}
+        return cls._from_arrays(arrays, metadata, path)
+
+    def save_snapshot(self, directory: str):
+        """
+        Write the forest as one ``.npy`` file per array plus ``metadata.json``
+
+        Unlike the ``.npz`` archive, this layout can be memory-mapped.
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name, array in self._arrays().items():
+            np.save(os.path.join(directory, f"{name}.npy"), array, allow_pickle=False)
+        with open(os.path.join(directory, "metadata.json"), "w") as f:
+            json.dump(self._metadata(), f)
+
+    @classmethod
+    def load_snapshot(cls, directory: str, mmap_mode: Optional[str] = "r") -> "CompactForest":
+        """
+        Load a forest written by :meth:`save_snapshot`
+
+        Args:
+            directory: Snapshot directory
+            mmap_mode: ``np.load`` memory-map mode, or None to read into memory
+        """
+        with open(os.path.join(directory, "metadata.json")) as f:
+            metadata = json.load(f)
+        arrays = {
+            os.path.splitext(name)[0]: np.load(os.path.join(directory, name),
+                                               mmap_mode=mmap_mode, allow_pickle=False)
+            for name in os.listdir(directory) if name.endswith(".npy")
+        }
+        return cls._from_arrays(arrays, metadata, directory)
+
+
+def export_compact_forest(model, output_path: str, X_check=None,
+                          rtol: float = 1e-5, atol: float = 1e-6) -> CompactForest:
+    """
+    Convert a fitted forest and save it as a compact serving artifact
+
+    Args:
+        model: Fitted scikit-learn tree regressor
+        output_path: Destination ``.npz`` path
+        X_check: Optional sample used to verify predictions against ``model``
+        rtol: Relative tolerance for the verification
+        atol: Absolute tolerance for the verification
+
+    Returns:
+        The exported CompactForest
+    """
+    forest = CompactForest.from_sklearn(model)
+
+    if X_check is not None:
+        expected = model.predict(X_check)
+        actual = forest.predict(X_check)
+        if not np.allclose(actual, expected, rtol=rtol, atol=atol):
+            max_error = float(np.max(np.abs(actual - expected)))
+            raise ValueError(f"Compact forest predictions diverge from the original (max error {max_error:.3g})")
+
+    forest.save(output_path)
+    return forest
+
+
+def sample_inputs(forest: CompactForest, n_samples: int = 10000, seed: int = 0) -> np.ndarray:
+    """Random inputs spanning the split thresholds of every feature"""
+    rng = np.random.default_rng(seed)
+    tree_sizes = np.diff(np.append(forest.roots, forest.n_nodes))
+    local = np.arange(forest.n_nodes) - np.repeat(forest.roots, tree_sizes)
+    internal = forest.children_left != local
+    X = np.empty((n_samples, forest.n_features), dtype=np.float32)
+    for f in range(forest.n_features):
+        splits = forest.threshold[internal & (forest.feature == f)]
+        low, high = (float(splits.min()), float(splits.max())) if len(splits) else (0.0, 1.0)
+        margin = (high - low) * 0.1 + 1e-3
+        X[:, f] = rng.uniform(low - margin, high + margin, n_samples)
+    return X
+
+
+if __name__ == "__main__":
+    import time
+    import joblib
+
+    source = sys.argv[1] if len(sys.argv) > 1 else "models/saved_model.pkl"
+    target = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(source)[0] + ".npz"
+
+    start = time.perf_counter()
+    sk_model = joblib.load(source)
+    pickle_load = time.perf_counter() - start
+
+    compact = export_compact_forest(sk_model, target)
+    X_sample = sample_inputs(compact)
+    error = np.max(np.abs(compact.predict(X_sample) - sk_model.predict(X_sample)))
+
+    start = time.perf_counter()
+    CompactForest.load(target)
+    compact_load = time.perf_counter() - start
+
+    print(f"Compact model saved to {target}")
+    print(f"  Size:      {os.path.getsize(source) / 1024:.1f} KB -> {os.path.getsize(target) / 1024:.1f} KB")
+    print(f"  Load time: {pickle_load * 1000:.1f} ms -> {compact_load * 1000:.1f} ms")
+    print(f"  Node data: {compact.nbytes / 1024:.1f} KB ({compact.n_trees} trees, {compact.n_nodes} nodes)")
+    print(f"  Max abs prediction error on {len(X_sample)} samples: {error:.3g}")
@@ -0,0 +1,174 @@
+"""
+Inference engines and load-time engine selection.
+
+The fastest way to score a batch depends on its size and on the model
+shape: scikit-learn's ``predict`` has a fixed per-call overhead, the
+flattened NumPy forest is cheap for small and medium batches, and a process
+pool pays off only for large batches on multi-core hosts. The pool holds a
+copy of the forest per worker, so it is built only when asked for.
+``calibrate`` times every available engine over representative batch sizes
+and builds a dispatch table that ``select_engine`` consults per request.
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .compact_forest import CompactForest
+
+CALIBRATION_BATCH_SIZES = (1, 32, 1024, 8192)
+
+# Batches smaller than this are never sent to the process pool.
+POOL_MIN_BATCH = 1024
+
+# Upper bound on process pool workers, whatever was requested
+MAX_POOL_WORKERS = 8
+
+
+class SklearnEngine:
+    """Scikit-learn's own ``predict``"""
+
+    name = "sklearn"
+
+    def __init__(self, model):
+        self.model = model
+        self.feature_names = getattr(model, "feature_names_in_", None)
+
+    def predict(self, X) -> np.ndarray:
+        if isinstance(X, np.ndarray) and self.feature_names is not None:
+            import pandas as pd
+            X = pd.DataFrame(X, columns=self.feature_names)
+        return self.model.predict(X)
+
+    def close(self):
+        pass
+
+
+class NumpyForestEngine:
+    """Vectorized traversal of the flattened forest in-process"""
+
+    name = "numpy"
+
+    def __init__(self, forest: CompactForest):
+        self.forest = forest
+
+    def predict(self, X) -> np.ndarray:
+        return self.forest.predict(X)
+
+    def close(self):
+        pass
+
+
+_worker_forest = None
+
+
+def _init_worker(forest: CompactForest):
+    global _worker_forest
+    _worker_forest = forest
+
+
+def _predict_in_worker(X: np.ndarray) -> np.ndarray:
+    return _worker_forest.predict(X)
+
+
+class ProcessPoolEngine:
+    """Flattened forest scored in row chunks across worker processes"""
+
+    name = "process_pool"
+
+    def __init__(self, forest: CompactForest, workers: int):
+        self.forest = forest
+        self.workers = workers
+        self._pool = None
+
+    def predict(self, X) -> np.ndarray:
+        X = self.forest.as_matrix(X)
+        if self._pool is None:
+            # spawn rather than fork: the API process runs server threads
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.forest,),
+            )
+        chunks = np.array_split(X, min(self.workers, len(X)))
+        return np.concatenate(list(self._pool.map(_predict_in_worker, chunks)))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+
+def build_engines(model=None, forest: Optional[CompactForest] = None,
+                  pool_workers: Optional[int] = None) -> Dict[str, object]:
+    """
+    Instantiate every engine the loaded artifacts support
+
+    Args:
+        model: Fitted scikit-learn estimator, if one was unpickled
+        forest: Flattened forest, if the model could be converted
+        pool_workers: Process pool size; the pool engine is only offered
+            when this is set, and then capped at the CPU count and
+            MAX_POOL_WORKERS, leaving at least two workers
+
+    Returns:
+        Mapping of engine name to engine, in default preference order
+    """
+    engines = {}
+    if forest is not None:
+        engines[NumpyForestEngine.name] = NumpyForestEngine(forest)
+    if model is not None and not isinstance(model, CompactForest):
+        engines[SklearnEngine.name] = SklearnEngine(model)
+    workers = min(pool_workers or 0, os.cpu_count() or 1, MAX_POOL_WORKERS)
+    if forest is not None and workers > 1:
+        engines[ProcessPoolEngine.name] = ProcessPoolEngine(forest, workers)
+    return engines
+
+
+def calibrate(engines: Dict[str, object], sample: np.ndarray,
+              batch_sizes=CALIBRATION_BATCH_SIZES, repeats: int = 3) -> List[dict]:
+    """
+    Time each engine per batch size and pick the fastest
+
+    Args:
+        engines: Engines returned by :func:`build_engines`
+        sample: Representative input rows (recycled to fill large batches)
+        batch_sizes: Batch sizes to measure, ascending
+        repeats: Timed runs per engine and size; the best run is kept
+
+    Returns:
+        Dispatch table: one entry per batch size with the winning engine
+        and the measured timings in milliseconds
+    """
+    table = []
+    for size in batch_sizes:
+        X = sample[np.arange(size) % len(sample)]
+        timings = {}
+        for name, engine in engines.items():
+            if name == ProcessPoolEngine.name and size < POOL_MIN_BATCH:
+                continue
+            engine.predict(X)  # warm-up: pool start-up, lazy imports, caches
+            best = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                engine.predict(X)
+                best = min(best, time.perf_counter() - start)
+            timings[name] = best
+        table.append({
+            "max_batch_size": size,
+            "engine": min(timings, key=timings.get),
+            "timings_ms": {name: round(t * 1000, 3) for name, t in timings.items()},
+        })
+    return table
+
+
+def select_engine(dispatch_table: List[dict], batch_size: int) -> str:
+    """Engine for ``batch_size``; sizes past the last entry use the last engine"""
+    for entry in dispatch_table:
+        if entry["max_batch_size"] is None or batch_size <= entry["max_batch_size"]:
+            return entry["engine"]
+    return dispatch_table[-1]["engine"]
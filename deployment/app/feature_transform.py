@@ -0,0 +1,128 @@
+"""
+Persisted feature standardization shared by preprocessing and serving.
+
+Preprocessing fits per-column means and scales and saves them as a small
+JSON artifact next to its output; training saves it next to the model,
+bound to the model's ordered feature list so that a sidecar left over from
+another model is refused at load. At serving time the same
+:meth:`FeatureTransform.apply` scales the input matrix in place, so the
+feature logic exists once and predictions see exactly the values the model
+was trained on.
+"""
+import json
+import os
+from typing import List, Optional
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+SIDECAR_SUFFIX = ".transform.json"
+
+
+def transform_path_for(path: str) -> str:
+    """Sidecar path for a data or model file (``x.parquet`` -> ``x.transform.json``)"""
+    return os.path.splitext(path)[0] + SIDECAR_SUFFIX
+
+
+class FeatureTransform:
+    """
+    Standardization ``(x - mean) / scale`` over named columns
+
+    Attributes:
+        columns: Feature names, in the order of ``mean`` and ``scale``
+        mean, scale: float64 per-column parameters
+        model_features: Ordered input columns of the model this transform
+            was saved with, or None if it is not bound to a model
+    """
+
+    def __init__(self, columns: List[str], mean, scale, model_features: Optional[List[str]] = None):
+        self.columns = list(columns)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.model_features = list(model_features) if model_features is not None else None
+        if not len(self.columns) == len(self.mean) == len(self.scale):
+            raise ValueError("columns, mean and scale must have the same length")
+
+    @classmethod
+    def from_scaler(cls, columns: List[str], scaler) -> "FeatureTransform":
+        """Wrap a fitted ``StandardScaler`` (only its ``mean_``/``scale_`` are read)"""
+        return cls(columns, scaler.mean_, scaler.scale_)
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """
+        Standardize a 2-D matrix in place, columns in ``self.columns`` order
+
+        Uses the same operations as ``StandardScaler.transform`` so results
+        are bit-identical to it.
+        """
+        np.subtract(X, self.mean, out=X)
+        np.divide(X, self.scale, out=X)
+        return X
+
+    def bound_to(self, feature_names: List[str]) -> "FeatureTransform":
+        """The same transform, recorded as belonging to a model with these input columns"""
+        return FeatureTransform(self.columns, self.mean, self.scale, model_features=feature_names)
+
+    def check_model(self, feature_names: Optional[List[str]], n_features: Optional[int] = None):
+        """
+        Raise ValueError unless this transform was bound to a model with the
+        given input columns (or, when names are unknown, the given width)
+        """
+        if self.model_features is None:
+            raise ValueError("Transform is not bound to a model")
+        if feature_names is not None:
+            if list(feature_names) != self.model_features:
+                raise ValueError(f"Transform was saved for a model with features {self.model_features}, "
+                                 f"not {list(feature_names)}")
+        elif n_features is not None and n_features != len(self.model_features):
+            raise ValueError(f"Transform was saved for a model with {len(self.model_features)} features, "
+                             f"not {n_features}")
+
+    def aligned(self, feature_names: Optional[List[str]], n_features: Optional[int] = None) -> "FeatureTransform":
+        """
+        Reorder to a model's feature order; features the transform does not
+        cover pass through unchanged
+
+        Args:
+            feature_names: Model input columns, or None if unknown
+            n_features: Model input width, checked when names are unknown
+        """
+        if feature_names is None:
+            if n_features is not None and n_features != len(self.columns):
+                raise ValueError(
+                    f"Transform covers {len(self.columns)} columns but the model expects {n_features}"
+                )
+            return self
+        index = {name: i for i, name in enumerate(self.columns)}
+        mean = np.zeros(len(feature_names))
+        scale = np.ones(len(feature_names))
+        for j, name in enumerate(feature_names):
+            if name in index:
+                mean[j] = self.mean[index[name]]
+                scale[j] = self.scale[index[name]]
+        return FeatureTransform(feature_names, mean, scale, self.model_features)
+
+    def save(self, path: str):
+        """Write the transform as a versioned JSON artifact"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({
+                "format_version": FORMAT_VERSION,
+                "kind": "standard_scaler",
+                "columns": self.columns,
+                "mean": self.mean.tolist(),
+                "scale": self.scale.tolist(),
+                "model_features": self.model_features,
+            }, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "FeatureTransform":
+        """Load a transform written by :meth:`save`"""
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported transform format {data.get('format_version')} in {path}")
+        return cls(data["columns"], data["mean"], data["scale"], data.get("model_features"))
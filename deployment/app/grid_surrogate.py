@@ -0,0 +1,188 @@
+"""
+Lookup-table surrogate for low-dimensional models.
+
+For a model with only a few input features, the forest can be evaluated once
+on a dense grid spanning the observed feature ranges. Serving then answers
+in O(1) per row, by nearest-cell lookup or multilinear interpolation, and
+falls back to the exact model for rows outside the grid. The surrogate
+records its error against the exact model on a held-out set, so its
+accuracy is documented alongside the table.
+"""
+import itertools
+import json
+import os
+import time
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from .compact_forest import features_to_matrix
+
+FORMAT_VERSION = 1
+
+# Grids grow as resolution ** n_features; keep them small enough to serve.
+MAX_FEATURES = 3
+MAX_CELLS = 16 * 1024 * 1024
+
+MODES = ("nearest", "linear")
+
+
+class GridSurrogate:
+    """
+    Dense prediction table over a regular grid
+
+    Attributes:
+        lower, upper: Grid bounds per feature (observed training ranges)
+        table: float32 predictions at the grid points, one axis per feature
+        mode: ``"nearest"`` lookup or ``"linear"`` (multilinear) interpolation
+        metadata: Build settings and held-out accuracy/latency figures
+    """
+
+    def __init__(self, lower: np.ndarray, upper: np.ndarray, table: np.ndarray,
+                 mode: str = "nearest", feature_names: Optional[List[str]] = None,
+                 metadata: Optional[dict] = None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown surrogate mode '{mode}', expected one of {MODES}")
+        self.lower = np.asarray(lower, dtype=np.float64)
+        self.upper = np.asarray(upper, dtype=np.float64)
+        self.table = table
+        self.mode = mode
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        self.metadata = metadata or {}
+        self.resolution = np.array(table.shape)
+        self.step = (self.upper - self.lower) / (self.resolution - 1)
+
+    @property
+    def n_features(self) -> int:
+        return self.table.ndim
+
+    @classmethod
+    def build(cls, predict_fn: Callable[[np.ndarray], np.ndarray], X_observed: np.ndarray,
+              resolution: int = 256, mode: str = "nearest",
+              feature_names: Optional[List[str]] = None) -> "GridSurrogate":
+        """
+        Evaluate a model on a grid over the observed feature ranges
+
+        Args:
+            predict_fn: Exact model prediction on a 2-D array
+            X_observed: Training inputs defining the per-feature ranges
+            resolution: Grid points per feature
+            mode: Lookup mode used at serving time
+            feature_names: Column names, in ``X_observed`` column order
+
+        Returns:
+            GridSurrogate covering the observed ranges
+        """
+        X_observed = np.asarray(X_observed, dtype=np.float64)
+        n_features = X_observed.shape[1]
+        if n_features > MAX_FEATURES:
+            raise ValueError(f"Grid surrogates support at most {MAX_FEATURES} features, got {n_features}")
+        if resolution ** n_features > MAX_CELLS:
+            raise ValueError(f"Grid of {resolution}^{n_features} cells exceeds {MAX_CELLS}")
+
+        lower, upper = X_observed.min(axis=0), X_observed.max(axis=0)
+        if np.any(upper <= lower):
+            raise ValueError("Grid surrogates need every feature to vary in the observed data")
+
+        axes = [np.linspace(lo, hi, resolution) for lo, hi in zip(lower, upper)]
+        points = np.stack([g.ravel() for g in np.meshgrid(*axes, indexing="ij")], axis=1)
+        table = np.asarray(predict_fn(points), dtype=np.float32).reshape((resolution,) * n_features)
+
+        metadata = {"resolution": resolution, "mode": mode}
+        return cls(lower, upper, table, mode=mode, feature_names=feature_names, metadata=metadata)
+
+    def in_grid(self, X: np.ndarray) -> np.ndarray:
+        """Boolean mask of rows inside the grid bounds"""
+        return np.all((X >= self.lower) & (X <= self.upper), axis=1)
+
+    def _lookup(self, X: np.ndarray) -> np.ndarray:
+        position = (X - self.lower) / self.step
+        if self.mode == "nearest":
+            index = np.rint(position).astype(np.intp)
+            return self.table[tuple(index.T)].astype(np.float64)
+
+        base = np.clip(np.floor(position).astype(np.intp), 0, self.resolution - 2)
+        frac = position - base
+        result = np.zeros(len(X))
+        for corner in itertools.product((0, 1), repeat=self.n_features):
+            weight = np.prod(np.where(corner, frac, 1.0 - frac), axis=1)
+            result += weight * self.table[tuple((base + corner).T)]
+        return result
+
+    def predict(self, features, fallback: Optional[Callable[[np.ndarray], np.ndarray]] = None) -> np.ndarray:
+        """
+        Predict through the table, using ``fallback`` outside the grid
+
+        Args:
+            features: DataFrame (matched by column name) or 2-D array
+            fallback: Exact model prediction for rows outside the grid
+
+        Returns:
+            Array of predictions
+        """
+        X = features_to_matrix(features, self.feature_names, self.n_features, dtype=np.float64)
+        inside = self.in_grid(X)
+        if inside.all():
+            return self._lookup(X)
+
+        if fallback is None:
+            raise ValueError("Inputs fall outside the surrogate grid and no fallback was given")
+        result = np.empty(len(X))
+        result[inside] = self._lookup(X[inside])
+        result[~inside] = fallback(X[~inside])
+        return result
+
+    def validate(self, X_holdout: np.ndarray, exact_fn: Callable[[np.ndarray], np.ndarray]) -> dict:
+        """
+        Measure error and latency against the exact model on held-out rows
+
+        The figures are stored in ``metadata`` and saved with the table.
+        Only rows inside the grid are compared, since the rest are always
+        answered exactly.
+        """
+        X = np.asarray(X_holdout, dtype=np.float64)
+        X = X[self.in_grid(X)]
+        if len(X) == 0:
+            raise ValueError("No held-out rows fall inside the surrogate grid")
+
+        start = time.perf_counter()
+        exact = np.asarray(exact_fn(X), dtype=np.float64)
+        exact_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        approx = self._lookup(X)
+        lookup_seconds = time.perf_counter() - start
+
+        error = np.abs(approx - exact)
+        report = {
+            "holdout_rows": int(len(X)),
+            "max_abs_error": float(error.max()),
+            "mean_abs_error": float(error.mean()),
+            "exact_us_per_row": exact_seconds / len(X) * 1e6,
+            "lookup_us_per_row": lookup_seconds / len(X) * 1e6,
+        }
+        self.metadata.update(report)
+        return report
+
+    def save(self, path: str):
+        """Write the surrogate as an ``.npz`` archive"""
+        metadata = dict(self.metadata, format_version=FORMAT_VERSION, mode=self.mode,
+                        feature_names=self.feature_names)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez(f, lower=self.lower, upper=self.upper, table=self.table,
+                     metadata=np.array(json.dumps(metadata)))
+
+    @classmethod
+    def load(cls, path: str) -> "GridSurrogate":
+        """Load a surrogate written by :meth:`save`"""
+        with np.load(path, allow_pickle=False) as data:
+            metadata = json.loads(str(data["metadata"]))
+            if metadata.get("format_version") != FORMAT_VERSION:
+                raise ValueError(
+                    f"Unsupported surrogate format {metadata.get('format_version')} in {path}"
+                )
+            return cls(data["lower"], data["upper"], data["table"], mode=metadata["mode"],
+                       feature_names=metadata["feature_names"], metadata=metadata)
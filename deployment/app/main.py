@@ -1,6 +1,5 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-import pandas as pd
 from typing import List, Dict
 import sys
 import os
@@ -17,8 +16,24 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Initialize model loader
-model_loader = ModelLoader(model_path="models/saved_model.pkl")
+# Slim mode serves the compact NumPy export and never imports sklearn or pandas
+SLIM_MODE = os.getenv("PULSEFLOW_SLIM", "0") == "1"
+DEFAULT_MODEL_PATH = "models/saved_model.npz" if SLIM_MODE else "models/saved_model.pkl"
+
+# Initialize model loader. Caching flattened predictors across worker starts is
+# opt-in: a cache hit serves the CompactForest alone, without the sklearn model
+model_loader = ModelLoader(
+    model_path=os.getenv("MODEL_PATH", DEFAULT_MODEL_PATH),
+    cache_dir=os.getenv("PREDICTOR_CACHE_DIR") or None,
+    cache_max_bytes=int(os.getenv("PREDICTOR_CACHE_MAX_MB", "512")) * 1024 * 1024,
+    slim=SLIM_MODE,
+    # Off by default: calibration adds to cold start. The process pool engine
+    # (one forest copy per worker) exists only if PULSEFLOW_POOL_WORKERS is set
+    calibrate=os.getenv("PULSEFLOW_CALIBRATE", "0") == "1",
+    pool_workers=int(os.getenv("PULSEFLOW_POOL_WORKERS", "0")) or None,
+    surrogate_path=os.getenv("PULSEFLOW_SURROGATE_PATH") or None,
+    transform_path=os.getenv("PULSEFLOW_TRANSFORM_PATH") or None
+)
 
 
 class PredictionInput(BaseModel):
@@ -97,11 +112,8 @@ def predict(input_data: PredictionInput):
         Prediction result and model version
     """
     try:
-        # Convert input to DataFrame
-        df = pd.DataFrame([input_data.features])
-        
         # Make prediction
-        prediction = model_loader.predict(df)
+        prediction = model_loader.predict_records([input_data.features])
         
         return PredictionResponse(
             prediction=float(prediction[0]),
@@ -124,11 +136,8 @@ def predict_batch(input_data: BatchPredictionInput):
         List of predictions and model version
     """
     try:
-        # Convert input to DataFrame
-        df = pd.DataFrame(input_data.data)
-        
         # Make predictions
-        predictions = model_loader.predict(df)
+        predictions = model_loader.predict_records(input_data.data)
         
         return BatchPredictionResponse(
             predictions=[float(p) for p in predictions],
@@ -147,7 +156,11 @@ def model_info():
         "model_path": model_loader.model_path,
         "model_version": model_loader.get_model_version(),
         "model_type": str(type(model_loader.model).__name__) if model_loader.model else None,
-        "status": "loaded" if model_loader.model else "not_loaded"
+        "status": "loaded" if model_loader.model else "not_loaded",
+        "engines": list(model_loader.engines),
+        "dispatch_table": model_loader.dispatch_table,
+        "surrogate": model_loader.surrogate.metadata if model_loader.surrogate else None,
+        "transform": model_loader.transform.columns if model_loader.transform else None
     }
 
 
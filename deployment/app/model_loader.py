@@ -1,9 +1,16 @@
 import os
-import joblib
+import time
 from datetime import datetime
-from typing import Any
+from typing import Any, Dict, List, Optional
 import numpy as np
-import pandas as pd
+
+# joblib and pandas are imported lazily so that slim mode, which serves
+# compact NumPy artifacts only, never pulls in scikit-learn or pandas.
+from .compact_forest import CompactForest, features_to_matrix, sample_inputs
+from .feature_transform import FeatureTransform, transform_path_for
+from .grid_surrogate import GridSurrogate
+from .engines import build_engines, calibrate as calibrate_engines, select_engine
+from .predictor_cache import DEFAULT_MAX_BYTES, PredictorCache
 
 
 class ModelLoader:
@@ -11,16 +18,56 @@ class ModelLoader:
     Model loader and manager for ML model serving
     """
     
-    def __init__(self, model_path: str = "models/saved_model.pkl"):
+    def __init__(self, model_path: str = "models/saved_model.pkl",
+                 cache_dir: Optional[str] = None,
+                 cache_max_bytes: int = DEFAULT_MAX_BYTES,
+                 slim: bool = False,
+                 calibrate: bool = False,
+                 pool_workers: Optional[int] = None,
+                 surrogate_path: Optional[str] = None,
+                 transform_path: Optional[str] = None):
         """
         Initialize model loader
         
         Args:
-            model_path: Path to the saved model file
+            model_path: Path to the saved model file (joblib pickle, or a
+                compact ``.npz`` forest exported by ``compact_forest``)
+            cache_dir: Directory for flattened predictor snapshots; when set,
+                pickled forests are unpickled once and later loads memory-map
+                the cached arrays instead. A hit serves the CompactForest
+                as the model, so only its engines are offered
+            cache_max_bytes: Size limit of the snapshot cache
+            slim: Serve compact ``.npz`` artifacts only, without importing
+                scikit-learn, joblib or pandas
+            calibrate: Time the available inference engines at load and
+                dispatch each batch to the fastest one for its size
+            pool_workers: Size of the process pool engine; without it no
+                pool is started (see ``engines.build_engines``)
+            surrogate_path: Optional lookup-table surrogate (see
+                ``grid_surrogate``); rows inside its grid are answered from
+                the table, the rest by the exact model
+            transform_path: Feature transform applied to inputs before
+                prediction (see ``feature_transform``); defaults to the
+                ``.transform.json`` sidecar next to the model, if present,
+                which must have been saved for this model's features
         """
         self.model_path = model_path
         self.model = None
+        self.forest = None
+        self.engines = {}
+        self.dispatch_table = []
+        self.surrogate = None
+        self.surrogate_path = surrogate_path
+        self.transform = None
+        self.transform_path = transform_path
+        self.feature_names = None
         self.loaded_at = None
+        self.load_seconds = None
+        self.cache = PredictorCache(cache_dir, cache_max_bytes) if cache_dir else None
+        self.cache_hit = None
+        self.slim = slim
+        self.calibrate = calibrate
+        self.pool_workers = pool_workers
         
         # Load model on initialization
         self.load_model()
@@ -30,17 +77,104 @@ class ModelLoader:
         if not os.path.exists(self.model_path):
             raise FileNotFoundError(f"Model file not found at {self.model_path}")
         
+        if self.slim and not self.model_path.endswith(".npz"):
+            raise ValueError(
+                f"Slim mode serves compact .npz models only, got {self.model_path}"
+            )
+        
         print(f"Loading model from {self.model_path}...")
-        self.model = joblib.load(self.model_path)
+        start = time.perf_counter()
+        if self.model_path.endswith(".npz"):
+            model = forest = CompactForest.load(self.model_path)
+        else:
+            model, forest = self._load_pickle()
+        self.load_seconds = time.perf_counter() - start
+        
+        for engine in self.engines.values():
+            engine.close()
+        self.model, self.forest = model, forest
+        if forest is not None:
+            self.feature_names = forest.feature_names
+        else:
+            names = getattr(model, "feature_names_in_", None)
+            self.feature_names = list(names) if names is not None else None
+        self.engines = build_engines(model, forest, self.pool_workers)
+        if self.calibrate and forest is not None and len(self.engines) > 1:
+            self.dispatch_table = calibrate_engines(self.engines, sample_inputs(forest, n_samples=1024))
+        else:
+            self.dispatch_table = [{"max_batch_size": None, "engine": next(iter(self.engines))}]
+        # Engines that never serve a batch should not hold worker processes
+        dispatched = {entry["engine"] for entry in self.dispatch_table}
+        for name, engine in self.engines.items():
+            if name not in dispatched:
+                engine.close()
+        
+        transform_path = self.transform_path or transform_path_for(self.model_path)
+        if self.transform_path or os.path.exists(transform_path):
+            transform = FeatureTransform.load(transform_path)
+            # A sidecar found next to the model must belong to it; an explicit
+            # transform is checked only if it records a model
+            if self.transform_path is None or transform.model_features is not None:
+                try:
+                    transform.check_model(self.feature_names, self._n_features())
+                except ValueError as e:
+                    raise ValueError(f"Refusing feature transform {transform_path}: {e}") from e
+            self.transform = transform.aligned(self.feature_names, self._n_features())
+            print(f"Feature transform loaded from {transform_path}")
+        else:
+            self.transform = None
+        
+        if self.surrogate_path:
+            self.surrogate = GridSurrogate.load(self.surrogate_path)
+            print(f"Lookup-table surrogate enabled (max abs error "
+                  f"{self.surrogate.metadata.get('max_abs_error')})")
+        
         self.loaded_at = datetime.now()
         print(f"Model loaded successfully at {self.loaded_at}")
     
-    def predict(self, features: pd.DataFrame) -> np.ndarray:
+    def _load_pickle(self):
+        """
+        Load a pickled model, flattening supported forests
+        
+        With a snapshot cache, a hit returns the memory-mapped predictor and
+        skips unpickling entirely.
+        
+        Returns:
+            Tuple of (model, CompactForest or None)
+        """
+        key = None
+        if self.cache is not None:
+            key = self.cache.key_for(self.model_path)
+            forest = self.cache.get(key)
+            self.cache_hit = forest is not None
+            if forest is not None:
+                print(f"Using cached predictor snapshot {key}")
+                return forest, forest
+        
+        import joblib
+        model = joblib.load(self.model_path)
+        try:
+            forest = CompactForest.from_sklearn(model)
+        except ValueError as e:
+            print(f"Flattened predictor unavailable: {e}")
+            return model, None
+        if key is not None:
+            self.cache.put(key, forest)
+        return model, forest
+    
+    def _n_features(self) -> Optional[int]:
+        if self.forest is not None:
+            return self.forest.n_features
+        return getattr(self.model, "n_features_in_", None)
+    
+    def predict(self, features: Any) -> np.ndarray:
         """
         Make predictions using the loaded model
         
         Args:
-            features: DataFrame with feature columns
+            features: DataFrame with feature columns (or a 2-D array in
+                training column order), in raw units when a feature
+                transform is loaded
             
         Returns:
             Array of predictions
@@ -48,9 +182,49 @@ class ModelLoader:
         if self.model is None:
             raise ValueError("Model not loaded. Call load_model() first.")
         
-        predictions = self.model.predict(features)
+        if self.transform is not None:
+            X = features_to_matrix(features, self.feature_names, self._n_features(), dtype=np.float64)
+            # Scale in place only when X is a fresh matrix, never the caller's data
+            if X is features or X.base is not None or not X.flags.writeable:
+                X = X.copy()
+            features = self.transform.apply(X)
+        return self._predict_transformed(features)
+    
+    def _predict_transformed(self, features: Any) -> np.ndarray:
+        """Predict on model-ready features, through the surrogate if configured"""
+        if self.surrogate is not None:
+            return self.surrogate.predict(features, fallback=self._predict_exact)
+        return self._predict_exact(features)
+    
+    def _predict_exact(self, features: Any) -> np.ndarray:
+        """Predict with the engine chosen for this batch size"""
+        engine = select_engine(self.dispatch_table, len(features))
+        predictions = self.engines[engine].predict(features)
         return predictions
     
+    def predict_records(self, records: List[Dict[str, float]]) -> np.ndarray:
+        """
+        Make predictions for a list of feature dictionaries
+        
+        When a flattened forest is available the records are packed straight
+        into a NumPy matrix, which the feature transform (if any) scales in
+        place; otherwise they go through a pandas DataFrame.
+        
+        Args:
+            records: One dictionary of feature name to value per row
+            
+        Returns:
+            Array of predictions
+        """
+        if self.forest is not None:
+            if self.transform is None:
+                return self._predict_transformed(self.forest.matrix_from_records(records))
+            X = self.forest.matrix_from_records(records, dtype=np.float64)
+            return self._predict_transformed(self.transform.apply(X))
+        
+        import pandas as pd
+        return self.predict(pd.DataFrame(records))
+    
     def get_model_version(self) -> str:
         """
         Get model version based on file modification time
@@ -75,5 +249,11 @@ class ModelLoader:
             "model_path": self.model_path,
             "model_type": str(type(self.model).__name__) if self.model else None,
             "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None,
+            "load_seconds": self.load_seconds,
+            "memory_bytes": self.forest.nbytes if self.forest is not None else None,
+            "cache_hit": self.cache_hit,
+            "dispatch_table": self.dispatch_table,
+            "surrogate": self.surrogate.metadata if self.surrogate is not None else None,
+            "transform": self.transform.columns if self.transform is not None else None,
             "version": self.get_model_version()
         }
@@ -0,0 +1,106 @@
+"""
+On-disk cache of flattened predictors.
+
+Unpickling a scikit-learn forest dominates worker start-up. The cache keeps
+the ready-to-run ``CompactForest`` arrays for each model artifact, keyed by
+the artifact's content hash and the engine version, so later starts
+memory-map the arrays instead of unpickling.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from typing import Optional
+
+from .compact_forest import ENGINE_VERSION, FORMAT_VERSION, CompactForest
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _directory_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, files in os.walk(path) for name in files
+    )
+
+
+class PredictorCache:
+    """
+    Size-bounded directory of predictor snapshots with LRU eviction
+
+    Each entry is a directory written by ``CompactForest.save_snapshot``.
+    Entries are published with an atomic rename, and their modification
+    time is refreshed on every hit so eviction removes the least recently
+    used entries first.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key_for(self, model_path: str) -> str:
+        """Cache key for a model artifact: content hash plus engine version"""
+        return f"{file_digest(model_path)[:32]}-f{FORMAT_VERSION}-e{ENGINE_VERSION}"
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key: str) -> Optional[CompactForest]:
+        """Return the memory-mapped predictor for ``key``, or None on a miss"""
+        entry = self._entry_path(key)
+        if not os.path.isdir(entry):
+            return None
+        try:
+            forest = CompactForest.load_snapshot(entry, mmap_mode="r")
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Discarding unreadable predictor cache entry {entry}: {e}")
+            shutil.rmtree(entry, ignore_errors=True)
+            return None
+        os.utime(entry)
+        return forest
+
+    def put(self, key: str, forest: CompactForest):
+        """Store ``forest`` under ``key`` and evict old entries if over the size limit"""
+        entry = self._entry_path(key)
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=self.cache_dir)
+        try:
+            forest.save_snapshot(staging)
+            os.replace(staging, entry)
+        except OSError:
+            # Another worker published the same key first
+            shutil.rmtree(staging, ignore_errors=True)
+            if not os.path.isdir(entry):
+                raise
+        self.evict(keep=key)
+
+    def entries(self) -> list:
+        """Cached entries as (key, size_bytes, last_used) tuples, oldest first"""
+        result = []
+        for name in os.listdir(self.cache_dir):
+            path = self._entry_path(name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            result.append((name, _directory_size(path), os.path.getmtime(path)))
+        return sorted(result, key=lambda entry: entry[2])
+
+    def evict(self, keep: Optional[str] = None):
+        """Remove least recently used entries until the cache fits ``max_bytes``"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for key, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self._entry_path(key), ignore_errors=True)
+            total -= size
@@ -0,0 +1,85 @@
+"""
+Arrow-native versions of the ETL table operations.
+
+The default (pandas) backend converts every table to a DataFrame to clean
+or scale it and back again to write it, copying the data twice and running
+most operations on one core. These functions work on Arrow tables with
+Arrow compute kernels throughout, while keeping pandas' semantics: rows come
+out in the same order, missing values include NaN, duplicates keep their
+first occurrence (with -0.0 equal to 0.0), and scaling matches
+``StandardScaler``. Both backends therefore write the same data.
+"""
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from deployment.app.feature_transform import FeatureTransform
+from etl.stats import standard_scale
+
+BACKENDS = ('pandas', 'arrow')
+
+_ROW_INDEX = '__pulseflow_row'
+
+
+def check_backend(backend: str) -> str:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+    return backend
+
+
+def drop_missing(table: pa.Table) -> pa.Table:
+    """Drop rows with a null, or a NaN in a float column (``DataFrame.dropna``)"""
+    table = table.drop_null()
+    masks = [pc.invert(pc.is_nan(table.column(field.name)))
+             for field in table.schema if pa.types.is_floating(field.type)]
+    if not masks or not table.num_rows:
+        return table
+    keep = masks[0]
+    for mask in masks[1:]:
+        keep = pc.and_(keep, mask)
+    return table.filter(keep)
+
+
+def drop_duplicates(table: pa.Table) -> pa.Table:
+    """Keep the first occurrence of every distinct row, in input order"""
+    if not table.num_rows or not table.num_columns:
+        return table
+    # Hash-aggregate the smallest row index per distinct row; floats are
+    # normalized so -0.0 and 0.0 group together, as in pandas
+    keys = {
+        field.name: pc.add(table.column(field.name), 0.0) if pa.types.is_floating(field.type)
+        else table.column(field.name)
+        for field in table.schema
+    }
+    keys[_ROW_INDEX] = pa.array(np.arange(table.num_rows))
+    first = pa.table(keys).group_by(table.column_names).aggregate([(_ROW_INDEX, 'min')])
+    indices = np.sort(first.column(f'{_ROW_INDEX}_min').to_numpy())
+    if len(indices) == table.num_rows:
+        return table
+    return table.take(indices)
+
+
+def clean_table(table: pa.Table) -> pa.Table:
+    """Arrow equivalent of ``df.drop_duplicates().dropna()``"""
+    return drop_duplicates(drop_missing(table))
+
+
+def fit_standard_scaler(table: pa.Table, columns: list) -> FeatureTransform:
+    """Per-column mean and population standard deviation, as StandardScaler fits them"""
+    count = [table.num_rows - table.column(c).null_count for c in columns]
+    mean = [pc.mean(table.column(c)).as_py() for c in columns]
+    variance = [pc.variance(table.column(c), ddof=0).as_py() for c in columns]
+    mean = np.array([np.nan if m is None else m for m in mean], dtype=np.float64)
+    variance = np.array([np.nan if v is None else v for v in variance], dtype=np.float64)
+    return FeatureTransform(columns, np.nan_to_num(mean), standard_scale(count, mean, variance))
+
+
+def scale_columns(table: pa.Table, transform: FeatureTransform) -> pa.Table:
+    """Standardize the transform's columns to float64; other columns are unchanged"""
+    table = table.replace_schema_metadata(None)
+    for name, mean, scale in zip(transform.columns, transform.mean, transform.scale):
+        index = table.schema.get_field_index(name)
+        values = pc.cast(table.column(index), pa.float64())
+        scaled = pc.divide(pc.subtract(values, mean), scale)
+        table = table.set_column(index, pa.field(name, pa.float64()), scaled)
+    return table
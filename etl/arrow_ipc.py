@@ -0,0 +1,61 @@
+"""
+Arrow IPC files for intermediate data handed from one stage to the next.
+
+Parquet encodes and compresses every column, so a stage handing a dataset to
+the next pays for a full encode on write and a full decode on read. An
+uncompressed Arrow IPC (Feather v2) file stores the in-memory layout as is:
+the reading stage memory-maps it and gets Arrow arrays backed by the mapped
+pages, without decoding or copying. The files are larger than Parquet and
+tied to the Arrow format version, so durable outputs (the processed data,
+model inputs) stay Parquet; IPC is for intermediates that the next stage
+consumes and that can be regenerated.
+
+A path ending in one of ``IPC_SUFFIXES`` selects the format.
+"""
+import os
+
+import pyarrow as pa
+
+IPC_SUFFIXES = ('.arrow', '.feather', '.ipc')
+
+
+def is_ipc_path(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in IPC_SUFFIXES
+
+
+def open_ipc_writer(path: str, schema: pa.Schema) -> pa.ipc.RecordBatchFileWriter:
+    """Uncompressed IPC file writer; each batch written stays one batch on read"""
+    return pa.ipc.new_file(path, schema)
+
+
+def write_ipc_table(table: pa.Table, path: str):
+    with open_ipc_writer(path, table.schema) as writer:
+        writer.write_table(table)
+
+
+def read_ipc_table(path: str) -> pa.Table:
+    """Memory-map an IPC file as a table whose buffers point into the mapping"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Arrow IPC file not found at {path}")
+    return pa.ipc.open_file(pa.memory_map(path)).read_all()
+
+
+class IpcFile:
+    """
+    Memory-mapped IPC file with the part of ``pyarrow.parquet.ParquetFile``'s
+    interface the streaming stages use, so they read either format one
+    record batch ("row group") at a time
+    """
+
+    def __init__(self, path: str):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Arrow IPC file not found at {path}")
+        self.reader = pa.ipc.open_file(pa.memory_map(path))
+        self.schema_arrow = self.reader.schema
+        self.num_row_groups = self.reader.num_record_batches
+
+    def read_row_group(self, i: int, columns: list = None) -> pa.Table:
+        batch = self.reader.get_batch(i)
+        if columns is not None:
+            batch = batch.select(columns)
+        return pa.Table.from_batches([batch])
@@ -1,36 +1,291 @@
 import os
+import sys
+import tempfile
+import time
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
 
-def load_data(source_path: str, output_path: str):
+# Add repository root to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl.arrow_backend import check_backend, clean_table
+from etl.arrow_ipc import is_ipc_path, open_ipc_writer, write_ipc_table
+from etl.dedup import DEFAULT_PARTITIONS, ExternalDeduplicator
+from etl.parquet_layout import ParquetLayout
+from etl.profile import DataProfile, profile_path_for
+from etl.stage_cache import StageCache, run_stage
+from etl.validation import Validator, quarantine_path_for, validated_batches
+
+# Bytes of CSV text parsed into each record batch in streaming mode. Arrow
+# reads up to 32 blocks ahead, so peak memory is roughly 33 x block size
+# regardless of input size (about 300 MB with the default).
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+
+def _check_output_format(output_path: str, layout: ParquetLayout):
+    if layout is not None and is_ipc_path(output_path):
+        raise ValueError(f"A Parquet layout cannot apply to the Arrow IPC output {output_path}")
+
+def load_data(source_path: str, output_path: str, layout: ParquetLayout = None, backend: str = 'pandas'):
+    """
+    Load a CSV file, drop duplicate and incomplete rows, and write Parquet
+
+    Args:
+        source_path: CSV file to ingest
+        output_path: Parquet file to write, or an Arrow IPC file (``.arrow``)
+            for the next stage to memory-map (see ``etl.arrow_ipc``)
+        layout: Output layout (see ``etl.parquet_layout``)
+        backend: 'pandas', or 'arrow' to parse and clean with multithreaded
+            Arrow kernels and no DataFrame copies (see ``etl.arrow_backend``).
+            Both keep the same rows in the same order; Arrow keeps integer
+            columns that had gaps as integers where pandas makes them float.
+
+    Returns:
+        The cleaned data (a DataFrame, or an Arrow table with 'arrow')
+    """
+    check_backend(backend)
+    _check_output_format(output_path, layout)
     if not os.path.exists(source_path):
         raise FileNotFoundError(f"Source data not found at {source_path}")
 
     print(f"Loading data from {source_path}...")
-    df = pd.read_csv(source_path)
-    print(f"Loaded {len(df)} records.")
+    if backend == 'arrow':
+        table = pv.read_csv(source_path)
+        print(f"Loaded {table.num_rows} records.")
+        data = table = clean_table(table)
+    else:
+        df = pd.read_csv(source_path)
+        print(f"Loaded {len(df)} records.")
 
-    # Basic cleaning: drop duplicates and NaNs
-    df = df.drop_duplicates().dropna()
+        # Basic cleaning: drop duplicates and NaNs
+        data = df = df.drop_duplicates().dropna()
+        table = pa.Table.from_pandas(df, preserve_index=False)
+
+    profile = DataProfile(table.schema)
+    profile.update(table)
 
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    df.to_parquet(output_path, index=False)
+    if is_ipc_path(output_path):
+        write_ipc_table(table, output_path)
+    elif layout is None:
+        pq.write_table(table, output_path)
+    else:
+        layout.write_table(table, output_path)
+    profile.save(output_path)
 
     print(f"Data saved to {output_path}")
-    return df
+    return data
+
+def open_csv_stream(source_path: str, block_size: int = DEFAULT_BLOCK_SIZE, schema: pa.Schema = None):
+    """
+    Open a CSV file as a stream of Arrow record batches
+
+    Parsing is multithreaded within each block. Column types come from
+    ``schema`` when given; otherwise they are inferred from the first block
+    and then held fixed for the rest of the file.
+    """
+    read_options = pv.ReadOptions(block_size=block_size, use_threads=True)
+    convert_options = pv.ConvertOptions(column_types=schema)
+    return pv.open_csv(source_path, read_options=read_options, convert_options=convert_options)
+
+def clean_batch(batch: pa.RecordBatch) -> pa.Table:
+    """Drop duplicate and null rows within one batch, keeping its schema"""
+    df = batch.to_pandas().drop_duplicates().dropna()
+    return pa.Table.from_pandas(df, schema=batch.schema, preserve_index=False)
+
+def counted_batches(batches, stats: dict):
+    """Pass batches through while counting them and their rows"""
+    for batch in batches:
+        stats['rows_read'] += batch.num_rows
+        stats['batches'] += 1
+        yield batch
+
+def _write_batch_deduplicated(batches, writer, profile: DataProfile) -> int:
+    """Single pass: drop duplicates within each batch only"""
+    rows_written = 0
+    for batch in batches:
+        table = clean_batch(batch)
+        if table.num_rows:
+            writer.write_table(table)
+            profile.update(table)
+            rows_written += table.num_rows
+    return rows_written
+
+def spill_deduplicated(batches, schema: pa.Schema, work_dir: str, num_partitions: int):
+    """
+    First pass of exact dedup: spill null-free batches to an Arrow IPC file
+    in ``work_dir`` while fingerprinting them
+
+    Returns:
+        (spill_path, keep) where ``keep`` marks the first copy of every row;
+        read the survivors back with :func:`kept_batches`
+    """
+    dedup = ExternalDeduplicator(work_dir, num_partitions)
+    spill_path = os.path.join(work_dir, 'spill.arrow')
+    with pa.OSFile(spill_path, 'wb') as sink, pa.ipc.new_stream(sink, schema) as spill:
+        for batch in batches:
+            table = pa.Table.from_batches([batch]).drop_null()
+            if table.num_rows:
+                dedup.add(table.to_pandas())
+                spill.write_table(table)
+    return spill_path, dedup.keep_mask()
+
+def kept_batches(spill_path: str, keep=None):
+    """Read a spill file back (memory-mapped), keeping only rows marked in ``keep``"""
+    offset = 0
+    with pa.memory_map(spill_path) as source:
+        for batch in pa.ipc.open_stream(source):
+            rows = batch.num_rows
+            if keep is not None:
+                batch = batch.filter(pa.array(keep[offset:offset + rows]))
+            offset += rows
+            if batch.num_rows:
+                yield batch
+
+def _write_exact_deduplicated(batches, schema: pa.Schema, writer, work_dir: str,
+                              num_partitions: int, profile: DataProfile) -> tuple:
+    """
+    Two passes: spill and fingerprint, then write only the first copy of
+    every row
+
+    Returns:
+        (rows written, bytes of the spill file)
+    """
+    spill_path, keep = spill_deduplicated(batches, schema, work_dir, num_partitions)
+    rows_written = 0
+    for batch in kept_batches(spill_path, keep):
+        writer.write_batch(batch)
+        profile.update(batch)
+        rows_written += batch.num_rows
+    return rows_written, os.path.getsize(spill_path)
+
+def load_data_streaming(source_path: str, output_path: str,
+                        block_size: int = DEFAULT_BLOCK_SIZE, schema: pa.Schema = None,
+                        exact_dedup: bool = True, work_dir: str = None,
+                        num_partitions: int = DEFAULT_PARTITIONS,
+                        layout: ParquetLayout = None, validator: Validator = None,
+                        quarantine_path: str = None):
+    """
+    Memory-bounded variant of load_data for inputs larger than RAM
+
+    The CSV is read in record batches and cleaned batches are written as
+    Parquet row groups (or IPC record batches), so peak memory follows ``block_size`` rather than
+    the input size. With ``exact_dedup`` duplicates are removed across the
+    whole file through an out-of-core fingerprint partitioning pass (see
+    ``etl.dedup``), giving the same rows as load_data; otherwise only
+    duplicates within a batch are removed, in a single pass. A profile of
+    the rows written (see ``etl.profile``) is saved next to the output.
+    With a ``validator`` every batch is checked as it is read, and failing
+    rows, including incomplete ones, are quarantined rather than dropped
+    (see ``etl.validation``). The output is written under a temporary name
+    and only renamed to ``output_path`` once the run succeeds.
+
+    Args:
+        source_path: CSV file to ingest
+        output_path: Parquet file to write, or an Arrow IPC file (``.arrow``)
+        block_size: Bytes of CSV per record batch / row group
+        schema: Explicit column types; inferred from the first block if None
+        exact_dedup: Remove duplicates across batches
+        work_dir: Scratch directory for dedup spill files (defaults to a
+            temporary directory next to ``output_path``)
+        num_partitions: Fingerprint partitions; raise for very large inputs
+            to keep each in-memory partition small
+        layout: Output row-group size, codecs, sort order and statistics
+            (see ``etl.parquet_layout``); one row group per batch if None
+        validator: Row checks to apply before cleaning
+        quarantine_path: Parquet file for failing rows (defaults to
+            ``<output stem>.quarantine.parquet``)
+
+    Returns:
+        Dictionary of ingestion statistics, including rows/sec, the size of
+        the dedup spill file (``scratch_bytes``, with ``exact_dedup``) and,
+        when validating, a ``validation`` summary
+    """
+    _check_output_format(output_path, layout)
+    if not os.path.exists(source_path):
+        raise FileNotFoundError(f"Source data not found at {source_path}")
+
+    print(f"Streaming data from {source_path}...")
+    output_dir = os.path.dirname(output_path)
+    os.makedirs(output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    stats = {'rows_read': 0, 'rows_written': 0, 'batches': 0}
+    read_types = validator.csv_column_types(schema) if validator is not None else schema
+    with open_csv_stream(source_path, block_size, read_types) as reader:
+        batches = counted_batches(reader, stats)
+        output_schema = reader.schema
+        if validator is not None:
+            stats['validation'] = {}
+            batches = validated_batches(batches, validator, quarantine_path or quarantine_path_for(output_path),
+                                        stats['validation'])
+            output_schema = validator.output_schema(reader.schema)
+        profile = DataProfile(output_schema)
+        staging_path = os.path.join(output_dir, f".{os.path.basename(output_path)}.tmp")
+        if is_ipc_path(output_path):
+            output = open_ipc_writer(staging_path, output_schema)
+        else:
+            output = (layout or ParquetLayout()).open_writer(staging_path, output_schema)
+        try:
+            with output as writer:
+                if exact_dedup:
+                    with tempfile.TemporaryDirectory(prefix='.dedup-', dir=work_dir or output_dir or None) as scratch:
+                        stats['rows_written'], stats['scratch_bytes'] = _write_exact_deduplicated(
+                            batches, output_schema, writer, scratch, num_partitions, profile)
+                else:
+                    stats['rows_written'] = _write_batch_deduplicated(batches, writer, profile)
+        except BaseException:
+            # A failed run (e.g. a null rate over its limit) leaves no output behind
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+            raise
+    os.replace(staging_path, output_path)
+    profile.save(output_path)
+    elapsed = time.perf_counter() - start
+
+    stats['seconds'] = elapsed
+    stats['rows_per_sec'] = stats['rows_read'] / elapsed if elapsed > 0 else 0.0
+    print(f"Streamed {stats['rows_read']} records in {stats['batches']} batches, "
+          f"wrote {stats['rows_written']} ({stats['rows_per_sec']:,.0f} rows/sec)")
+    print(f"Data saved to {output_path}")
+    return stats
+
+def generate_sample_csv(path: str, rows: int = 100):
+    """Write the small synthetic dataset used when no real input exists"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    pd.DataFrame({
+        'feature1': range(rows),
+        'feature2': [x * 1.5 for x in range(rows)],
+        'target': [x * 3 + 5 for x in range(rows)]
+    }).to_csv(path, index=False)
 
 if __name__ == "__main__":
     INPUT_FILE = 'data/sample.csv'
-    OUTPUT_FILE = 'data/intermediate.parquet'
-    os.makedirs('data', exist_ok=True)
+    # --ipc hands the output to preprocessing as memory-mapped Arrow IPC (see etl.arrow_ipc)
+    OUTPUT_FILE = 'data/intermediate.arrow' if '--ipc' in sys.argv else 'data/intermediate.parquet'
 
     # Generate synthetic data if sample.csv doesn't exist
     if not os.path.exists(INPUT_FILE):
         print("sample.csv not found — generating mock dataset...")
-        sample_df = pd.DataFrame({
-            'feature1': range(100),
-            'feature2': [x * 1.5 for x in range(100)],
-            'target': [x * 3 + 5 for x in range(100)]
-        })
-        sample_df.to_csv(INPUT_FILE, index=False)
-
-    load_data(INPUT_FILE, OUTPUT_FILE)
+        generate_sample_csv(INPUT_FILE)
+
+    # Optional JSON file of validation rules (see etl.validation)
+    rules = sys.argv[sys.argv.index('--rules') + 1] if '--rules' in sys.argv else None
+    backend = 'arrow' if '--arrow' in sys.argv else 'pandas'
+    if '--streaming' in sys.argv:
+        validator = Validator.from_json(rules) if rules else None
+
+        def stage():
+            return load_data_streaming(INPUT_FILE, OUTPUT_FILE, validator=validator)
+    else:
+        def stage():
+            return load_data(INPUT_FILE, OUTPUT_FILE, backend=backend)
+
+    # With --cache, reuse the outputs of an earlier run on the same input
+    run_stage('ingestion', stage,
+              inputs=[INPUT_FILE] + ([rules] if rules else []),
+              outputs=[OUTPUT_FILE, profile_path_for(OUTPUT_FILE), quarantine_path_for(OUTPUT_FILE)],
+              params={'streaming': '--streaming' in sys.argv, 'backend': backend,
+                      'format': os.path.splitext(OUTPUT_FILE)[1]},
+              cache=StageCache() if '--cache' in sys.argv else None)
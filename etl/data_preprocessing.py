@@ -1,31 +1,326 @@
 import os
+import sys
+import time
+from collections import deque
+from contextlib import nullcontext
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from sklearn.preprocessing import StandardScaler
 
-def preprocess_data(input_path: str, output_path: str):
+# Add repository root to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deployment.app.feature_transform import FeatureTransform, transform_path_for
+from etl.arrow_backend import check_backend, fit_standard_scaler, scale_columns
+from etl.arrow_ipc import IpcFile, is_ipc_path, read_ipc_table
+from etl.parquet_layout import ParquetLayout
+from etl.profile import DataProfile, profile_path_for
+from etl.stage_cache import StageCache, run_stage
+from etl.stats import RunningMoments
+
+# Row groups read ahead of the one being processed
+PREFETCH_DEPTH = 2
+
+# Per-process state of preprocessing workers, set once by _init_worker
+_worker = {}
+
+def preprocess_data(input_path: str, output_path: str, layout: ParquetLayout = None, backend: str = 'pandas'):
+    """
+    Standardize every numeric feature column and save the fitted transform
+
+    Args:
+        input_path: Parquet file to read, or an Arrow IPC file (``.arrow``),
+            which is memory-mapped rather than decoded (see ``etl.arrow_ipc``)
+        output_path: Parquet file to write
+        layout: Output layout (see ``etl.parquet_layout``)
+        backend: 'pandas' (scikit-learn's StandardScaler), or 'arrow' to fit
+            and scale with Arrow compute kernels on the table as read (see
+            ``etl.arrow_backend``); both write the same values
+
+    Returns:
+        The scaled data (a DataFrame, or an Arrow table with 'arrow')
+    """
+    check_backend(backend)
     if not os.path.exists(input_path):
         raise FileNotFoundError(f"Input parquet file not found at {input_path}")
 
     print(f"Preprocessing data from {input_path}...")
-    df = pd.read_parquet(input_path)
+    if backend == 'arrow':
+        table = read_ipc_table(input_path) if is_ipc_path(input_path) else pq.read_table(input_path)
+        num_cols = feature_columns(table.schema)
+        print(f"Scaling columns: {num_cols}")
+        transform = fit_standard_scaler(table, num_cols)
+        data = table = scale_columns(table, transform)
+    else:
+        df = read_ipc_table(input_path).to_pandas() if is_ipc_path(input_path) else pd.read_parquet(input_path)
 
-    # Identify numeric columns
-    num_cols = df.select_dtypes(include='number').columns.tolist()
+        # Identify numeric columns
+        num_cols = df.select_dtypes(include='number').columns.tolist()
 
-    if 'target' in num_cols:
-        num_cols.remove('target')
+        if 'target' in num_cols:
+            num_cols.remove('target')
 
-    print(f"Scaling columns: {num_cols}")
-    scaler = StandardScaler()
-    df[num_cols] = scaler.fit_transform(df[num_cols])
+        print(f"Scaling columns: {num_cols}")
+        scaler = StandardScaler().fit(df[num_cols])
+        transform = FeatureTransform.from_scaler(num_cols, scaler)
+        df[num_cols] = transform.apply(np.array(df[num_cols], dtype=np.float64))
+        data = df
+        table = pa.Table.from_pandas(df, preserve_index=False)
+
+    profile = DataProfile(table.schema)
+    profile.update(table)
 
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    df.to_parquet(output_path, index=False)
+    if layout is None:
+        pq.write_table(table, output_path)
+    else:
+        layout.write_table(table, output_path)
+    transform.save(transform_path_for(output_path))
+    profile.save(output_path)
     print(f"Preprocessed data saved to {output_path}")
-    return df
+    return data
+
+def feature_columns(schema: pa.Schema, target: str = 'target') -> list:
+    """Numeric columns other than the target, in schema order"""
+    return [field.name for field in schema
+            if (pa.types.is_integer(field.type) or pa.types.is_floating(field.type))
+            and field.name != target]
+
+def column_matrix(table, columns: list) -> np.ndarray:
+    """Stack columns into a float64 matrix, with nulls as NaN"""
+    return np.column_stack([
+        table.column(c).to_numpy(zero_copy_only=False).astype(np.float64) for c in columns
+    ]) if columns else np.empty((table.num_rows, 0))
+
+def open_row_groups(path: str):
+    """A ParquetFile, or an IpcFile read batch by batch through the same methods"""
+    return IpcFile(path) if is_ipc_path(path) else pq.ParquetFile(path)
+
+def in_order(pool, fn, count: int, depth: int):
+    """
+    Yield ``fn(0)`` .. ``fn(count - 1)`` in order, keeping up to ``depth``
+    calls submitted to ``pool`` ahead of the one being consumed
+    """
+    pending = deque(pool.submit(fn, i) for i in range(min(depth, count)))
+    for i in range(count):
+        result = pending.popleft().result()
+        if i + depth < count:
+            pending.append(pool.submit(fn, i + depth))
+        yield result
+
+def prefetched_row_groups(parquet_file, columns: list = None, depth: int = PREFETCH_DEPTH):
+    """
+    Read row groups in order on a background thread, so the next ones are
+    decoded (Arrow releases the GIL) while the caller processes this one
+    """
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        yield from in_order(pool, lambda i: parquet_file.read_row_group(i, columns=columns),
+                            parquet_file.num_row_groups, depth)
+
+def _init_worker(input_path: str, threads: int):
+    pa.set_cpu_count(threads)
+    _worker['file'] = open_row_groups(input_path)
+
+def worker_pool(input_path: str, workers: int):
+    """
+    Process pool whose workers each open ``input_path`` once, or a null
+    context for ``workers <= 1``
+    """
+    if workers <= 1:
+        return nullcontext()
+    # Share the cores out so N workers do not oversubscribe the machine
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(input_path, threads))
+
+def _moments_in_worker(index: int, columns: list) -> RunningMoments:
+    moments = RunningMoments(len(columns))
+    moments.update(column_matrix(_worker['file'].read_row_group(index, columns=columns), columns))
+    return moments
+
+def fit_scaler_streaming(parquet_file: pq.ParquetFile, columns: list, pool: ProcessPoolExecutor = None,
+                         depth: int = PREFETCH_DEPTH):
+    """
+    First pass: accumulate per-column moments one row group at a time
+
+    With a ``pool`` (see :func:`worker_pool`) up to ``depth`` row groups
+    are summarized in parallel and merged in order, which gives the same
+    result.
+
+    Returns:
+        FeatureTransform with StandardScaler's ``mean_`` and ``scale_``
+    """
+    moments = RunningMoments(len(columns))
+    if pool is None:
+        for table in prefetched_row_groups(parquet_file, columns, depth):
+            moments.update(column_matrix(table, columns))
+    else:
+        for part in in_order(pool, partial(_moments_in_worker, columns=columns),
+                             parquet_file.num_row_groups, depth):
+            moments.merge(part)
+    return FeatureTransform(columns, moments.mean, moments.scale())
+
+def scaled_schema(schema: pa.Schema, columns: list) -> pa.Schema:
+    """Output schema: scaled columns become float64, the rest are unchanged"""
+    schema = schema.remove_metadata()
+    for c in columns:
+        schema = schema.set(schema.get_field_index(c), pa.field(c, pa.float64()))
+    return schema
+
+def scale_table(table, transform: FeatureTransform, schema: pa.Schema) -> pa.Table:
+    """Standardize the transform's columns of a table or record batch"""
+    table = pa.Table.from_batches([table]) if isinstance(table, pa.RecordBatch) else table
+    table = table.replace_schema_metadata(None)
+    scaled = transform.apply(column_matrix(table, transform.columns))
+    for j, c in enumerate(transform.columns):
+        table = table.set_column(table.schema.get_field_index(c), c, pa.array(scaled[:, j]))
+    return table.cast(schema)
+
+def _transform_row_group(table: pa.Table, index: int, transform: FeatureTransform, schema: pa.Schema,
+                         parts_dir: str, layout: ParquetLayout):
+    """
+    Scale and profile one row group; with ``parts_dir``, also write it there
+    as its own part file
+
+    Returns:
+        (table, or None once written as a part, rows, profile)
+    """
+    table = scale_table(table, transform, schema)
+    profile = DataProfile(schema)
+    profile.update(table)
+    if parts_dir is None:
+        return table, table.num_rows, profile
+    (layout or ParquetLayout()).write_table(table, os.path.join(parts_dir, f'part-{index:05d}.parquet'))
+    return None, table.num_rows, profile
+
+def _transform_in_worker(index: int, args: tuple):
+    return _transform_row_group(_worker['file'].read_row_group(index), index, *args)
+
+def transformed_row_groups(parquet_file, transform: FeatureTransform, schema: pa.Schema,
+                           parts_dir: str = None, layout: ParquetLayout = None,
+                           pool: ProcessPoolExecutor = None, depth: int = PREFETCH_DEPTH):
+    """
+    Second pass: yield ``_transform_row_group`` results in row-group order
+
+    Without a pool, reads run ahead on a background thread. With one, the
+    workers read, scale and profile row groups concurrently (each reads its
+    own), with at most ``depth`` in flight to bound memory. Every row
+    group is profiled on its own and the caller merges the profiles in
+    order, so the result does not depend on the pool.
+    """
+    args = (transform, schema, parts_dir, layout)
+    if pool is None:
+        for index, table in enumerate(prefetched_row_groups(parquet_file, depth=depth)):
+            yield _transform_row_group(table, index, *args)
+    else:
+        yield from in_order(pool, partial(_transform_in_worker, args=args),
+                            parquet_file.num_row_groups, depth)
+
+def preprocess_data_streaming(input_path: str, output_path: str, layout: ParquetLayout = None,
+                              workers: int = 1):
+    """
+    Memory-bounded variant of preprocess_data
+
+    Two passes over the input's row groups: the first accumulates each
+    feature's mean and variance with a stable merge (see ``etl.stats``), the
+    second standardizes every row group and writes it as an output row
+    group. Peak memory follows the row group size, and the output matches
+    preprocess_data to floating-point tolerance. The fitted transform and
+    the output's profile are saved next to it, as preprocess_data does.
+
+    Reads run ahead of processing on a background thread, and ``workers``
+    above 1 run both passes in a process pool. Output is the same for any
+    number of workers, in input row-group order. A single output file
+    is written by one process, which limits the speedup; an output path
+    without an extension is a dataset directory instead, where each worker
+    writes its row groups as ``part-NNNNN.parquet`` files in parallel.
+
+    Args:
+        input_path: Parquet file to read, or an Arrow IPC file (``.arrow``)
+            whose record batches stand in for row groups
+        output_path: Parquet file to write, or a directory for part files
+        layout: Output layout (see ``etl.parquet_layout``); keeps the
+            input's row groups if None
+        workers: Processes for both passes
+
+    Returns:
+        Dictionary with the scaled columns, their means and scales, and
+        row/row group counts and timing
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Input parquet file not found at {input_path}")
+
+    print(f"Preprocessing data from {input_path} (streaming)...")
+    start = time.perf_counter()
+    parquet_file = open_row_groups(input_path)
+    num_cols = feature_columns(parquet_file.schema_arrow)
+    print(f"Scaling columns: {num_cols}")
+    schema = scaled_schema(parquet_file.schema_arrow, num_cols)
+    parts_dir, writer = None, None
+    if os.path.splitext(output_path)[1]:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    else:
+        parts_dir = output_path
+        os.makedirs(parts_dir, exist_ok=True)
+        for name in os.listdir(parts_dir):
+            if name.startswith('part-'):
+                os.remove(os.path.join(parts_dir, name))
+
+    rows = 0
+    profile = DataProfile(schema)
+    # Two row groups per worker in flight keeps every worker busy
+    depth = PREFETCH_DEPTH * max(1, workers)
+    with worker_pool(input_path, workers) as pool:
+        transform = fit_scaler_streaming(parquet_file, num_cols, pool, depth)
+        if parts_dir is None:
+            writer = (layout or ParquetLayout()).open_writer(output_path, schema)
+        try:
+            for table, num_rows, part in transformed_row_groups(parquet_file, transform, schema,
+                                                                parts_dir, layout, pool, depth):
+                if writer is not None:
+                    writer.write_table(table)
+                profile.merge(part)
+                rows += num_rows
+        finally:
+            if writer is not None:
+                writer.close()
+    transform.save(transform_path_for(output_path))
+    profile.save(output_path)
+
+    stats = {
+        'columns': num_cols,
+        'mean': transform.mean.tolist(),
+        'scale': transform.scale.tolist(),
+        'rows': rows,
+        'row_groups': parquet_file.num_row_groups,
+        'workers': workers,
+        'seconds': time.perf_counter() - start
+    }
+    print(f"Preprocessed {rows} rows in {stats['row_groups']} row groups, saved to {output_path}")
+    return stats
 
 if __name__ == "__main__":
-    INPUT_FILE = 'data/intermediate.parquet'
+    # --ipc reads the Arrow IPC intermediate written by data_ingestion.py --ipc
+    INPUT_FILE = 'data/intermediate.arrow' if '--ipc' in sys.argv else 'data/intermediate.parquet'
     OUTPUT_FILE = 'data/processed.parquet'
 
-    preprocess_data(INPUT_FILE, OUTPUT_FILE)
+    backend = 'arrow' if '--arrow' in sys.argv else 'pandas'
+    if '--streaming' in sys.argv:
+        # --workers N runs the transform pass in N processes
+        workers = int(sys.argv[sys.argv.index('--workers') + 1]) if '--workers' in sys.argv else 1
+
+        def stage():
+            return preprocess_data_streaming(INPUT_FILE, OUTPUT_FILE, workers=workers)
+    else:
+        def stage():
+            return preprocess_data(INPUT_FILE, OUTPUT_FILE, backend=backend)
+
+    # With --cache, reuse the outputs of an earlier run on the same input
+    run_stage('preprocessing', stage,
+              inputs=[INPUT_FILE],
+              outputs=[OUTPUT_FILE, transform_path_for(OUTPUT_FILE), profile_path_for(OUTPUT_FILE)],
+              params={'streaming': '--streaming' in sys.argv, 'backend': backend},
+              cache=StageCache() if '--cache' in sys.argv else None)
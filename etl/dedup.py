@@ -0,0 +1,144 @@
+"""
+Out-of-core exact duplicate removal.
+
+Each row is reduced to a 128-bit fingerprint. Fingerprints, together with
+the row's position in the input, are spilled to disk in partitions chosen
+by hash prefix, so identical rows always land in the same partition. Each
+partition is then deduplicated in memory on its own, and the first
+occurrence of every fingerprint is marked in a disk-backed keep mask. The
+mask preserves input order, so filtering the rows with it gives the same
+result as ``DataFrame.drop_duplicates()`` with memory bounded by the
+largest partition.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+# Two independent 16-byte hash keys give a 128-bit fingerprint per row
+FINGERPRINT_KEYS = ("pulseflow-dedup0", "pulseflow-dedup1")
+
+DEFAULT_PARTITIONS = 64
+
+RECORD_DTYPE = np.dtype([("hi", "<u8"), ("lo", "<u8"), ("row", "<u8")])
+
+
+def row_fingerprints(df: pd.DataFrame):
+    """
+    128-bit fingerprint of each row, as (high, low) uint64 arrays
+
+    Float columns are normalized so that -0.0 and 0.0, which compare equal
+    in ``drop_duplicates``, also hash equal.
+    """
+    df = df.copy(deep=False)
+    for col in df.columns:
+        if pd.api.types.is_float_dtype(df[col]):
+            df[col] = df[col] + 0.0
+    hi = pd.util.hash_pandas_object(df, index=False, hash_key=FINGERPRINT_KEYS[0]).to_numpy()
+    lo = pd.util.hash_pandas_object(df, index=False, hash_key=FINGERPRINT_KEYS[1]).to_numpy()
+    return hi, lo
+
+
+def first_occurrences(paths) -> np.ndarray:
+    """
+    Row ids of the first occurrence of every fingerprint in a partition
+
+    Args:
+        paths: Partition files to merge (one per spilling source)
+
+    Returns:
+        Sorted uint64 array of row ids to keep
+    """
+    chunks = [np.fromfile(p, dtype=RECORD_DTYPE) for p in paths if os.path.exists(p)]
+    if not chunks:
+        return np.empty(0, dtype=np.uint64)
+    records = np.concatenate(chunks)
+    records = records[np.lexsort((records["row"], records["lo"], records["hi"]))]
+    first = np.ones(len(records), dtype=bool)
+    first[1:] = (records["hi"][1:] != records["hi"][:-1]) | (records["lo"][1:] != records["lo"][:-1])
+    return np.sort(records["row"][first])
+
+
+class FingerprintSpiller:
+    """
+    Spills (fingerprint, row id) records to per-partition files
+
+    Row ids count up from ``row_offset``, so several spillers (for example
+    one per input file) can share one id space and be reduced together with
+    :func:`first_occurrences`.
+    """
+
+    def __init__(self, work_dir: str, num_partitions: int = DEFAULT_PARTITIONS, row_offset: int = 0):
+        if num_partitions < 1 or num_partitions & (num_partitions - 1):
+            raise ValueError(f"num_partitions must be a power of two, got {num_partitions}")
+        self.work_dir = work_dir
+        self.num_partitions = num_partitions
+        self.prefix_shift = np.uint64(64 - (num_partitions.bit_length() - 1))
+        self.row_offset = row_offset
+        self.rows_seen = 0
+        self._files = {}
+        os.makedirs(work_dir, exist_ok=True)
+
+    def partition_path(self, partition: int) -> str:
+        return os.path.join(self.work_dir, f"fingerprints-{partition:05d}.bin")
+
+    def add(self, df: pd.DataFrame):
+        """Fingerprint a batch of rows and spill it to the partition files"""
+        if len(df) == 0:
+            return
+        hi, lo = row_fingerprints(df)
+        records = np.empty(len(df), dtype=RECORD_DTYPE)
+        records["hi"] = hi
+        records["lo"] = lo
+        first_row = self.row_offset + self.rows_seen
+        records["row"] = np.arange(first_row, first_row + len(df), dtype=np.uint64)
+        self.rows_seen += len(df)
+
+        if self.num_partitions == 1:
+            partitions = np.zeros(len(df), dtype=np.intp)
+        else:
+            partitions = (hi >> self.prefix_shift).astype(np.intp)
+        order = np.argsort(partitions, kind="stable")
+        records, partitions = records[order], partitions[order]
+        bounds = np.searchsorted(partitions, np.arange(self.num_partitions + 1))
+        for partition in np.flatnonzero(np.diff(bounds)):
+            if partition not in self._files:
+                self._files[partition] = open(self.partition_path(partition), "ab")
+            records[bounds[partition]:bounds[partition + 1]].tofile(self._files[partition])
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+
+class ExternalDeduplicator(FingerprintSpiller):
+    """
+    Finds the first occurrence of every distinct row across a stream of batches
+
+    Usage::
+
+        dedup = ExternalDeduplicator(work_dir)
+        for df in batches:
+            dedup.add(df)
+        keep = dedup.keep_mask()   # keep[i] is True for the first copy of row i
+    """
+
+    def __init__(self, work_dir: str, num_partitions: int = DEFAULT_PARTITIONS):
+        super().__init__(work_dir, num_partitions)
+
+    def keep_mask(self) -> np.ndarray:
+        """
+        Disk-backed boolean mask over all rows added so far
+
+        Returns:
+            Memory-mapped array; True marks the first occurrence of a row
+        """
+        self.close()
+        mask = np.memmap(os.path.join(self.work_dir, "keep.mask"), dtype=np.bool_,
+                         mode="w+", shape=(max(self.rows_seen, 1),))
+        mask[:] = False
+        for partition in range(self.num_partitions):
+            mask[first_occurrences([self.partition_path(partition)]).astype(np.intp)] = True
+        mask.flush()
+        return mask[:self.rows_seen]
@@ -0,0 +1,206 @@
+"""
+Dtype narrowing for Parquet datasets.
+
+Integer columns are stored in the narrowest integer type that holds their
+observed range, float64 columns become float32 when every value survives the
+round trip within a relative tolerance (tree models work in float32 anyway),
+and low-cardinality string columns are dictionary-encoded so pandas reads
+them as categoricals. A first pass over the row groups gathers ranges,
+round-trip errors and distinct counts; a second pass casts and writes. The
+per-column memory footprint before and after is written as a JSON report.
+"""
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Add repository root to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl.parquet_layout import ParquetLayout
+
+DEFAULT_RTOL = 1e-6
+DEFAULT_MAX_CATEGORIES = 1024
+
+# Trees fit on a float64 target whatever its storage type, so narrowing it
+# saves nothing downstream.
+DEFAULT_EXCLUDE = ('target',)
+
+INTEGER_TYPES = (pa.int8(), pa.uint8(), pa.int16(), pa.uint16(), pa.int32(), pa.uint32(), pa.int64())
+
+REPORT_SUFFIX = '.dtypes.json'
+
+
+def report_path_for(path: str) -> str:
+    """Report path for a Parquet file (``x.parquet`` -> ``x.dtypes.json``)"""
+    return os.path.splitext(path)[0] + REPORT_SUFFIX
+
+
+def narrowest_integer_type(low: int, high: int) -> pa.DataType:
+    """Smallest integer type holding every value in [low, high]"""
+    for candidate in INTEGER_TYPES:
+        info = np.iinfo(candidate.to_pandas_dtype())
+        if info.min <= low and high <= info.max:
+            return candidate
+    return pa.int64()
+
+
+def _float32_round_trip_ok(values: np.ndarray, rtol: float) -> bool:
+    """True if every finite value converts to float32 within ``rtol``"""
+    finite = np.isfinite(values)
+    with np.errstate(over='ignore'):
+        narrowed = values[finite].astype(np.float32)
+    error = np.abs(narrowed.astype(np.float64) - values[finite])
+    return bool(np.all(error <= rtol * np.abs(values[finite])))
+
+
+def profile_columns(parquet_file: pq.ParquetFile, rtol: float = DEFAULT_RTOL,
+                    max_categories: int = DEFAULT_MAX_CATEGORIES, exclude=DEFAULT_EXCLUDE) -> dict:
+    """
+    First pass: gather what each column needs to be narrowed safely
+
+    Returns:
+        Mapping of column name to its profile (type, footprint, and range,
+        float32 round-trip result or distinct values as applicable)
+    """
+    profiles = {}
+    for field in parquet_file.schema_arrow:
+        profile = {'type': field.type, 'bytes': 0, 'rows': 0, 'candidate': field.name not in exclude}
+        if pa.types.is_integer(field.type):
+            profile.update(low=None, high=None)
+        elif pa.types.is_float64(field.type):
+            profile['float32_ok'] = True
+        elif pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            profile['distinct'] = set()
+        profiles[field.name] = profile
+
+    for i in range(parquet_file.num_row_groups):
+        table = parquet_file.read_row_group(i)
+        for name, profile in profiles.items():
+            column = table.column(name)
+            profile['bytes'] += column.nbytes
+            profile['rows'] += len(column)
+            if not profile['candidate'] or column.null_count == len(column):
+                continue
+            if 'low' in profile:
+                bounds = pc.min_max(column).as_py()
+                profile['low'] = bounds['min'] if profile['low'] is None else min(profile['low'], bounds['min'])
+                profile['high'] = bounds['max'] if profile['high'] is None else max(profile['high'], bounds['max'])
+            elif profile.get('float32_ok'):
+                values = column.to_numpy(zero_copy_only=False)
+                profile['float32_ok'] = _float32_round_trip_ok(values, rtol)
+            elif profile.get('distinct') is not None:
+                profile['distinct'].update(pc.unique(column).drop_null().to_pylist())
+                if len(profile['distinct']) > max_categories:
+                    profile['distinct'] = None
+    return profiles
+
+
+def narrowed_type(profile: dict) -> pa.DataType:
+    """Target type for one profiled column (its own type if nothing is gained)"""
+    current = profile['type']
+    if not profile['candidate']:
+        return current
+    if profile.get('low') is not None:
+        return narrowest_integer_type(profile['low'], profile['high'])
+    if profile.get('float32_ok'):
+        return pa.float32()
+    distinct = profile.get('distinct')
+    if distinct is not None and profile['rows'] and len(distinct) <= profile['rows'] // 2:
+        # Signed indices, as pandas categoricals use
+        index_type = next(t for t in (pa.int8(), pa.int16(), pa.int32())
+                          if len(distinct) <= np.iinfo(t.to_pandas_dtype()).max + 1)
+        return pa.dictionary(index_type, current)
+    return current
+
+
+def downcast_parquet(input_path: str, output_path: str, rtol: float = DEFAULT_RTOL,
+                     max_categories: int = DEFAULT_MAX_CATEGORIES, exclude=DEFAULT_EXCLUDE,
+                     report_path: str = None, layout: ParquetLayout = None) -> dict:
+    """
+    Rewrite a Parquet file with every column in its narrowest safe type
+
+    Row groups are processed one at a time, so memory follows the row group
+    size. ``output_path`` may equal ``input_path``; the file is then
+    replaced atomically.
+
+    Args:
+        input_path: Parquet file to read
+        output_path: Parquet file to write
+        rtol: Maximum relative error allowed when narrowing float64 to float32
+        max_categories: Largest distinct count dictionary-encoded (string
+            columns must also repeat: at most one distinct value per two rows)
+        exclude: Columns left untouched
+        report_path: Where to write the JSON report (defaults to
+            ``<output stem>.dtypes.json``)
+        layout: Row-group size, codecs, sort order and statistics of the
+            rewritten file (see ``etl.parquet_layout``); without one, the
+            input's row groups are kept with pyarrow's default settings
+
+    Returns:
+        Report with per-column types and in-memory bytes before and after,
+        their totals, and the file sizes
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Input parquet file not found at {input_path}")
+
+    print(f"Downcasting {input_path}...")
+    start = time.perf_counter()
+    parquet_file = pq.ParquetFile(input_path)
+    profiles = profile_columns(parquet_file, rtol, max_categories, exclude)
+    schema = pa.schema([pa.field(name, narrowed_type(profile)) for name, profile in profiles.items()])
+
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    staging_path = os.path.join(directory, f".{os.path.basename(output_path)}.tmp")
+    bytes_after = dict.fromkeys(profiles, 0)
+    with (layout.open_writer(staging_path, schema) if layout is not None
+          else pq.ParquetWriter(staging_path, schema)) as writer:
+        for i in range(parquet_file.num_row_groups):
+            table = parquet_file.read_row_group(i).replace_schema_metadata(None).cast(schema)
+            for name in profiles:
+                bytes_after[name] += table.column(name).nbytes
+            writer.write_table(table)
+    file_bytes_before = os.path.getsize(input_path)
+    os.replace(staging_path, output_path)
+
+    columns = {
+        name: {
+            'from': str(profile['type']),
+            'to': str(schema.field(name).type),
+            'bytes_before': profile['bytes'],
+            'bytes_after': bytes_after[name]
+        }
+        for name, profile in profiles.items()
+    }
+    report = {
+        'rtol': rtol,
+        'columns': columns,
+        'bytes_before': sum(c['bytes_before'] for c in columns.values()),
+        'bytes_after': sum(c['bytes_after'] for c in columns.values()),
+        'file_bytes_before': file_bytes_before,
+        'file_bytes_after': os.path.getsize(output_path),
+        'seconds': time.perf_counter() - start
+    }
+    with open(report_path or report_path_for(output_path), 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for name, column in columns.items():
+        print(f"  {name}: {column['from']} -> {column['to']} "
+              f"({column['bytes_before']:,} -> {column['bytes_after']:,} bytes)")
+    print(f"In-memory footprint {report['bytes_before']:,} -> {report['bytes_after']:,} bytes; "
+          f"saved to {output_path}")
+    return report
+
+
+if __name__ == "__main__":
+    INPUT_FILE = sys.argv[1] if len(sys.argv) > 1 else 'data/processed.parquet'
+    OUTPUT_FILE = sys.argv[2] if len(sys.argv) > 2 else INPUT_FILE
+
+    downcast_parquet(INPUT_FILE, OUTPUT_FILE)
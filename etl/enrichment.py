@@ -0,0 +1,307 @@
+"""
+Broadcast hash-join enrichment of streamed fact data with dimension tables.
+
+Dimension (reference) tables are small. Each is loaded once and its key
+columns are built into a hash index. The large fact input then streams
+through batch by batch: each batch's keys are looked up in every index in
+one vectorized call, and the matching dimension columns are gathered onto
+the batch. Fact data is never held in memory beyond one batch, and every
+lookup is counted as a hit or a miss.
+
+Dimensions are usually declared in a JSON file:
+
+    [
+      {"name": "stores", "path": "data/stores.csv", "key": "store_id",
+       "columns": ["region", "store_size"], "prefix": "store_"},
+      {"name": "products", "path": "data/products.parquet", "key": ["sku", "market"],
+       "fact_key": ["product_sku", "market"], "defaults": {"unit_cost": 0.0}}
+    ]
+
+``key`` names the dimension's key columns and ``fact_key`` the matching
+fact columns (the same names if omitted). ``columns`` picks the columns to
+add (all non-key columns by default), and ``prefix`` is put in front of
+their names. With a left join, a fact row whose key is missing gets
+``defaults`` for the listed columns and nulls for the rest. The ETL stages
+drop rows with nulls as incomplete, so only misses covered by defaults
+survive them. With an inner join, missing rows are dropped outright.
+
+    python etl/enrichment.py data/facts.csv data/enriched.parquet --dimensions dimensions.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+# Add repository root to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl.arrow_ipc import is_ipc_path, open_ipc_writer, read_ipc_table
+from etl.data_ingestion import DEFAULT_BLOCK_SIZE, counted_batches, open_csv_stream
+from etl.data_preprocessing import open_row_groups, prefetched_row_groups
+from etl.parquet_layout import ParquetLayout
+from etl.profile import DataProfile
+
+JOIN_TYPES = ('left', 'inner')
+
+
+def read_dimension_table(path: str) -> pa.Table:
+    """A whole dimension table from a CSV, Parquet or Arrow IPC file"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Dimension table not found at {path}")
+    if is_ipc_path(path):
+        return read_ipc_table(path)
+    if path.endswith('.csv'):
+        return pv.read_csv(path)
+    return pq.read_table(path)
+
+
+def _key_index(columns: list):
+    """pandas index over one or more key columns; its hash table is built on first lookup"""
+    arrays = [c.to_pandas() for c in columns]
+    return pd.Index(arrays[0]) if len(arrays) == 1 else pd.MultiIndex.from_arrays(arrays)
+
+
+class Dimension:
+    """
+    A dimension table indexed by its key for lookups from fact batches
+
+    Attributes:
+        name: Label used in hit/miss counts
+        key: Key columns of the dimension table
+        fact_key: Matching key columns of the fact data
+        columns: Dimension columns added to the facts, before prefixing
+        prefix: Prefix for the added column names
+        defaults: Values for added columns when a key is missing
+        table: The added columns, one row per key, in index order
+        path: File the table was read from, if any
+    """
+
+    def __init__(self, name: str, table: pa.Table, key, columns: list = None, prefix: str = '',
+                 fact_key=None, defaults: dict = None):
+        self.name = name
+        self.path = None
+        self.key = [key] if isinstance(key, str) else list(key)
+        self.fact_key = self.key if fact_key is None else ([fact_key] if isinstance(fact_key, str)
+                                                           else list(fact_key))
+        if len(self.fact_key) != len(self.key):
+            raise ValueError(f"Dimension '{name}': fact_key {self.fact_key} does not match key {self.key}")
+        missing = [c for c in self.key + list(columns or []) if c not in table.column_names]
+        if missing:
+            raise ValueError(f"Dimension '{name}': columns not found: {missing}")
+        self.columns = list(columns) if columns is not None else [c for c in table.column_names
+                                                                  if c not in self.key]
+        self.prefix = prefix
+        unknown = [c for c in (defaults or {}) if c not in self.columns]
+        if unknown:
+            raise ValueError(f"Dimension '{name}': defaults for columns it does not add: {unknown}")
+        self.defaults = dict(defaults or {})
+
+        keys = table.select(self.key)
+        if any(c.null_count for c in keys.columns):
+            raise ValueError(f"Dimension '{name}': key {self.key} contains nulls")
+        self.key_types = keys.schema.types
+        self.index = _key_index(keys.columns)
+        if not self.index.is_unique:
+            raise ValueError(f"Dimension '{name}': key {self.key} is not unique")
+        self.table = table.select(self.columns).combine_chunks()
+        # Build the hash table now rather than on the first batch
+        self.index.get_indexer(self.index[:1])
+
+    @classmethod
+    def from_dict(cls, spec: dict) -> "Dimension":
+        spec = dict(spec)
+        path = spec.pop('path')
+        dimension = cls(spec.pop('name'), read_dimension_table(path), **spec)
+        dimension.path = path
+        return dimension
+
+    @property
+    def output_fields(self) -> list:
+        return [pa.field(self.prefix + f.name, f.type) for f in self.table.schema]
+
+    def lookup(self, batch) -> np.ndarray:
+        """Row of the dimension table for every fact row, -1 where the key is missing"""
+        columns = []
+        for name, key_type in zip(self.fact_key, self.key_types):
+            column = batch.column(name)
+            columns.append(column if column.type == key_type else column.cast(key_type))
+        return self.index.get_indexer(_key_index(columns))
+
+    def gather(self, positions: np.ndarray) -> list:
+        """Added columns for looked-up rows: defaults, else nulls, where missing"""
+        missing = positions < 0
+        arrays = [c.combine_chunks() for c in self.table.take(pa.array(positions, mask=missing)).columns]
+        for j, name in enumerate(self.columns):
+            if name in self.defaults and missing.any():
+                arrays[j] = arrays[j].fill_null(pa.scalar(self.defaults[name], arrays[j].type))
+        return arrays
+
+
+def load_dimensions(path: str) -> list:
+    """Dimensions declared in a JSON file (format in the module docstring)"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Dimension spec not found at {path}")
+    with open(path) as f:
+        return [Dimension.from_dict(spec) for spec in json.load(f)]
+
+
+class Enricher:
+    """
+    Joins fact batches with a list of dimensions and counts hits and misses
+
+    Usage::
+
+        enricher = Enricher(load_dimensions('dimensions.json'))
+        schema = enricher.output_schema(fact_schema)
+        for batch in batches:
+            enriched = enricher.enrich(batch)
+    """
+
+    def __init__(self, dimensions: list, how: str = 'left'):
+        if how not in JOIN_TYPES:
+            raise ValueError(f"Unknown join type '{how}', expected one of {JOIN_TYPES}")
+        names = [d.name for d in dimensions]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Dimension names must be unique, got {names}")
+        self.dimensions = dimensions
+        self.how = how
+        self.counts = {name: {'hits': 0, 'misses': 0} for name in names}
+
+    def output_schema(self, schema: pa.Schema) -> pa.Schema:
+        """Fact schema followed by every dimension's added columns"""
+        for dimension in self.dimensions:
+            missing = [c for c in dimension.fact_key if c not in schema.names]
+            if missing:
+                raise ValueError(f"Dimension '{dimension.name}': fact columns not found: {missing}")
+            for field in dimension.output_fields:
+                if field.name in schema.names:
+                    raise ValueError(f"Dimension '{dimension.name}' would add '{field.name}', "
+                                     f"which already exists; set a prefix")
+                schema = schema.append(field)
+        return schema
+
+    def enrich(self, batch: pa.RecordBatch) -> pa.RecordBatch:
+        """The batch with every dimension's columns appended"""
+        positions = []
+        for dimension in self.dimensions:
+            found = dimension.lookup(batch)
+            hits = int(np.count_nonzero(found >= 0))
+            self.counts[dimension.name]['hits'] += hits
+            self.counts[dimension.name]['misses'] += len(found) - hits
+            positions.append(found)
+        if self.how == 'inner' and positions:
+            matched = np.logical_and.reduce([p >= 0 for p in positions])
+            if not matched.all():
+                batch = batch.filter(pa.array(matched))
+                positions = [p[matched] for p in positions]
+        arrays = list(batch.columns)
+        for dimension, found in zip(self.dimensions, positions):
+            arrays += dimension.gather(found)
+        return pa.RecordBatch.from_arrays(arrays, schema=self.output_schema(batch.schema))
+
+    def summary(self) -> dict:
+        """Hit and miss counts and hit rate per dimension"""
+        summary = {}
+        for name, counts in self.counts.items():
+            looked_up = counts['hits'] + counts['misses']
+            summary[name] = dict(counts, hit_rate=counts['hits'] / looked_up if looked_up else 0.0)
+        return summary
+
+
+def enriched_batches(batches, enricher: Enricher, summary: dict):
+    """
+    Pass every batch through ``enricher``; ``summary`` is filled in with
+    the hit/miss counts once the batches are exhausted
+    """
+    for batch in batches:
+        enriched = enricher.enrich(batch)
+        if enriched.num_rows:
+            yield enriched
+    summary.update(enricher.summary())
+    for name, counts in summary.items():
+        print(f"Join '{name}': {counts['hits']} hits, {counts['misses']} misses "
+              f"({counts['hit_rate']:.1%} hit rate)")
+
+
+def _fact_batches(input_path: str, block_size: int):
+    """Record batches of a CSV, Parquet or Arrow IPC fact file (call ``close()`` when done), and its schema"""
+    if input_path.endswith('.csv'):
+        reader = open_csv_stream(input_path, block_size)
+        return reader, reader.schema
+    row_groups = open_row_groups(input_path)
+    batches = (batch for table in prefetched_row_groups(row_groups) for batch in table.to_batches())
+    return batches, row_groups.schema_arrow
+
+
+def enrich_streaming(input_path: str, output_path: str, dimensions: list, how: str = 'left',
+                     block_size: int = DEFAULT_BLOCK_SIZE, layout: ParquetLayout = None):
+    """
+    Join a fact file with dimension tables, one batch at a time
+
+    Only the dimension tables and one fact batch are in memory. The output
+    gets a profile sidecar (see ``etl.profile``) like the other stages.
+
+    Args:
+        input_path: Fact data: CSV, Parquet or Arrow IPC
+        output_path: Parquet file to write, or an Arrow IPC file (``.arrow``)
+        dimensions: Dimension objects (see :func:`load_dimensions`)
+        how: ``left`` keeps facts without a match, ``inner`` drops them
+        block_size: Bytes of CSV per record batch
+        layout: Output row-group size, codecs, sort order and statistics
+
+    Returns:
+        Dictionary with row counts, seconds and a ``joins`` summary of
+        hits and misses per dimension
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Fact data not found at {input_path}")
+    if layout is not None and is_ipc_path(output_path):
+        raise ValueError("A Parquet layout cannot be applied to an Arrow IPC output")
+
+    print(f"Enriching {input_path} with {', '.join(d.name for d in dimensions)}...")
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    start = time.perf_counter()
+    enricher = Enricher(dimensions, how)
+    stats = {'rows_read': 0, 'rows_written': 0, 'batches': 0, 'joins': {}}
+    batches, schema = _fact_batches(input_path, block_size)
+    schema = enricher.output_schema(schema)
+    profile = DataProfile(schema)
+    if is_ipc_path(output_path):
+        output = open_ipc_writer(output_path, schema)
+    else:
+        output = (layout or ParquetLayout()).open_writer(output_path, schema)
+    try:
+        with output as writer:
+            for batch in enriched_batches(counted_batches(batches, stats), enricher, stats['joins']):
+                writer.write_batch(batch)
+                profile.update(batch)
+                stats['rows_written'] += batch.num_rows
+    finally:
+        batches.close()
+    profile.save(output_path)
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['rows_per_sec'] = stats['rows_read'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+    print(f"Enriched {stats['rows_read']} rows in {stats['batches']} batches, wrote {stats['rows_written']} "
+          f"({stats['rows_per_sec']:,.0f} rows/sec) to {output_path}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Join fact data with dimension tables")
+    parser.add_argument('input', help='Fact data: CSV, Parquet or Arrow IPC')
+    parser.add_argument('output', help='Parquet or Arrow IPC file to write')
+    parser.add_argument('--dimensions', required=True, help='JSON file of dimension specs')
+    parser.add_argument('--how', choices=JOIN_TYPES, default='left')
+    parser.add_argument('--layout', help='JSON file of ParquetLayout settings for the output')
+    args = parser.parse_args()
+
+    enrich_streaming(args.input, args.output, load_dimensions(args.dimensions), how=args.how,
+                     layout=ParquetLayout.from_json(args.layout) if args.layout else None)
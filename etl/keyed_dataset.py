@@ -0,0 +1,451 @@
+"""
+Keyed Parquet datasets with merge-on-read upserts, compaction and snapshots.
+
+Correcting a few historical rows of ``processed.parquet`` means rewriting
+all of it. A keyed dataset takes corrections as upserts instead. Rows are
+spread over ``num_buckets`` directories by a hash of their key columns, and
+an upsert adds one small delta file to each bucket it touches. Readers merge
+on read: a bucket's files are read in commit order and the newest row for
+each key wins. ``compact`` rewrites a bucket's deltas and small files into
+base files sorted by key, in well-sized row groups, so reads stay cheap as
+corrections pile up.
+
+Every commit (upsert or compaction) writes a snapshot, a JSON manifest under
+``_snapshots/`` listing the live data files and the commit that added each.
+Data files are never modified. A manifest is published with a hard link,
+which fails if a concurrent writer took that version first; the commit is
+then retried on top of the newer snapshot. A reader that opened a snapshot
+keeps seeing exactly its files, whatever is committed afterwards, until
+``expire`` removes old snapshots and the files only they referenced. This
+lets compaction run as a separate background job next to writers and
+readers.
+
+    <root>/_snapshots/00000003.json
+    <root>/bucket-0005/base-<id>.parquet
+    <root>/bucket-0005/delta-<id>.parquet
+
+    python etl/keyed_dataset.py upsert data/processed corrections.csv --key record_id
+    python etl/keyed_dataset.py compact data/processed
+    python etl/keyed_dataset.py expire data/processed --keep 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Add repository root to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deployment.app.feature_transform import FeatureTransform
+from etl.arrow_ipc import is_ipc_path, read_ipc_table
+from etl.data_preprocessing import scale_table, scaled_schema
+from etl.dedup import row_fingerprints
+from etl.parquet_layout import ParquetLayout
+
+FORMAT_VERSION = 1
+SNAPSHOT_DIR = '_snapshots'
+
+DEFAULT_BUCKETS = 16
+
+# Compaction writes base files of at most this many rows, in row groups of DEFAULT_ROW_GROUP_ROWS
+DEFAULT_TARGET_FILE_ROWS = 1 << 22
+DEFAULT_ROW_GROUP_ROWS = 1 << 17
+
+# Snapshots that expire keeps, newest first
+DEFAULT_KEEP_SNAPSHOTS = 5
+
+COMMIT_RETRIES = 20
+
+_ROW = '_row'
+
+
+def is_keyed_dataset(path: str) -> bool:
+    return os.path.isdir(os.path.join(path, SNAPSHOT_DIR))
+
+
+def bucket_of(table: pa.Table, key: list, num_buckets: int) -> np.ndarray:
+    """Bucket of every row, from the top bits of a 64-bit hash of its key"""
+    if num_buckets == 1:
+        return np.zeros(table.num_rows, dtype=np.intp)
+    hi, _ = row_fingerprints(table.select(key).to_pandas())
+    return (hi >> np.uint64(64 - (num_buckets.bit_length() - 1))).astype(np.intp)
+
+
+def latest_rows(table: pa.Table, key: list) -> pa.Table:
+    """The last row of every key, keeping the order in which those rows appear"""
+    rows = pa.array(np.arange(table.num_rows, dtype=np.int64))
+    last = table.select(key).append_column(_ROW, rows).group_by(key, use_threads=False).aggregate([(_ROW, 'max')])
+    return table.take(np.sort(last[f'{_ROW}_max'].to_numpy()))
+
+
+def _needs_compaction(files: list, target_file_rows: int) -> bool:
+    """A bucket with deltas, or with more than one base file well under the target size"""
+    small = sum(f['rows'] < target_file_rows // 2 for f in files)
+    return any(f['kind'] == 'delta' for f in files) or small > 1
+
+
+class Snapshot:
+    """
+    One committed version of a keyed dataset: an immutable list of files
+
+    Attributes:
+        root: Dataset directory
+        version: Commit number, counting up from 0 (the empty dataset)
+        key: Key column names
+        num_buckets: Number of hash buckets
+        files: Data files, each a dict with the ``path`` relative to root,
+            ``bucket``, ``kind`` (``base`` or ``delta``), the ``sequence``
+            of the commit its rows come from, and ``rows``
+    """
+
+    def __init__(self, root: str, manifest: dict):
+        self.root = root
+        self.version = manifest['version']
+        self.key = manifest['key']
+        self.num_buckets = manifest['num_buckets']
+        self.files = manifest['files']
+        self.operation = manifest['operation']
+        self.created_at = manifest['created_at']
+
+    @property
+    def rows(self) -> int:
+        """Rows stored, counting every version of a key still held in deltas"""
+        return sum(f['rows'] for f in self.files)
+
+    @property
+    def schema(self) -> pa.Schema:
+        return pq.read_schema(self.paths()[0]) if self.files else None
+
+    def paths(self) -> list:
+        return [os.path.join(self.root, f['path']) for f in self.files]
+
+    def buckets(self) -> dict:
+        """Files of each bucket, oldest commit first"""
+        buckets = {}
+        for f in sorted(self.files, key=lambda f: f['sequence']):
+            buckets.setdefault(f['bucket'], []).append(f)
+        return dict(sorted(buckets.items()))
+
+    def dataset(self) -> ds.Dataset:
+        """The snapshot's files as a dataset, without merging (for metadata and footers)"""
+        return ds.dataset(self.paths(), format='parquet')
+
+    def read_bucket(self, files: list, columns: list = None, filter_expression=None) -> pa.Table:
+        """
+        Merge a bucket's files into the newest row of every key
+
+        Args:
+            files: The bucket's files, oldest commit first
+            columns: Columns to return (all if None); must include every
+                column the filter reads
+            filter_expression: Row filter applied after merging
+        """
+        paths = [os.path.join(self.root, f['path']) for f in files]
+        if len(paths) == 1 or all(f['kind'] == 'base' for f in files):
+            # One file, or the disjoint output of one compaction: a row per key, so filter while reading
+            return ds.dataset(paths, format='parquet').to_table(columns=columns, filter=filter_expression)
+        read = None if columns is None else list(columns) + [k for k in self.key if k not in columns]
+        table = latest_rows(pa.concat_tables([pq.read_table(p, columns=read) for p in paths]), self.key)
+        if filter_expression is not None:
+            table = table.filter(filter_expression)
+        return table if columns is None else table.select(columns)
+
+    def to_table(self, columns: list = None, filter_expression=None) -> pa.Table:
+        """
+        Rows as of this snapshot, one per key, bucket by bucket
+
+        Args:
+            columns: Columns to return (all if None); must include every
+                column the filter reads
+            filter_expression: ``pyarrow.compute`` row filter, applied to
+                the merged rows so an older version never shows through
+        """
+        if not self.files:
+            return pa.table({})
+        tables = [self.read_bucket(files, columns, filter_expression) for files in self.buckets().values()]
+        return pa.concat_tables(tables)
+
+
+class KeyedDataset:
+    """
+    Directory of Parquet files with keyed upserts, compaction and snapshots
+
+    Opening a new directory creates the dataset (version 0, no rows), for
+    which ``key`` is required. An existing dataset keeps the key and bucket
+    count it was created with.
+    """
+
+    def __init__(self, root: str, key: list = None, num_buckets: int = DEFAULT_BUCKETS):
+        self.root = root
+        self.snapshot_dir = os.path.join(root, SNAPSHOT_DIR)
+        if not self.versions():
+            if not key:
+                raise ValueError(f"No keyed dataset at {root}; key columns are needed to create one")
+            if num_buckets < 1 or num_buckets & (num_buckets - 1):
+                raise ValueError(f"num_buckets must be a power of two, got {num_buckets}")
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            self._publish({'version': 0, 'key': list(key), 'num_buckets': num_buckets, 'files': []},
+                          'create')
+        latest = self.snapshot()
+        if key and list(key) != latest.key:
+            raise ValueError(f"Dataset at {root} is keyed by {latest.key}, not {list(key)}")
+        self.key = latest.key
+        self.num_buckets = latest.num_buckets
+
+    def versions(self) -> list:
+        if not os.path.isdir(self.snapshot_dir):
+            return []
+        names = (os.path.splitext(n)[0] for n in os.listdir(self.snapshot_dir) if n.endswith('.json'))
+        return sorted(int(n) for n in names if n.isdigit())
+
+    def _manifest_path(self, version: int) -> str:
+        return os.path.join(self.snapshot_dir, f"{version:08d}.json")
+
+    def snapshot(self, version: int = None) -> Snapshot:
+        """A committed version (the latest by default), unaffected by later commits"""
+        if version is None:
+            versions = self.versions()
+            if not versions:
+                raise FileNotFoundError(f"No keyed dataset at {self.root}")
+            version = versions[-1]
+        path = self._manifest_path(version)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Snapshot {version} not found in {self.root}")
+        with open(path) as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format {manifest.get('format_version')} in {path}")
+        return Snapshot(self.root, manifest)
+
+    def _publish(self, manifest: dict, operation: str) -> bool:
+        """Write a manifest under its version unless another commit already took it"""
+        manifest = dict(manifest, format_version=FORMAT_VERSION, operation=operation,
+                        created_at=datetime.now().isoformat())
+        staging = os.path.join(self.snapshot_dir, f".{uuid.uuid4().hex}.tmp")
+        with open(staging, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        try:
+            # Unlike os.replace, a link never overwrites: exactly one writer wins each version
+            os.link(staging, self._manifest_path(manifest['version']))
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(staging)
+
+    def _commit(self, operation: str, apply) -> Snapshot:
+        """
+        Commit ``apply(files, version)`` on top of the latest snapshot,
+        retrying on a newer one if a concurrent commit got there first
+
+        Returns:
+            The new snapshot, or None if ``apply`` gave up (returned None)
+        """
+        for _ in range(COMMIT_RETRIES):
+            base = self.snapshot()
+            version = base.version + 1
+            files = apply(base.files, version)
+            if files is None:
+                return None
+            manifest = {'version': version, 'key': self.key, 'num_buckets': self.num_buckets, 'files': files}
+            if self._publish(manifest, operation):
+                return self.snapshot(version)
+        raise RuntimeError(f"Could not commit to {self.root} after {COMMIT_RETRIES} attempts")
+
+    def _write(self, table: pa.Table, bucket: int, kind: str, layout: ParquetLayout = None) -> dict:
+        path = os.path.join(f"bucket-{bucket:04d}", f"{kind}-{uuid.uuid4().hex}.parquet")
+        os.makedirs(os.path.join(self.root, os.path.dirname(path)), exist_ok=True)
+        if layout is None:
+            pq.write_table(table, os.path.join(self.root, path))
+        else:
+            layout.write_table(table, os.path.join(self.root, path))
+        return {'path': path, 'bucket': bucket, 'kind': kind, 'rows': table.num_rows}
+
+    def _conform(self, data) -> pa.Table:
+        """Updates as a table in the dataset's column order and types"""
+        table = pa.Table.from_pandas(data, preserve_index=False) if isinstance(data, pd.DataFrame) else data
+        table = table.replace_schema_metadata(None)
+        missing = [k for k in self.key if k not in table.column_names]
+        if missing:
+            raise ValueError(f"Key columns not found in updates: {missing}")
+        if any(table.column(k).null_count for k in self.key):
+            raise ValueError(f"Key columns {self.key} must not contain nulls")
+        schema = self.snapshot().schema
+        if schema is None:
+            return table
+        missing = [c for c in schema.names if c not in table.column_names]
+        if missing:
+            raise ValueError(f"Columns not found in updates: {missing}")
+        return table.select(schema.names).cast(schema)
+
+    def upsert(self, data) -> dict:
+        """
+        Insert rows, replacing the current row of any key that exists
+
+        Updates are written as one delta file per bucket and become visible
+        together when the commit is published. If a key repeats within the
+        updates, its last row wins.
+
+        Args:
+            data: Table or DataFrame with the dataset's columns (extra
+                columns are dropped); the first upsert defines the schema
+
+        Returns:
+            Dictionary with the committed ``version``, rows and files written
+        """
+        start = time.perf_counter()
+        table = latest_rows(self._conform(data), self.key)
+        buckets = bucket_of(table, self.key, self.num_buckets)
+        order = np.argsort(buckets, kind='stable')
+        bounds = np.searchsorted(buckets[order], np.arange(self.num_buckets + 1))
+        written = [self._write(table.take(order[bounds[b]:bounds[b + 1]]), int(b), 'delta')
+                   for b in np.flatnonzero(np.diff(bounds))]
+
+        snapshot = self._commit('upsert', lambda files, version: files + [dict(f, sequence=version)
+                                                                           for f in written])
+        summary = {'version': snapshot.version, 'rows': table.num_rows, 'files': len(written),
+                   'seconds': time.perf_counter() - start}
+        print(f"Upserted {summary['rows']} rows into {len(written)} buckets of {self.root} "
+              f"(version {summary['version']}) in {summary['seconds']:.2f}s")
+        return summary
+
+    def compact(self, target_file_rows: int = DEFAULT_TARGET_FILE_ROWS, layout: ParquetLayout = None) -> dict:
+        """
+        Rewrite buckets with deltas or several small files into base files
+
+        Each such bucket is merged to one row per key, sorted, and written
+        as base files of at most ``target_file_rows`` rows. The new files
+        carry the sequence of the newest commit they merged, so deltas
+        committed while compaction ran still override them. If another
+        compaction replaced the same files first, nothing is committed.
+
+        Args:
+            target_file_rows: Maximum rows per base file
+            layout: Layout of the base files (default: sorted by key, in
+                row groups of DEFAULT_ROW_GROUP_ROWS)
+
+        Returns:
+            Dictionary with the committed ``version`` (None if there was
+            nothing to do) and the files and rows read and written
+        """
+        start = time.perf_counter()
+        layout = layout or ParquetLayout(row_group_size=DEFAULT_ROW_GROUP_ROWS, sort_by=self.key)
+        snapshot = self.snapshot()
+        replaced, written = [], []
+        for bucket, files in snapshot.buckets().items():
+            if not _needs_compaction(files, target_file_rows):
+                continue
+            table = layout.sort(snapshot.read_bucket(files))
+            sequence = max(f['sequence'] for f in files)
+            for offset in range(0, table.num_rows, target_file_rows):
+                part = table.slice(offset, target_file_rows)
+                written.append(dict(self._write(part, bucket, 'base', layout), sequence=sequence))
+            replaced += files
+
+        summary = {'version': None, 'files_read': len(replaced), 'rows_read': sum(f['rows'] for f in replaced),
+                   'files_written': len(written), 'rows_written': sum(f['rows'] for f in written)}
+        replaced_paths = {f['path'] for f in replaced}
+
+        def apply(files, version):
+            if not replaced_paths <= {f['path'] for f in files}:
+                return None
+            return [f for f in files if f['path'] not in replaced_paths] + written
+
+        committed = self._commit('compact', apply) if replaced else None
+        if committed is None:
+            for f in written:
+                os.remove(os.path.join(self.root, f['path']))
+            summary.update(files_written=0, rows_written=0)
+        else:
+            summary['version'] = committed.version
+        summary['seconds'] = time.perf_counter() - start
+        print(f"Compacted {summary['files_read']} files ({summary['rows_read']} rows) into "
+              f"{summary['files_written']} files ({summary['rows_written']} rows) "
+              f"in {summary['seconds']:.2f}s")
+        return summary
+
+    def expire(self, keep: int = DEFAULT_KEEP_SNAPSHOTS) -> dict:
+        """
+        Remove all but the newest ``keep`` snapshots, and the data files
+        that only the removed snapshots referenced
+
+        Readers must not hold an expired snapshot. Files written by commits
+        still in progress are in no snapshot yet and are left alone.
+
+        Returns:
+            Dictionary with the snapshots and files removed
+        """
+        if keep < 1:
+            raise ValueError(f"keep must be at least 1, got {keep}")
+        versions = self.versions()
+        expired, retained = versions[:-keep], versions[-keep:]
+        live = {f['path'] for v in retained for f in self.snapshot(v).files}
+        unreferenced = {f['path'] for v in expired for f in self.snapshot(v).files} - live
+        for v in expired:
+            os.remove(self._manifest_path(v))
+        for path in unreferenced:
+            if os.path.exists(os.path.join(self.root, path)):
+                os.remove(os.path.join(self.root, path))
+        print(f"Expired {len(expired)} snapshots and {len(unreferenced)} files from {self.root}")
+        return {'snapshots': len(expired), 'files': len(unreferenced)}
+
+
+def read_updates(path: str) -> pa.Table:
+    """Updates from a Parquet, Arrow IPC or CSV file"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Updates not found at {path}")
+    if is_ipc_path(path):
+        return read_ipc_table(path)
+    if path.endswith('.csv'):
+        return pv.read_csv(path)
+    return pq.read_table(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upsert into, compact or expire a keyed dataset")
+    commands = parser.add_subparsers(dest='command', required=True)
+    upsert_parser = commands.add_parser('upsert', help='Insert or replace rows by key')
+    upsert_parser.add_argument('root')
+    upsert_parser.add_argument('updates', help='Parquet, Arrow IPC or CSV file of rows')
+    upsert_parser.add_argument('--key', nargs='+', help='Key columns (required for a new dataset)')
+    upsert_parser.add_argument('--buckets', type=int, default=DEFAULT_BUCKETS)
+    upsert_parser.add_argument('--transform', help='Scale raw rows with this saved FeatureTransform first')
+    compact_parser = commands.add_parser('compact', help='Merge deltas and small files')
+    compact_parser.add_argument('root')
+    compact_parser.add_argument('--target-file-rows', type=int, default=DEFAULT_TARGET_FILE_ROWS)
+    compact_parser.add_argument('--layout', help='JSON file of ParquetLayout settings for base files')
+    expire_parser = commands.add_parser('expire', help='Remove old snapshots and unreferenced files')
+    expire_parser.add_argument('root')
+    expire_parser.add_argument('--keep', type=int, default=DEFAULT_KEEP_SNAPSHOTS)
+    list_parser = commands.add_parser('snapshots', help='List snapshots, oldest first')
+    list_parser.add_argument('root')
+    args = parser.parse_args()
+
+    if args.command == 'upsert':
+        dataset = KeyedDataset(args.root, args.key, args.buckets)
+        updates = read_updates(args.updates)
+        if args.transform:
+            transform = FeatureTransform.load(args.transform)
+            updates = scale_table(updates, transform, scaled_schema(updates.schema, transform.columns))
+        dataset.upsert(updates)
+    elif args.command == 'compact':
+        layout = ParquetLayout.from_json(args.layout) if args.layout else None
+        KeyedDataset(args.root).compact(args.target_file_rows, layout)
+    elif args.command == 'expire':
+        KeyedDataset(args.root).expire(args.keep)
+    else:
+        dataset = KeyedDataset(args.root)
+        for version in dataset.versions():
+            snapshot = dataset.snapshot(version)
+            print(f"{version:>8}  {snapshot.created_at}  {snapshot.operation:<8}"
+                  f"{len(snapshot.files):>6} files{snapshot.rows:>12,} rows")
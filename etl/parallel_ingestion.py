@@ -0,0 +1,241 @@
+import os
+import sys
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Add repository root to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl.data_ingestion import DEFAULT_BLOCK_SIZE, kept_batches, open_csv_stream
+from etl.dedup import DEFAULT_PARTITIONS, FingerprintSpiller, first_occurrences
+from etl.incremental_ingestion import resolve_sources
+from etl.parquet_layout import ParquetLayout
+from etl.profile import DataProfile, profiled
+
+# Row ids shared by all files in one dedup space are (file index << ROW_BITS) | row,
+# allowing 2^40 rows per file and 2^24 files per run.
+ROW_BITS = 40
+
+def _init_worker(threads: int):
+    # Each worker parses with Arrow's own thread pool; share the cores out
+    # so N workers do not oversubscribe the machine
+    pa.set_cpu_count(threads)
+
+def _spill_file(task) -> dict:
+    """
+    Worker, phase 1: stream one CSV, drop nulls, spill the rows to an Arrow
+    IPC file and (optionally) their fingerprints to the shared partition layout
+    """
+    file_idx, path, scratch, block_size, schema, num_partitions, dedup = task
+    spiller = None
+    if dedup:
+        spiller = FingerprintSpiller(os.path.join(scratch, f'fp-{file_idx:05d}'), num_partitions,
+                                     row_offset=file_idx << ROW_BITS)
+    spill_path = os.path.join(scratch, f'spill-{file_idx:05d}.arrow')
+    rows_read = rows_spilled = 0
+    with open_csv_stream(path, block_size, schema) as reader, \
+            pa.OSFile(spill_path, 'wb') as sink, pa.ipc.new_stream(sink, schema) as spill:
+        for batch in reader:
+            rows_read += batch.num_rows
+            table = pa.Table.from_batches([batch]).drop_null()
+            if table.num_rows:
+                if spiller is not None:
+                    spiller.add(table.to_pandas())
+                spill.write_table(table)
+                rows_spilled += table.num_rows
+    if spiller is not None:
+        spiller.close()
+    return {'file_idx': file_idx, 'rows_read': rows_read, 'rows_spilled': rows_spilled}
+
+def _mask_path(scratch: str, file_idx: int) -> str:
+    return os.path.join(scratch, f'keep-{file_idx:05d}.mask')
+
+def _reduce_partition(task) -> int:
+    """
+    Worker, phase 2: deduplicate one fingerprint partition across every file
+    and mark the surviving rows in the per-file keep masks
+    """
+    partition, scratch, row_counts = task
+    paths = [os.path.join(scratch, f'fp-{i:05d}', f'fingerprints-{partition:05d}.bin')
+             for i in range(len(row_counts))]
+    kept = first_occurrences(paths)
+    file_ids = (kept >> np.uint64(ROW_BITS)).astype(np.intp)
+    rows = (kept & np.uint64((1 << ROW_BITS) - 1)).astype(np.intp)
+    bounds = np.searchsorted(file_ids, np.arange(len(row_counts) + 1))
+    for file_idx in np.flatnonzero(np.diff(bounds)):
+        # Partitions mark disjoint rows, so concurrent writers never overlap
+        mask = np.memmap(_mask_path(scratch, file_idx), dtype=np.bool_, mode='r+',
+                         shape=(row_counts[file_idx],))
+        mask[rows[bounds[file_idx]:bounds[file_idx + 1]]] = True
+        mask.flush()
+        del mask
+    return len(kept)
+
+def _write_file(task):
+    """
+    Worker, phase 3: write one file's surviving rows into the dataset
+
+    Returns:
+        (paths of the Parquet files written, profile of the rows written)
+    """
+    file_idx, scratch, rows, schema, output_dir, partition_cols, dedup, layout = task
+    mask = None
+    if dedup:
+        mask = np.memmap(_mask_path(scratch, file_idx), dtype=np.bool_, mode='r', shape=(max(rows, 1),))
+    spill_path = os.path.join(scratch, f'spill-{file_idx:05d}.arrow')
+    profile = DataProfile(schema)
+    reader = pa.RecordBatchReader.from_batches(schema, profiled(kept_batches(spill_path, mask), profile))
+
+    written = []
+    partitioning = None
+    file_schema = schema
+    if partition_cols:
+        partitioning = ds.partitioning(pa.schema([schema.field(c) for c in partition_cols]), flavor='hive')
+        file_schema = pa.schema([f for f in schema if f.name not in partition_cols])
+    row_groups = {}
+    if layout.row_group_size is not None:
+        row_groups = {'min_rows_per_group': layout.row_group_size, 'max_rows_per_group': layout.row_group_size}
+    file_options = ds.ParquetFileFormat().make_write_options(**layout.writer_options(file_schema))
+    ds.write_dataset(reader, output_dir, format='parquet', partitioning=partitioning,
+                     basename_template=f'part-{file_idx:05d}-{{i}}.parquet',
+                     existing_data_behavior='overwrite_or_ignore', file_options=file_options,
+                     file_visitor=lambda f: written.append(f.path), **row_groups)
+    return written, profile
+
+def write_dataset_metadata(output_dir: str, files: list, schema: pa.Schema):
+    """
+    Write ``_common_metadata`` and a ``_metadata`` summary of every row group
+
+    Readers can plan a scan of the whole dataset from ``_metadata`` without
+    opening each part's footer.
+    """
+    collected = None
+    for path in sorted(files):
+        metadata = pq.read_metadata(path)
+        metadata.set_file_path(os.path.relpath(path, output_dir).replace(os.sep, '/'))
+        if collected is None:
+            collected = metadata
+        else:
+            collected.append_row_groups(metadata)
+    pq.write_metadata(schema, os.path.join(output_dir, '_common_metadata'))
+    if collected is not None:
+        collected.write_metadata_file(os.path.join(output_dir, '_metadata'))
+
+def ingest_parallel(source, output_dir: str, workers: int = None, partition_cols: list = None,
+                    block_size: int = DEFAULT_BLOCK_SIZE, schema: pa.Schema = None,
+                    dedup: bool = True, num_partitions: int = DEFAULT_PARTITIONS,
+                    overwrite: bool = False, layout: ParquetLayout = None):
+    """
+    Ingest many CSV files in parallel into a hive-partitioned Parquet dataset
+
+    Work runs in three phases, each spread across a process pool: files are
+    streamed, cleaned of nulls and spilled (one task per file); fingerprint
+    partitions are deduplicated across all files (one task per partition);
+    and each file's surviving rows are written to the dataset (one task per
+    file). Duplicates are removed across the whole input, keeping the first
+    copy in sorted file order, so the result does not depend on scheduling.
+    A ``_metadata`` summary of all row groups is written last, with a
+    ``_profile.json`` merged from per-file profiles (see ``etl.profile``).
+
+    Args:
+        source: Directory of CSV files, glob pattern or list of paths
+        output_dir: Root of the output dataset
+        workers: Process pool size (defaults to the CPU count)
+        partition_cols: Columns to hive-partition by (``col=value/`` dirs)
+        block_size: Streaming block size per worker
+        schema: Explicit column types; inferred from the first file if None,
+            then enforced on every file so all parts share one schema
+        dedup: Remove duplicate rows across all files
+        num_partitions: Fingerprint partitions (power of two)
+        overwrite: Replace an existing non-empty ``output_dir``
+        layout: Row-group size, codecs and statistics for every part (see
+            ``etl.parquet_layout``); sorting is not supported here
+
+    Returns:
+        Dictionary of ingestion statistics, including rows/sec
+    """
+    layout = layout or ParquetLayout()
+    if layout.sort_by:
+        raise ValueError("Parallel ingestion writes parts concurrently and cannot sort; "
+                         "sort with preprocessing or the fused pipeline instead")
+    paths = resolve_sources(source)
+    if not paths:
+        raise FileNotFoundError(f"No source files found for {source}")
+    if len(paths) >= 1 << (64 - ROW_BITS):
+        raise ValueError(f"Too many source files ({len(paths)}) for one run")
+    if os.path.isdir(output_dir) and os.listdir(output_dir):
+        if not overwrite:
+            raise ValueError(f"Output directory {output_dir} is not empty")
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    if schema is None:
+        with open_csv_stream(paths[0], block_size) as reader:
+            schema = reader.schema
+    for col in partition_cols or []:
+        if schema.get_field_index(col) < 0:
+            raise ValueError(f"Partition column '{col}' not in schema")
+
+    workers = workers or os.cpu_count() or 1
+    print(f"Ingesting {len(paths)} files with {workers} workers...")
+    start = time.perf_counter()
+    parent = os.path.dirname(os.path.abspath(output_dir))
+    with tempfile.TemporaryDirectory(prefix='.ingest-', dir=parent) as scratch, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                initargs=(max(1, (os.cpu_count() or 1) // workers),)) as pool:
+        spilled = list(pool.map(_spill_file, [
+            (i, path, scratch, block_size, schema, num_partitions, dedup)
+            for i, path in enumerate(paths)
+        ]))
+        row_counts = [s['rows_spilled'] for s in spilled]
+
+        if dedup:
+            for i, rows in enumerate(row_counts):
+                np.memmap(_mask_path(scratch, i), dtype=np.bool_, mode='w+', shape=(max(rows, 1),)).flush()
+            rows_written = sum(pool.map(_reduce_partition, [
+                (p, scratch, row_counts) for p in range(num_partitions)
+            ]))
+        else:
+            rows_written = sum(row_counts)
+
+        written, profile = [], DataProfile(schema)
+        for files, file_profile in pool.map(_write_file, [
+            (i, scratch, rows, schema, output_dir, partition_cols, dedup, layout)
+            for i, rows in enumerate(row_counts)
+        ]):
+            written.extend(files)
+            profile.merge(file_profile)
+
+    file_schema = schema
+    for col in partition_cols or []:
+        file_schema = file_schema.remove(file_schema.get_field_index(col))
+    write_dataset_metadata(output_dir, written, file_schema)
+    profile.save(output_dir)
+    elapsed = time.perf_counter() - start
+
+    stats = {
+        'files': len(paths),
+        'workers': workers,
+        'rows_read': sum(s['rows_read'] for s in spilled),
+        'rows_written': rows_written,
+        'parts': len(written),
+        'seconds': elapsed
+    }
+    stats['rows_per_sec'] = stats['rows_read'] / elapsed if elapsed > 0 else 0.0
+    print(f"Ingested {stats['rows_read']} records from {stats['files']} files, "
+          f"wrote {stats['rows_written']} to {stats['parts']} parts "
+          f"({stats['rows_per_sec']:,.0f} rows/sec)")
+    return stats
+
+if __name__ == "__main__":
+    SOURCE = sys.argv[1] if len(sys.argv) > 1 else 'data/raw'
+    OUTPUT_DIR = sys.argv[2] if len(sys.argv) > 2 else 'data/dataset'
+    PARTITION_COLS = sys.argv[3].split(',') if len(sys.argv) > 3 else None
+
+    ingest_parallel(SOURCE, OUTPUT_DIR, partition_cols=PARTITION_COLS, overwrite=True)
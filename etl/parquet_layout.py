@@ -0,0 +1,170 @@
+"""
+Physical layout settings for the Parquet files written by the ETL stages.
+
+Readers skip data using the min/max statistics stored per row group (and,
+with a page index, per page). Those statistics only help when similar values
+are stored together, so a layout combines a target row-group size with an
+optional sort order, per-column codecs, dictionary encoding and statistics
+settings. The defaults match pyarrow's, so passing no layout leaves output
+unchanged.
+"""
+import json
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+CODECS = ('none', 'snappy', 'gzip', 'brotli', 'lz4', 'zstd')
+
+
+class ParquetLayout:
+    """
+    How a Parquet file is laid out on disk
+
+    Attributes:
+        row_group_size: Target rows per row group; None writes each batch as
+            it comes (streaming writers) or uses pyarrow's default
+        compression: Default codec for every column
+        column_compression: Per-column codec overrides
+        compression_level: Codec level (zstd, gzip, brotli)
+        use_dictionary: Dictionary-encode all columns (bool) or only these
+        sort_by: Columns to sort by; whole files are sorted when written in
+            one go, streamed output is clustered within each row group
+        write_statistics: Row-group min/max statistics, for all columns or
+            only these
+        write_page_index: Also write page-level min/max (column index)
+        data_page_size: Target page size in bytes (pyarrow default if None)
+    """
+
+    def __init__(self, row_group_size: int = None, compression: str = 'snappy',
+                 column_compression: dict = None, compression_level: int = None,
+                 use_dictionary=True, sort_by: list = None, write_statistics=True,
+                 write_page_index: bool = False, data_page_size: int = None):
+        for codec in [compression, *(column_compression or {}).values()]:
+            if codec.lower() not in CODECS:
+                raise ValueError(f"Unknown compression codec '{codec}', expected one of {CODECS}")
+        if row_group_size is not None and row_group_size < 1:
+            raise ValueError(f"row_group_size must be positive, got {row_group_size}")
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.column_compression = dict(column_compression or {})
+        self.compression_level = compression_level
+        self.use_dictionary = use_dictionary
+        self.sort_by = list(sort_by or [])
+        self.write_statistics = write_statistics
+        self.write_page_index = write_page_index
+        self.data_page_size = data_page_size
+
+    @classmethod
+    def from_dict(cls, settings: dict) -> "ParquetLayout":
+        return cls(**settings)
+
+    @classmethod
+    def from_json(cls, path: str) -> "ParquetLayout":
+        """Load layout settings from a JSON file of constructor arguments"""
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def to_dict(self) -> dict:
+        return {
+            'row_group_size': self.row_group_size,
+            'compression': self.compression,
+            'column_compression': self.column_compression,
+            'compression_level': self.compression_level,
+            'use_dictionary': self.use_dictionary,
+            'sort_by': self.sort_by,
+            'write_statistics': self.write_statistics,
+            'write_page_index': self.write_page_index,
+            'data_page_size': self.data_page_size
+        }
+
+    def writer_options(self, schema: pa.Schema) -> dict:
+        """Keyword arguments for ``pq.ParquetWriter`` / ``pq.write_table``"""
+        missing = [c for c in self.sort_by if schema.get_field_index(c) < 0]
+        if missing:
+            raise ValueError(f"Sort columns not in schema: {missing}")
+        compression = self.compression
+        if self.column_compression:
+            compression = {field.name: self.column_compression.get(field.name, self.compression)
+                           for field in schema}
+        options = {
+            'compression': compression,
+            'use_dictionary': self.use_dictionary,
+            'write_statistics': self.write_statistics,
+            'write_page_index': self.write_page_index
+        }
+        if self.compression_level is not None:
+            options['compression_level'] = self.compression_level
+        if self.data_page_size is not None:
+            options['data_page_size'] = self.data_page_size
+        if self.sort_by:
+            # Record the order in the footer so engines can rely on it
+            options['sorting_columns'] = [pq.SortingColumn(schema.get_field_index(c)) for c in self.sort_by]
+        return options
+
+    def sort(self, table: pa.Table) -> pa.Table:
+        """Order rows by the sort columns (no-op without any)"""
+        if not self.sort_by:
+            return table
+        return table.sort_by([(c, 'ascending') for c in self.sort_by])
+
+    def write_table(self, table: pa.Table, path: str):
+        """Write a whole table: sort it globally, then split into row groups"""
+        table = self.sort(table)
+        pq.write_table(table, path, row_group_size=self.row_group_size,
+                       **self.writer_options(table.schema))
+
+    def open_writer(self, path: str, schema: pa.Schema) -> "LayoutWriter":
+        """Streaming writer that applies this layout to incoming batches"""
+        return LayoutWriter(path, schema, self)
+
+
+class LayoutWriter:
+    """
+    ``pq.ParquetWriter`` that buffers batches into row groups of the target
+    size and clusters each row group by the layout's sort columns
+
+    Memory is bounded by one row group. Accepts the same ``write_batch`` /
+    ``write_table`` calls as ParquetWriter and works as a context manager.
+    """
+
+    def __init__(self, path: str, schema: pa.Schema, layout: ParquetLayout):
+        self.layout = layout
+        self.schema = schema
+        self._writer = pq.ParquetWriter(path, schema, **layout.writer_options(schema))
+        self._pending = []
+        self._pending_rows = 0
+
+    def write_batch(self, batch: pa.RecordBatch):
+        self.write_table(pa.Table.from_batches([batch]))
+
+    def write_table(self, table: pa.Table):
+        target = self.layout.row_group_size
+        if target is None and not self.layout.sort_by:
+            self._writer.write_table(table)
+            return
+        self._pending.append(table)
+        self._pending_rows += table.num_rows
+        if target is None:
+            self._flush(self._pending_rows)
+        while target is not None and self._pending_rows >= target:
+            self._flush(target)
+
+    def _flush(self, rows: int):
+        combined = pa.concat_tables(self._pending)
+        group, rest = combined.slice(0, rows), combined.slice(rows)
+        self._pending = [rest] if rest.num_rows else []
+        self._pending_rows = rest.num_rows
+        if group.num_rows:
+            self._writer.write_table(self.layout.sort(group), row_group_size=group.num_rows)
+
+    def close(self):
+        if self._pending_rows:
+            self._flush(self._pending_rows)
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
@@ -0,0 +1,232 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Add repository root to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deployment.app.feature_transform import FeatureTransform, transform_path_for
+from etl.data_ingestion import (DEFAULT_BLOCK_SIZE, clean_batch, counted_batches, generate_sample_csv,
+                                kept_batches, load_data_streaming, open_csv_stream, spill_deduplicated)
+from etl.data_preprocessing import column_matrix, feature_columns, preprocess_data_streaming, scale_table, scaled_schema
+from etl.arrow_ipc import is_ipc_path, open_ipc_writer
+from etl.dedup import DEFAULT_PARTITIONS
+from etl.downcast import DEFAULT_RTOL, downcast_parquet, report_path_for
+from etl.enrichment import Enricher, enriched_batches, load_dimensions
+from etl.parquet_layout import ParquetLayout
+from etl.profile import DataProfile, profile_path_for
+from etl.stage_cache import StageCache, run_stage
+from etl.stats import RunningMoments
+from etl.validation import Validator, quarantine_path_for, validated_batches
+
+def _spill_batch_deduplicated(batches, schema: pa.Schema, work_dir: str) -> str:
+    """Spill batches with duplicates removed within each batch only"""
+    spill_path = os.path.join(work_dir, 'spill.arrow')
+    with pa.OSFile(spill_path, 'wb') as sink, pa.ipc.new_stream(sink, schema) as spill:
+        for batch in batches:
+            table = clean_batch(batch)
+            if table.num_rows:
+                spill.write_table(table)
+    return spill_path
+
+def _report(stats: dict, label: str):
+    print(f"{label}: {stats['rows_written']} rows in {stats['seconds']:.2f}s, "
+          f"read {stats['bytes_read'] / 1e6:.1f} MB, wrote {stats['bytes_written'] / 1e6:.1f} MB")
+
+def run_pipeline(source_path: str, output_path: str, intermediate_path: str = None,
+                 block_size: int = DEFAULT_BLOCK_SIZE, schema: pa.Schema = None,
+                 exact_dedup: bool = True, work_dir: str = None,
+                 num_partitions: int = DEFAULT_PARTITIONS, downcast: bool = False,
+                 rtol: float = DEFAULT_RTOL, layout: ParquetLayout = None,
+                 validator: Validator = None, quarantine_path: str = None,
+                 enricher: Enricher = None):
+    """
+    Fused ETL: raw CSV to processed Parquet without an intermediate file
+
+    The CSV is parsed once. Clean, null-free rows are spilled to an
+    uncompressed Arrow IPC file in a scratch directory while being
+    fingerprinted for dedup (see ``etl.dedup``). Two memory-mapped passes
+    over the spill follow, with no Parquet encoding or decoding: the first
+    accumulates feature statistics over the surviving rows, the second
+    standardizes them and writes ``output_path`` while profiling them (see
+    ``etl.profile``). The fitted transform and the profile are saved next
+    to the output. The result matches running data_ingestion
+    and data_preprocessing in sequence.
+
+    Args:
+        source_path: CSV file to ingest
+        output_path: Processed Parquet file to write
+        intermediate_path: Also write the cleaned, unscaled rows here
+            (for debugging; off by default)
+        block_size: Bytes of CSV per record batch
+        schema: Explicit column types; inferred from the first block if None
+        exact_dedup: Remove duplicates across the whole file rather than
+            within each batch
+        work_dir: Scratch directory (defaults to a temporary directory
+            next to ``output_path``)
+        num_partitions: Fingerprint partitions for exact dedup
+        downcast: Narrow the output's column types (see ``etl.downcast``)
+        rtol: Relative tolerance for narrowing float64 to float32
+        layout: Output row-group size, codecs, sort order and statistics
+            (see ``etl.parquet_layout``)
+        validator: Row checks applied to every batch as it is parsed;
+            failing rows are quarantined (see ``etl.validation``)
+        quarantine_path: Parquet file for failing rows (defaults to
+            ``<output stem>.quarantine.parquet``)
+        enricher: Dimension tables joined onto every batch after
+            validation, so their columns are cleaned and scaled with the
+            rest (see ``etl.enrichment``)
+
+    Returns:
+        Dictionary with row counts, wall-clock seconds, bytes read and
+        written (the scratch spill counts as written once and read twice;
+        its size is also reported as ``scratch_bytes``) and, when
+        validating or enriching, ``validation`` and ``joins`` summaries
+    """
+    if not os.path.exists(source_path):
+        raise FileNotFoundError(f"Source data not found at {source_path}")
+
+    print(f"Running fused ETL on {source_path}...")
+    output_dir = os.path.dirname(output_path)
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+    stats = {'rows_read': 0, 'rows_written': 0, 'batches': 0}
+
+    with tempfile.TemporaryDirectory(prefix='.etl-', dir=work_dir or output_dir or None) as scratch:
+        read_types = validator.csv_column_types(schema) if validator is not None else schema
+        with open_csv_stream(source_path, block_size, read_types) as reader:
+            schema = reader.schema
+            batches = counted_batches(reader, stats)
+            if validator is not None:
+                stats['validation'] = {}
+                batches = validated_batches(batches, validator,
+                                            quarantine_path or quarantine_path_for(output_path),
+                                            stats['validation'])
+                schema = validator.output_schema(schema)
+            if enricher is not None:
+                stats['joins'] = {}
+                batches = enriched_batches(batches, enricher, stats['joins'])
+                schema = enricher.output_schema(schema)
+            if exact_dedup:
+                spill_path, keep = spill_deduplicated(batches, schema, scratch, num_partitions)
+            else:
+                spill_path, keep = _spill_batch_deduplicated(batches, schema, scratch), None
+        stats['scratch_bytes'] = os.path.getsize(spill_path)
+
+        # Statistics pass over the surviving rows; optionally keep them for debugging
+        columns = feature_columns(schema)
+        moments = RunningMoments(len(columns))
+        intermediate = None
+        if intermediate_path:
+            intermediate = (open_ipc_writer(intermediate_path, schema) if is_ipc_path(intermediate_path)
+                            else pq.ParquetWriter(intermediate_path, schema))
+        try:
+            for batch in kept_batches(spill_path, keep):
+                moments.update(column_matrix(batch, columns))
+                if intermediate is not None:
+                    intermediate.write_batch(batch)
+        finally:
+            if intermediate is not None:
+                intermediate.close()
+        transform = FeatureTransform(columns, moments.mean, moments.scale())
+
+        # Transform pass
+        # Written under a scratch name, so a failed run leaves no output behind
+        output_schema = scaled_schema(schema, columns)
+        profile = DataProfile(output_schema)
+        staging_path = os.path.join(scratch, os.path.basename(output_path))
+        with (layout or ParquetLayout()).open_writer(staging_path, output_schema) as writer:
+            for batch in kept_batches(spill_path, keep):
+                table = scale_table(batch, transform, output_schema)
+                writer.write_table(table)
+                profile.update(table)
+                stats['rows_written'] += batch.num_rows
+
+        if downcast:
+            report = downcast_parquet(staging_path, output_path, rtol=rtol, layout=layout)
+            stats['memory_bytes_before'] = report['bytes_before']
+            stats['memory_bytes_after'] = report['bytes_after']
+            # Values are unchanged within rtol; only the recorded types move
+            profile.schema = pq.read_schema(output_path)
+        else:
+            shutil.move(staging_path, output_path)
+        transform.save(transform_path_for(output_path))
+    profile.save(output_path)
+
+    stats['seconds'] = time.perf_counter() - start
+    # Both passes read the spill back
+    stats['bytes_read'] = os.path.getsize(source_path) + 2 * stats['scratch_bytes']
+    stats['bytes_written'] = stats['scratch_bytes'] + os.path.getsize(output_path)
+    if intermediate_path:
+        stats['bytes_written'] += os.path.getsize(intermediate_path)
+    _report(stats, 'Fused ETL')
+    print(f"Processed data saved to {output_path}")
+    return stats
+
+def run_staged(source_path: str, output_path: str, intermediate_path: str,
+               block_size: int = DEFAULT_BLOCK_SIZE, schema: pa.Schema = None):
+    """
+    Reference run of the separate stages through an intermediate Parquet
+    file (or Arrow IPC file, for a ``.arrow`` path), reported in the same
+    terms as :func:`run_pipeline`: ingestion's dedup spill is written and
+    read once, and preprocessing reads the intermediate in both passes
+    """
+    start = time.perf_counter()
+    ingest = load_data_streaming(source_path, intermediate_path, block_size=block_size, schema=schema)
+    preprocess_data_streaming(intermediate_path, output_path)
+    intermediate_bytes = os.path.getsize(intermediate_path)
+    stats = {
+        'rows_read': ingest['rows_read'],
+        'rows_written': ingest['rows_written'],
+        'seconds': time.perf_counter() - start,
+        'scratch_bytes': ingest['scratch_bytes'],
+        'bytes_read': os.path.getsize(source_path) + ingest['scratch_bytes'] + 2 * intermediate_bytes,
+        'bytes_written': ingest['scratch_bytes'] + intermediate_bytes + os.path.getsize(output_path)
+    }
+    _report(stats, 'Staged ETL')
+    return stats
+
+if __name__ == "__main__":
+    INPUT_FILE = 'data/sample.csv'
+    OUTPUT_FILE = 'data/processed.parquet'
+    # --ipc hands intermediates over as memory-mapped Arrow IPC (see etl.arrow_ipc)
+    INTERMEDIATE_FILE = 'data/intermediate.arrow' if '--ipc' in sys.argv else 'data/intermediate.parquet'
+
+    if not os.path.exists(INPUT_FILE):
+        print("sample.csv not found — generating mock dataset...")
+        generate_sample_csv(INPUT_FILE)
+
+    # Optional JSON files of ParquetLayout settings for the processed output,
+    # of validation rules (see etl.validation) and of dimension tables to
+    # join onto the input (see etl.enrichment)
+    layout_file = sys.argv[sys.argv.index('--layout') + 1] if '--layout' in sys.argv else None
+    rules = sys.argv[sys.argv.index('--rules') + 1] if '--rules' in sys.argv else None
+    dimensions_file = sys.argv[sys.argv.index('--dimensions') + 1] if '--dimensions' in sys.argv else None
+    layout = ParquetLayout.from_json(layout_file) if layout_file else None
+    validator = Validator.from_json(rules) if rules else None
+    dimensions = load_dimensions(dimensions_file) if dimensions_file else []
+    enricher = Enricher(dimensions) if dimensions else None
+
+    if '--compare' in sys.argv:
+        # Report both modes on the same input
+        run_staged(INPUT_FILE, OUTPUT_FILE, INTERMEDIATE_FILE)
+        run_pipeline(INPUT_FILE, OUTPUT_FILE)
+    else:
+        intermediate = INTERMEDIATE_FILE if '--intermediate' in sys.argv else None
+        outputs = [OUTPUT_FILE, transform_path_for(OUTPUT_FILE), profile_path_for(OUTPUT_FILE),
+                   report_path_for(OUTPUT_FILE), quarantine_path_for(OUTPUT_FILE)]
+        # With --cache, reuse the outputs of an earlier run on the same input
+        run_stage('pipeline',
+                  lambda: run_pipeline(INPUT_FILE, OUTPUT_FILE, intermediate_path=intermediate,
+                                       downcast='--downcast' in sys.argv, layout=layout, validator=validator,
+                                       enricher=enricher),
+                  inputs=([INPUT_FILE] + [f for f in (layout_file, rules, dimensions_file) if f]
+                          + [d.path for d in dimensions]),
+                  outputs=outputs + ([intermediate] if intermediate else []),
+                  params={'intermediate': intermediate and os.path.splitext(intermediate)[1],
+                          'downcast': '--downcast' in sys.argv},
+                  cache=StageCache() if '--cache' in sys.argv else None)
@@ -0,0 +1,311 @@
+"""
+Streaming data profiles for ETL outputs.
+
+A profile is accumulated batch by batch in the same pass that writes a
+dataset: per-column null counts, min/max, mean and variance (see
+``etl.stats``), approximate quantiles from a KLL sketch and approximate
+distinct counts from a HyperLogLog sketch. Every piece is mergeable, so
+profiles built by separate workers over disjoint rows combine into the
+profile of the whole. The summary is saved as a small JSON sidecar that data
+checks and UIs can read instead of rescanning the data.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from etl.stats import RunningMoments
+
+FORMAT_VERSION = 1
+SIDECAR_SUFFIX = '.profile.json'
+
+# Sidecar name inside a dataset directory; pyarrow skips files starting with '_'
+DATASET_SIDECAR = '_profile.json'
+
+DEFAULT_QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+# KLL accuracy parameter: normalized rank error is about 1.65 / k
+DEFAULT_QUANTILE_K = 200
+
+# HyperLogLog with 2^12 registers: about 1.6% relative error in distinct counts
+DEFAULT_HLL_PRECISION = 12
+
+# Larger tables are profiled in slices of this many rows to bound memory
+UPDATE_CHUNK_ROWS = 1 << 20
+
+
+def profile_path_for(path: str) -> str:
+    """
+    Sidecar path for an ETL output (``x.parquet`` -> ``x.profile.json``, or
+    ``_profile.json`` inside a dataset directory)
+    """
+    if os.path.isdir(path):
+        return os.path.join(path, DATASET_SIDECAR)
+    return os.path.splitext(path)[0] + SIDECAR_SUFFIX
+
+
+def load_profile(path: str) -> dict:
+    """Read a saved profile, given the sidecar or the data path it describes"""
+    if not path.endswith('.json'):
+        path = profile_path_for(path)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Profile not found at {path}")
+    with open(path) as f:
+        profile = json.load(f)
+    if profile.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported profile format: {profile.get('format_version')}")
+    return profile
+
+
+class HyperLogLog:
+    """Mergeable distinct-count sketch over 64-bit value hashes"""
+
+    def __init__(self, precision: int = DEFAULT_HLL_PRECISION):
+        if not 4 <= precision <= 16:
+            raise ValueError(f"precision must be between 4 and 16, got {precision}")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update_hashes(self, hashes: np.ndarray):
+        """Fold uint64 hashes into the registers"""
+        if not len(hashes):
+            return
+        p = np.uint64(self.precision)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.intp)
+        # The next 52 bits are exact in float64, so frexp gives their bit length
+        rest = ((hashes << p) >> np.uint64(12)).astype(np.float64)
+        _, bit_length = np.frexp(rest)
+        rank = np.where(rest > 0, 53 - bit_length, 53).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: 'HyperLogLog'):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * np.log(m / zeros)
+        return float(estimate)
+
+
+def _merge_sorted(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Merge two sorted arrays"""
+    if len(a) < len(b):
+        a, b = b, a
+    if not len(b):
+        return a
+    return np.insert(a, np.searchsorted(a, b), b)
+
+
+class QuantileSketch:
+    """
+    KLL quantile sketch: a stack of compactors, where level ``h`` holds
+    items of weight ``2^h``
+
+    Memory stays below about ``3k`` items whatever the stream length. Levels
+    are kept sorted, so each incoming batch is sorted once and compaction
+    only merges. A seeded generator picks which half of each compacted level
+    survives, so results are reproducible.
+    """
+
+    def __init__(self, k: int = DEFAULT_QUANTILE_K, seed: int = 0):
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                leftover, items = (items[:1], items[1:]) if len(items) % 2 else (items[:0], items)
+                self.levels[level] = leftover
+                self.levels[level + 1] = _merge_sorted(self.levels[level + 1],
+                                                       items[self._rng.integers(2)::2])
+            level += 1
+
+    def update(self, values: np.ndarray):
+        """Add a batch of values (NaN ignored)"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self.levels[0] = _merge_sorted(self.levels[0], np.sort(values))
+        self._compress()
+
+    def merge(self, other: 'QuantileSketch'):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = _merge_sorted(self.levels[level], items)
+        self.count += other.count
+        self._compress()
+
+    def quantiles(self, qs=DEFAULT_QUANTILES) -> list:
+        """Approximate values at the given ranks in [0, 1] (None if empty)"""
+        if not self.count:
+            return [None] * len(qs)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, cumulative = items[order], np.cumsum(weights[order])
+        positions = np.searchsorted(cumulative, np.asarray(qs) * cumulative[-1], side='left')
+        return [float(v) + 0.0 for v in items[np.minimum(positions, len(items) - 1)]]
+
+
+def _is_numeric(data_type: pa.DataType) -> bool:
+    return pa.types.is_integer(data_type) or pa.types.is_floating(data_type)
+
+
+def _has_order(data_type: pa.DataType) -> bool:
+    return (_is_numeric(data_type) or pa.types.is_string(data_type) or pa.types.is_large_string(data_type)
+            or pa.types.is_boolean(data_type) or pa.types.is_temporal(data_type))
+
+
+def _finite(value):
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+class DataProfile:
+    """
+    Per-column summary of a dataset, built from the batches written to it
+
+    Attributes:
+        schema: Arrow schema of the profiled data
+        rows: Rows seen
+        null_counts: Nulls per column
+        minimum, maximum: Per-column extremes (None until a non-null value)
+        moments: Running moments of the numeric columns
+        sketches: KLL quantile sketch per numeric column
+        distinct: HyperLogLog sketch per column
+    """
+
+    def __init__(self, schema: pa.Schema, quantile_k: int = DEFAULT_QUANTILE_K,
+                 hll_precision: int = DEFAULT_HLL_PRECISION):
+        self.schema = schema
+        self.rows = 0
+        self.null_counts = dict.fromkeys(schema.names, 0)
+        self.minimum = dict.fromkeys(schema.names)
+        self.maximum = dict.fromkeys(schema.names)
+        self.numeric = [field.name for field in schema if _is_numeric(field.type)]
+        self.moments = RunningMoments(len(self.numeric))
+        self.sketches = {name: QuantileSketch(quantile_k) for name in self.numeric}
+        self.distinct = {name: HyperLogLog(hll_precision) for name in schema.names}
+
+    def update(self, data):
+        """Fold a record batch or table into the profile"""
+        if isinstance(data, pa.RecordBatch):
+            data = pa.Table.from_batches([data])
+        if data.num_rows > UPDATE_CHUNK_ROWS:
+            for batch in data.to_batches(max_chunksize=UPDATE_CHUNK_ROWS):
+                self.update(batch)
+            return
+        self.rows += data.num_rows
+        for field in self.schema:
+            column = data.column(field.name)
+            self.null_counts[field.name] += column.null_count
+            values = column.drop_null()
+            if not len(values):
+                continue
+            if _has_order(field.type):
+                bounds = pc.min_max(values).as_py()
+                self._extend(field.name, bounds['min'], bounds['max'])
+            if not _is_numeric(field.type):
+                # Only the set of values matters to the sketch; hashing the
+                # uniques avoids a Python object per row for strings
+                values = pc.unique(values)
+            array = values.to_numpy(zero_copy_only=False)
+            if pa.types.is_floating(field.type):
+                array = array + 0.0  # -0.0 and 0.0 are one distinct value
+            self.distinct[field.name].update_hashes(pd.util.hash_array(array, categorize=False))
+
+        if self.numeric:
+            matrix = np.column_stack([
+                data.column(name).cast(pa.float64()).to_numpy(zero_copy_only=False)
+                for name in self.numeric
+            ])
+            self.moments.update(matrix)
+            for i, name in enumerate(self.numeric):
+                self.sketches[name].update(matrix[:, i])
+
+    def _extend(self, name: str, low, high):
+        if low is None:
+            return
+        current_low, current_high = self.minimum[name], self.maximum[name]
+        self.minimum[name] = low if current_low is None else min(current_low, low)
+        self.maximum[name] = high if current_high is None else max(current_high, high)
+
+    def merge(self, other: 'DataProfile'):
+        """Combine with a profile of a disjoint set of rows with the same schema"""
+        if other.schema.names != self.schema.names:
+            raise ValueError("Cannot merge profiles of different schemas")
+        self.rows += other.rows
+        for name in self.schema.names:
+            self.null_counts[name] += other.null_counts[name]
+            self._extend(name, other.minimum[name], other.maximum[name])
+            self.distinct[name].merge(other.distinct[name])
+        self.moments.merge(other.moments)
+        for name in self.numeric:
+            self.sketches[name].merge(other.sketches[name])
+
+    def to_dict(self, qs=DEFAULT_QUANTILES) -> dict:
+        columns = {}
+        for field in self.schema:
+            name = field.name
+            non_null = self.rows - self.null_counts[name]
+            summary = {
+                'type': str(field.type),
+                'nulls': self.null_counts[name],
+                'min': self.minimum[name],
+                'max': self.maximum[name],
+                'distinct': min(int(round(self.distinct[name].estimate())), non_null)
+            }
+            if name in self.sketches:
+                i = self.numeric.index(name)
+                summary['mean'] = _finite(self.moments.mean[i]) if self.moments.count[i] else None
+                summary['std'] = _finite(self.moments.std[i])
+                summary['quantiles'] = dict(zip((str(q) for q in qs), self.sketches[name].quantiles(qs)))
+            columns[name] = summary
+        return {'format_version': FORMAT_VERSION, 'rows': self.rows, 'columns': columns}
+
+    def save(self, path: str) -> str:
+        """
+        Write the summary as JSON
+
+        Args:
+            path: Sidecar path, or the data path it describes
+
+        Returns:
+            Path of the sidecar written
+        """
+        if not path.endswith('.json'):
+            path = profile_path_for(path)
+        with open(path, 'w') as f:
+            # Temporal extremes are written as ISO strings
+            json.dump(self.to_dict(), f, indent=2, default=str)
+        return path
+
+
+def profiled(batches, profile: DataProfile):
+    """Pass batches through while folding them into ``profile``"""
+    for batch in batches:
+        profile.update(batch)
+        yield batch
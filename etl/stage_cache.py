@@ -0,0 +1,351 @@
+"""
+Content-addressed cache of pipeline stage outputs.
+
+A stage's cache key is a hash of its name, the content of its input files,
+its parameters, the source of the stage's module and every repository module
+it imports (transitively), and the versions of the libraries that shape its
+output. If a stored entry matches, the stage's output files are copied back
+instead of recomputed; otherwise the stage runs and its outputs are stored.
+Entries live on local disk under a size limit, evicting the least recently
+used first.
+
+    python etl/stage_cache.py list
+    python etl/stage_cache.py clear [--stage training]
+"""
+import argparse
+import ast
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from importlib import metadata
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_CACHE_DIR = os.getenv('PULSEFLOW_CACHE_DIR', '.cache/stages')
+DEFAULT_MAX_BYTES = int(os.getenv('PULSEFLOW_CACHE_MAX_BYTES', str(5 * 1024 ** 3)))
+
+# Libraries whose version can change a stage's output
+KEYED_PACKAGES = ('numpy', 'pandas', 'pyarrow', 'scikit-learn')
+
+ENTRY_FILE = 'entry.json'
+DIGESTS_FILE = 'digests.json'
+
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _module_file(name: str):
+    """Repository file defining a dotted module name, or None if it is not ours"""
+    base = os.path.join(REPO_ROOT, *name.split('.'))
+    for candidate in (base + '.py', os.path.join(base, '__init__.py')):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def source_files(paths) -> list:
+    """
+    The given Python files plus every repository module they import,
+    directly or indirectly, as sorted absolute paths
+    """
+    seen, pending = set(), [os.path.abspath(p) for p in paths]
+    while pending:
+        path = pending.pop()
+        if path in seen:
+            continue
+        seen.add(path)
+        with open(path) as f:
+            tree = ast.parse(f.read(), filename=path)
+        package = os.path.relpath(os.path.dirname(path), REPO_ROOT).replace(os.sep, '.')
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom):
+                module = node.module or ''
+                if node.level:
+                    parts = package.split('.')[:len(package.split('.')) - node.level + 1]
+                    module = '.'.join(p for p in parts + [module] if p)
+                # 'from pkg import name' may import a submodule
+                names = [module] + [f'{module}.{alias.name}' for alias in node.names]
+            else:
+                continue
+            for name in names:
+                found = _module_file(name) if name else None
+                if found and found not in seen:
+                    pending.append(found)
+    return sorted(seen)
+
+
+def environment_versions() -> dict:
+    versions = {'python': sys.version.split()[0]}
+    for package in KEYED_PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def _jsonable(value):
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _size(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(path) for name in names)
+    return os.path.getsize(path)
+
+
+class StageCache:
+    """
+    Stage outputs on local disk, keyed by content
+
+    Each entry is a directory ``<root>/<key>/`` holding copies of the
+    stage's output files and an ``entry.json`` with the stage name, the
+    original output paths, the stage's JSON-serializable return value, its
+    size and when it was created and last used. Input digests are memoized
+    by path, size and modification time, so unchanged inputs are not
+    rehashed on every run; the memo is saved once per :meth:`key` call and
+    an unreadable one is treated as empty.
+    """
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self._digests_path = os.path.join(root, DIGESTS_FILE)
+        self._digests = {}
+        self._digests_dirty = False
+        if os.path.exists(self._digests_path):
+            try:
+                with open(self._digests_path) as f:
+                    self._digests = json.load(f)
+            except (OSError, ValueError):
+                print(f"Ignoring unreadable digest memo at {self._digests_path}")
+
+    def digest(self, path: str) -> str:
+        """SHA-256 of a file, or of a directory's relative paths and file contents"""
+        path = os.path.abspath(path)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Stage input not found at {path}")
+        if os.path.isdir(path):
+            digest = hashlib.sha256()
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                for name in sorted(names):
+                    full = os.path.join(root, name)
+                    digest.update(os.path.relpath(full, path).encode())
+                    digest.update(self.digest(full).encode())
+            return digest.hexdigest()
+        stat = os.stat(path)
+        known = self._digests.get(path)
+        if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+            return known['sha256']
+        sha256 = file_digest(path)
+        self._digests[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+        self._digests_dirty = True
+        return sha256
+
+    def save_digests(self):
+        """Write the digest memo if it changed, replacing the file atomically"""
+        if not self._digests_dirty:
+            return
+        staging = f'{self._digests_path}.{os.getpid()}.tmp'
+        with open(staging, 'w') as f:
+            json.dump(self._digests, f)
+        os.replace(staging, self._digests_path)
+        self._digests_dirty = False
+
+    def key(self, stage: str, inputs: list, params: dict = None, code: list = None) -> str:
+        """
+        Cache key for a stage run
+
+        Args:
+            stage: Stage name
+            inputs: Input files or directories (keyed by content, in order,
+                not by path)
+            params: JSON-serializable parameters that affect the output
+            code: Python files of the stage (their repository imports are
+                followed automatically)
+        """
+        description = {
+            'stage': stage,
+            'inputs': [self.digest(p) for p in inputs],
+            'params': params or {},
+            'code': {os.path.relpath(p, REPO_ROOT): file_digest(p) for p in source_files(code or [])},
+            'environment': environment_versions()
+        }
+        self.save_digests()
+        encoded = json.dumps(description, sort_keys=True, default=str).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def lookup(self, key: str):
+        """The entry stored under ``key``, or None"""
+        path = os.path.join(self._entry_dir(key), ENTRY_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def restore(self, key: str, outputs: list) -> bool:
+        """
+        Copy a stored entry's files back to ``outputs``
+
+        Outputs are matched by position, so an entry can be restored to
+        other paths than it was stored from. Declared outputs the original
+        run did not produce are removed, so the result matches a fresh run.
+        Returns False on a cache miss.
+        """
+        entry = self.lookup(key)
+        if entry is None or len(entry['outputs']) != len(outputs):
+            return False
+        for index, output in enumerate(outputs):
+            stored = os.path.join(self._entry_dir(key), str(index))
+            if os.path.isdir(output):
+                shutil.rmtree(output)
+            elif os.path.exists(output):
+                os.remove(output)
+            if not os.path.exists(stored):
+                continue
+            if os.path.dirname(output):
+                os.makedirs(os.path.dirname(output), exist_ok=True)
+            if os.path.isdir(stored):
+                shutil.copytree(stored, output)
+            else:
+                shutil.copy2(stored, output)
+        entry['last_used'] = time.time()
+        self._write_entry(key, entry)
+        return True
+
+    def store(self, key: str, stage: str, outputs: list, result=None):
+        """Save a stage's outputs (those that exist) and return value under ``key``"""
+        staging = os.path.join(self.root, f'.{key}.tmp')
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        for index, output in enumerate(outputs):
+            if os.path.isdir(output):
+                shutil.copytree(output, os.path.join(staging, str(index)))
+            elif os.path.exists(output):
+                shutil.copy2(output, os.path.join(staging, str(index)))
+        try:
+            result = json.loads(json.dumps(result, default=_jsonable))
+        except (TypeError, ValueError):
+            result = None
+        now = time.time()
+        entry = {'key': key, 'stage': stage, 'outputs': list(outputs), 'result': result,
+                 'bytes': _size(staging), 'created': now, 'last_used': now}
+        with open(os.path.join(staging, ENTRY_FILE), 'w') as f:
+            json.dump(entry, f, indent=2)
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+        os.replace(staging, self._entry_dir(key))
+        self.evict()
+
+    def _write_entry(self, key: str, entry: dict):
+        with open(os.path.join(self._entry_dir(key), ENTRY_FILE), 'w') as f:
+            json.dump(entry, f, indent=2)
+
+    def entries(self) -> list:
+        """Stored entries, most recently used first"""
+        found = []
+        for name in os.listdir(self.root):
+            entry = self.lookup(name) if not name.startswith('.') else None
+            if entry is not None:
+                found.append(entry)
+        return sorted(found, key=lambda e: e['last_used'], reverse=True)
+
+    def evict(self, max_bytes: int = None) -> list:
+        """Drop least recently used entries until the total fits ``max_bytes``"""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(e['bytes'] for e in entries)
+        evicted = []
+        while entries and total > limit:
+            entry = entries.pop()
+            shutil.rmtree(self._entry_dir(entry['key']), ignore_errors=True)
+            total -= entry['bytes']
+            evicted.append(entry['key'])
+        return evicted
+
+    def clear(self, stage: str = None) -> int:
+        """Remove every entry, or only those of one stage; returns how many"""
+        removed = 0
+        for entry in self.entries():
+            if stage is None or entry['stage'] == stage:
+                shutil.rmtree(self._entry_dir(entry['key']), ignore_errors=True)
+                removed += 1
+        return removed
+
+
+def run_stage(stage: str, fn, inputs: list, outputs: list, params: dict = None,
+              code: list = None, cache: StageCache = None):
+    """
+    Run ``fn()`` unless the cache holds outputs for the same key
+
+    Args:
+        stage: Stage name
+        fn: Callable that runs the stage and writes ``outputs``
+        inputs: Input files or directories
+        outputs: Files or directories the stage writes (including sidecars
+            it may or may not produce)
+        params: Parameters that affect the output
+        code: Stage source files (defaults to the file defining ``fn``)
+        cache: Cache to use; runs ``fn`` uncached if None
+
+    Returns:
+        ``fn``'s return value, or the stored one (None if it was not
+        JSON-serializable) on a cache hit
+    """
+    if cache is None:
+        return fn()
+    if code is None:
+        module_file = getattr(sys.modules.get(fn.__module__), '__file__', None)
+        code = [module_file] if module_file else []
+    key = cache.key(stage, inputs, params, code)
+    if cache.restore(key, outputs):
+        print(f"{stage}: restored from cache ({key[:12]})")
+        return cache.lookup(key)['result']
+    result = fn()
+    cache.store(key, stage, outputs, result)
+    print(f"{stage}: stored in cache ({key[:12]})")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the pipeline stage cache")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='Show entries, most recently used first')
+    clear_parser = commands.add_parser('clear', help='Remove entries')
+    clear_parser.add_argument('--stage', help='Only remove entries of this stage')
+    evict_parser = commands.add_parser('evict', help='Shrink the cache to a size limit')
+    evict_parser.add_argument('--max-bytes', type=int, default=DEFAULT_MAX_BYTES)
+    args = parser.parse_args()
+
+    cache = StageCache(args.cache_dir)
+    if args.command == 'list':
+        entries = cache.entries()
+        for entry in entries:
+            used = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['last_used']))
+            print(f"{entry['key'][:12]}  {entry['stage']:<14}{entry['bytes'] / 1e6:>10.1f} MB  "
+                  f"last used {used}  {', '.join(entry['outputs'])}")
+        print(f"{len(entries)} entries, {sum(e['bytes'] for e in entries) / 1e6:.1f} MB "
+              f"of {cache.max_bytes / 1e6:.0f} MB in {cache.root}")
+    elif args.command == 'clear':
+        print(f"Removed {cache.clear(args.stage)} entries from {cache.root}")
+    else:
+        print(f"Evicted {len(cache.evict(args.max_bytes))} entries from {cache.root}")
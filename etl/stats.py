@@ -0,0 +1,84 @@
+"""
+Mergeable running statistics for streaming passes over a dataset.
+
+Per-column moments are accumulated batch by batch and combined with the
+pairwise update of Chan et al., which stays numerically stable when batches
+differ widely in size or mean. Two accumulators built over disjoint parts of
+a dataset (for example by different worker processes) can be merged into
+the statistics of the whole.
+"""
+import numpy as np
+
+
+class RunningMoments:
+    """
+    Per-column count, mean and sum of squared deviations
+
+    Missing values (NaN) are ignored column by column, as in
+    ``StandardScaler.partial_fit``. Variance uses ``ddof=0``.
+    """
+
+    def __init__(self, n_columns: int):
+        self.count = np.zeros(n_columns)
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+
+    def update(self, X: np.ndarray):
+        """Fold a 2-D batch (rows x columns) into the running moments"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[:, None]
+        batch = RunningMoments(X.shape[1])
+        valid = ~np.isnan(X)
+        if valid.all():
+            # Common case (cleaned data): skip the masking
+            batch.count[:] = len(X)
+            batch.mean = X.mean(axis=0) if len(X) else batch.mean
+            batch.m2 = ((X - batch.mean) ** 2).sum(axis=0)
+        else:
+            batch.count = valid.sum(axis=0).astype(np.float64)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                batch.mean = np.where(batch.count > 0, np.where(valid, X, 0.0).sum(axis=0) / batch.count, 0.0)
+            batch.m2 = (np.where(valid, X - batch.mean, 0.0) ** 2).sum(axis=0)
+        self.merge(batch)
+
+    def merge(self, other: 'RunningMoments'):
+        """Combine with moments accumulated over a disjoint set of rows"""
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(count > 0, other.count / count, 0.0)
+        self.mean = self.mean + delta * weight
+        self.m2 = self.m2 + other.m2 + delta ** 2 * self.count * weight
+        self.count = count
+
+    @property
+    def variance(self) -> np.ndarray:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 0, self.m2 / self.count, np.nan)
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.variance)
+
+    def scale(self) -> np.ndarray:
+        """Standard deviations for standardization (see :func:`standard_scale`)"""
+        return standard_scale(self.count, self.mean, self.variance)
+
+
+def standard_scale(count, mean, variance) -> np.ndarray:
+    """
+    Standard deviations for standardization, with constant columns set to 1
+    so they are centred but not divided by zero
+
+    Mirrors scikit-learn's test for features that are constant up to
+    floating-point error in the accumulated variance.
+    """
+    count = np.asarray(count, dtype=np.float64)
+    mean = np.asarray(mean, dtype=np.float64)
+    variance = np.nan_to_num(np.asarray(variance, dtype=np.float64))
+    eps = np.finfo(np.float64).eps
+    upper_bound = count * eps * variance + (count * mean * eps) ** 2
+    scale = np.sqrt(variance)
+    scale[variance <= upper_bound] = 1.0
+    return scale
@@ -0,0 +1,341 @@
+"""
+Seeded synthetic datasets at benchmark scale.
+
+Rows are produced in fixed-size chunks, and chunk ``i`` draws from its own
+generator seeded with ``(seed, i)``. Output is therefore identical for the
+same spec whatever the number of workers, and any chunk can be regenerated
+on its own. Chunks are generated in parallel and streamed to a single CSV
+file (in order, so memory stays at a few chunks per worker) or to a
+directory of Parquet part files, so row counts of 1e9 and more only need
+disk space.
+
+A spec lists the feature columns and their distributions, the fraction of
+rows that duplicate another row, the fraction of feature values left empty,
+and how the target is computed from the numeric features:
+
+    {
+        "rows": 1000000000,
+        "seed": 7,
+        "features": [
+            {"name": "feature1", "distribution": "normal", "mean": 50, "std": 10},
+            {"name": "region", "distribution": "category", "values": ["north", "south"]}
+        ],
+        "duplicate_rate": 0.01,
+        "null_rate": 0.001,
+        "target": {"function": "linear", "coefficients": [2.5], "noise": 5.0}
+    }
+
+    python etl/synthetic.py data/big.csv --rows 1000000000 --workers 8
+    python etl/synthetic.py data/big_parquet --spec spec.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pv
+
+# Add repository root to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl.parquet_layout import ParquetLayout
+
+DISTRIBUTIONS = ('normal', 'uniform', 'lognormal', 'exponential', 'integer', 'category')
+TARGET_FUNCTIONS = ('linear', 'friedman', 'none')
+
+DEFAULT_CHUNK_ROWS = 1 << 20
+
+# Parameters each distribution accepts, with their defaults
+_DISTRIBUTION_DEFAULTS = {
+    'normal': {'mean': 50.0, 'std': 10.0},
+    'uniform': {'low': 0.0, 'high': 1.0},
+    'lognormal': {'mean': 0.0, 'sigma': 1.0},
+    'exponential': {'scale': 1.0},
+    'integer': {'low': 0, 'high': 1000},
+    'category': {'values': ['a', 'b', 'c', 'd'], 'weights': None},
+}
+
+
+def default_features(count: int) -> list:
+    """``feature1`` .. ``featureN``, normally distributed like the sample data"""
+    return [{'name': f'feature{i + 1}', 'distribution': 'normal'} for i in range(count)]
+
+
+class SyntheticSpec:
+    """
+    What a synthetic dataset looks like
+
+    Attributes:
+        rows: Total rows, duplicates included
+        seed: Base seed; chunk ``i`` uses ``(seed, i)``
+        features: Feature column definitions: ``name``, ``distribution``
+            (one of ``DISTRIBUTIONS``) and its parameters, and optionally
+            ``decimals`` to round to and a ``null_rate`` override
+        duplicate_rate: Fraction of rows that copy another row of the same
+            chunk (so dedup has something to remove)
+        null_rate: Fraction of feature values left empty
+        target: ``function`` ('linear', 'friedman' or 'none'), its
+            ``coefficients`` and ``intercept`` (linear), and Gaussian
+            ``noise``; None writes no target column
+        chunk_rows: Rows generated per task (part file size for Parquet)
+    """
+
+    def __init__(self, rows: int, seed: int = 42, features: list = None, duplicate_rate: float = 0.0,
+                 null_rate: float = 0.0, target: dict = None, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        if rows < 0:
+            raise ValueError(f"rows must be non-negative, got {rows}")
+        if chunk_rows < 1:
+            raise ValueError(f"chunk_rows must be positive, got {chunk_rows}")
+        for name, rate in (('duplicate_rate', duplicate_rate), ('null_rate', null_rate)):
+            if not 0 <= rate < 1:
+                raise ValueError(f"{name} must be in [0, 1), got {rate}")
+        features = [dict(f) for f in (features or default_features(2))]
+        for feature in features:
+            distribution = feature.setdefault('distribution', 'normal')
+            if distribution not in DISTRIBUTIONS:
+                raise ValueError(f"Unknown distribution '{distribution}', expected one of {DISTRIBUTIONS}")
+            if 'name' not in feature:
+                raise ValueError(f"Feature without a name: {feature}")
+            unknown = set(feature) - {'name', 'distribution', 'decimals', 'null_rate'} \
+                - set(_DISTRIBUTION_DEFAULTS[distribution])
+            if unknown:
+                raise ValueError(f"Unknown parameters for {distribution} feature '{feature['name']}': "
+                                 f"{sorted(unknown)}")
+        numeric = [f['name'] for f in features if f['distribution'] != 'category']
+        if target is not None:
+            target = {'function': 'linear', 'intercept': 0.0, 'noise': 5.0, **target}
+            if target['function'] not in TARGET_FUNCTIONS:
+                raise ValueError(f"Unknown target function '{target['function']}', "
+                                 f"expected one of {TARGET_FUNCTIONS}")
+            if target['function'] == 'linear':
+                # The sample data's weights for the first two features, 1.0 after
+                coefficients = target.get('coefficients') or ([2.5, 1.8] + [1.0] * len(numeric))[:len(numeric)]
+                if len(coefficients) != len(numeric):
+                    raise ValueError(f"Need one coefficient per numeric feature ({len(numeric)}), "
+                                     f"got {len(coefficients)}")
+                target['coefficients'] = list(coefficients)
+            elif target['function'] == 'friedman' and len(numeric) < 5:
+                raise ValueError("The friedman target needs at least 5 numeric features")
+        self.rows = rows
+        self.seed = seed
+        self.features = features
+        self.duplicate_rate = duplicate_rate
+        self.null_rate = null_rate
+        self.target = target
+        self.chunk_rows = chunk_rows
+
+    @classmethod
+    def from_dict(cls, settings: dict) -> "SyntheticSpec":
+        settings = dict(settings)
+        if isinstance(settings.get('features'), int):
+            settings['features'] = default_features(settings['features'])
+        return cls(**settings)
+
+    @classmethod
+    def from_json(cls, path: str) -> "SyntheticSpec":
+        """Load a spec from a JSON file of constructor arguments"""
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def to_dict(self) -> dict:
+        return {
+            'rows': self.rows,
+            'seed': self.seed,
+            'features': self.features,
+            'duplicate_rate': self.duplicate_rate,
+            'null_rate': self.null_rate,
+            'target': self.target,
+            'chunk_rows': self.chunk_rows
+        }
+
+    @property
+    def num_chunks(self) -> int:
+        return -(-self.rows // self.chunk_rows)
+
+    def schema(self) -> pa.Schema:
+        fields = [pa.field(f['name'], pa.string() if f['distribution'] == 'category'
+                           else pa.int64() if f['distribution'] == 'integer' else pa.float64())
+                  for f in self.features]
+        if self.target is not None:
+            fields.append(pa.field('target', pa.float64()))
+        return pa.schema(fields)
+
+
+def _draw(feature: dict, rng: np.random.Generator, n: int) -> np.ndarray:
+    params = {**_DISTRIBUTION_DEFAULTS[feature['distribution']], **feature}
+    distribution = feature['distribution']
+    if distribution == 'normal':
+        values = rng.normal(params['mean'], params['std'], n)
+    elif distribution == 'uniform':
+        values = rng.uniform(params['low'], params['high'], n)
+    elif distribution == 'lognormal':
+        values = rng.lognormal(params['mean'], params['sigma'], n)
+    elif distribution == 'exponential':
+        values = rng.exponential(params['scale'], n)
+    elif distribution == 'integer':
+        return rng.integers(params['low'], params['high'], n)
+    else:
+        weights = params['weights']
+        if weights is not None:
+            weights = np.asarray(weights, dtype=np.float64) / np.sum(weights)
+        return np.asarray(params['values'], dtype=object)[rng.choice(len(params['values']), n, p=weights)]
+    if 'decimals' in feature:
+        values = values.round(feature['decimals'])
+    return values
+
+
+def _target(target: dict, numeric: list, rng: np.random.Generator, n: int) -> np.ndarray:
+    if target['function'] == 'linear':
+        values = target['intercept'] + sum(c * x for c, x in zip(target['coefficients'], numeric))
+    elif target['function'] == 'friedman':
+        # Friedman #1 over the first five numeric features
+        x = numeric
+        values = (target['intercept'] + 10 * np.sin(np.pi * x[0] * x[1]) + 20 * (x[2] - 0.5) ** 2
+                  + 10 * x[3] + 5 * x[4])
+    else:
+        values = np.full(n, float(target['intercept']))
+    if target['noise']:
+        values = values + rng.normal(0.0, target['noise'], n)
+    return values
+
+
+def generate_chunk(spec: SyntheticSpec, index: int) -> pa.Table:
+    """Rows ``[index * chunk_rows, ...)`` of the dataset, the same on every call"""
+    rng = np.random.default_rng([spec.seed, index])
+    n = min(spec.chunk_rows, spec.rows - index * spec.chunk_rows)
+    columns = {f['name']: _draw(f, rng, n) for f in spec.features}
+    if spec.target is not None:
+        numeric = [columns[f['name']] for f in spec.features if f['distribution'] != 'category']
+        columns['target'] = _target(spec.target, numeric, rng, n)
+
+    arrays = []
+    for field in spec.schema():
+        values = columns[field.name]
+        feature = next((f for f in spec.features if f['name'] == field.name), {})
+        rate = feature.get('null_rate', spec.null_rate)
+        mask = rng.random(n) < rate if feature and rate else None
+        arrays.append(pa.array(values, type=field.type, mask=mask))
+    table = pa.Table.from_arrays(arrays, schema=spec.schema())
+
+    duplicates = int(round(n * spec.duplicate_rate))
+    if duplicates:
+        # Overwrite some rows with copies of rows that are kept as they are
+        copies = np.zeros(n, dtype=bool)
+        copies[rng.choice(n, duplicates, replace=False)] = True
+        originals = np.flatnonzero(~copies)
+        indices = np.arange(n)
+        indices[copies] = originals[rng.integers(0, len(originals), duplicates)]
+        table = table.take(indices)
+    return table
+
+
+def _csv_chunk(task) -> bytes:
+    spec, index = task
+    sink = pa.BufferOutputStream()
+    pv.write_csv(generate_chunk(spec, index), sink, pv.WriteOptions(include_header=index == 0))
+    return sink.getvalue().to_pybytes()
+
+
+def _parquet_chunk(task) -> int:
+    spec, index, output_dir, layout = task
+    table = generate_chunk(spec, index)
+    path = os.path.join(output_dir, f'part-{index:06d}.parquet')
+    (layout or ParquetLayout()).write_table(table, path)
+    return table.num_rows
+
+
+def generate(spec: SyntheticSpec, output_path: str, workers: int = None, layout: ParquetLayout = None) -> dict:
+    """
+    Write the dataset to ``output_path``
+
+    Args:
+        spec: Dataset definition
+        output_path: A ``.csv`` file, or a directory to fill with one
+            Parquet part file per chunk (part files already there are
+            removed first)
+        workers: Process pool size (defaults to the CPU count)
+        layout: Parquet part layout (see ``etl.parquet_layout``)
+
+    Returns:
+        Dictionary with rows, chunks, bytes written, timing and rows/sec
+    """
+    workers = workers or os.cpu_count() or 1
+    is_csv = output_path.endswith('.csv')
+    if is_csv and layout is not None:
+        raise ValueError("A Parquet layout cannot apply to CSV output")
+    os.makedirs((os.path.dirname(output_path) if is_csv else output_path) or '.', exist_ok=True)
+    if not is_csv:
+        for name in os.listdir(output_path):
+            if name.startswith('part-'):
+                os.remove(os.path.join(output_path, name))
+    print(f"Generating {spec.rows:,} rows in {spec.num_chunks} chunks with {workers} workers...")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if is_csv:
+            with open(output_path, 'wb') as f:
+                # Submit a bounded window ahead of the writer to cap memory
+                window = 2 * workers
+                pending = [pool.submit(_csv_chunk, (spec, i)) for i in range(min(window, spec.num_chunks))]
+                for i in range(spec.num_chunks):
+                    f.write(pending.pop(0).result())
+                    if i + window < spec.num_chunks:
+                        pending.append(pool.submit(_csv_chunk, (spec, i + window)))
+            if not spec.num_chunks:
+                pv.write_csv(spec.schema().empty_table(), output_path)
+            bytes_written = os.path.getsize(output_path)
+        else:
+            tasks = [(spec, i, output_path, layout) for i in range(spec.num_chunks)]
+            list(pool.map(_parquet_chunk, tasks))
+            bytes_written = sum(os.path.getsize(os.path.join(output_path, name))
+                                for name in os.listdir(output_path) if name.startswith('part-'))
+    elapsed = time.perf_counter() - start
+
+    stats = {
+        'rows': spec.rows,
+        'chunks': spec.num_chunks,
+        'workers': workers,
+        'bytes_written': bytes_written,
+        'seconds': elapsed,
+        'rows_per_sec': spec.rows / elapsed if elapsed > 0 else 0.0
+    }
+    print(f"Wrote {spec.rows:,} rows ({bytes_written / 1e6:,.1f} MB) to {output_path} "
+          f"in {elapsed:.2f}s ({stats['rows_per_sec']:,.0f} rows/sec)")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic dataset")
+    parser.add_argument('output', help='CSV file, or directory for Parquet part files')
+    parser.add_argument('--spec', help='JSON file of SyntheticSpec arguments')
+    parser.add_argument('--rows', type=int, help='Rows to generate (overrides the spec)')
+    parser.add_argument('--features', type=int, help='Number of normal features (overrides the spec)')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--duplicate-rate', type=float)
+    parser.add_argument('--null-rate', type=float)
+    parser.add_argument('--target', choices=TARGET_FUNCTIONS)
+    parser.add_argument('--noise', type=float)
+    parser.add_argument('--chunk-rows', type=int)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--layout', help='JSON file of ParquetLayout settings for Parquet parts')
+    args = parser.parse_args()
+
+    settings = {'rows': 1_000_000, 'target': {}}
+    if args.spec:
+        with open(args.spec) as f:
+            settings.update(json.load(f))
+    for key in ('rows', 'features', 'seed', 'duplicate_rate', 'null_rate', 'chunk_rows'):
+        if getattr(args, key) is not None:
+            settings[key] = getattr(args, key)
+    if args.target is not None or args.noise is not None:
+        settings['target'] = dict(settings.get('target') or {})
+        if args.target is not None:
+            settings['target']['function'] = args.target
+        if args.noise is not None:
+            settings['target']['noise'] = args.noise
+
+    generate(SyntheticSpec.from_dict(settings), args.output, workers=args.workers,
+             layout=ParquetLayout.from_json(args.layout) if args.layout else None)
@@ -0,0 +1,382 @@
+"""
+Declarative, vectorized validation of ingested rows.
+
+Rules are declared per column (type, min/max, allowed null rate) or as
+expressions over columns, usually in a JSON file:
+
+    {
+      "columns": {
+        "feature1": {"type": "float64", "min": 0, "max": 1000, "max_null_rate": 0.01},
+        "target": {"type": "float64"}
+      },
+      "rules": [{"name": "feature2_covers_feature1", "expr": "feature2 >= feature1 * 0.5"}]
+    }
+
+Each record batch is checked with Arrow compute kernels as it streams
+through ingestion. Rows that fail go to a quarantine Parquet file with the
+reason code of the first failed check (``null:<col>``, ``type:<col>``,
+``range:<col>`` or ``rule:<name>``) and their row number in the source,
+instead of being silently dropped. Columns with a type rule are read as
+strings so a malformed value is quarantined rather than failing the CSV
+reader. Null rates are checked over the whole input once it has been read.
+"""
+import ast
+import json
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+REASON_COLUMN = '_reason'
+ROW_COLUMN = '_source_row'
+QUARANTINE_SUFFIX = '.quarantine.parquet'
+
+# Patterns a string must match to be cast to each type (after trimming)
+TYPE_PATTERNS = {
+    'int8': r'^[+-]?\d+$',
+    'int16': r'^[+-]?\d+$',
+    'int32': r'^[+-]?\d+$',
+    'int64': r'^[+-]?\d+$',
+    'float32': r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$|^[+-]?(inf|infinity)$',
+    'float64': r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$|^[+-]?(inf|infinity)$',
+    'bool': r'^(true|false|1|0)$',
+    'string': None,
+}
+
+# Integer strings with at most 19 significant digits, as many as int64 holds
+INTEGER_DIGITS = r'^[+-]?0*\d{1,19}$'
+
+# Tokens the CSV reader treats as null in typed columns
+NULL_TOKENS = pa.array(pv.ConvertOptions().null_values)
+
+_BINARY_OPS = {
+    ast.Add: pc.add, ast.Sub: pc.subtract, ast.Mult: pc.multiply, ast.Pow: pc.power,
+}
+_COMPARISONS = {
+    ast.Lt: pc.less, ast.LtE: pc.less_equal, ast.Gt: pc.greater, ast.GtE: pc.greater_equal,
+    ast.Eq: pc.equal, ast.NotEq: pc.not_equal,
+}
+_FUNCTIONS = {
+    'abs': pc.abs, 'sqrt': pc.sqrt, 'log': pc.ln, 'exp': pc.exp,
+    'is_null': pc.is_null, 'is_nan': pc.is_nan,
+}
+
+
+def quarantine_path_for(path: str) -> str:
+    """Quarantine path for an output (``x.parquet`` -> ``x.quarantine.parquet``)"""
+    return os.path.splitext(path)[0] + QUARANTINE_SUFFIX
+
+
+class Expression:
+    """
+    A rule expression over column names, evaluated with Arrow kernels
+
+    Supports arithmetic (``+ - * / **``), comparisons (chained too),
+    ``and`` / ``or`` / ``not``, numeric, string and boolean literals, and
+    the functions ``abs``, ``sqrt``, ``log``, ``exp``, ``is_null`` and
+    ``is_nan``.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        try:
+            self._tree = ast.parse(source, mode='eval').body
+        except SyntaxError as e:
+            raise ValueError(f"Invalid rule expression '{source}': {e.msg}") from e
+        self.columns = set()
+        self._check(self._tree)
+        if not self.columns:
+            raise ValueError(f"Rule expression '{source}' does not reference any column")
+
+    def _check(self, node):
+        if isinstance(node, ast.Name):
+            self.columns.add(node.id)
+        elif isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS or node.keywords:
+                raise ValueError(f"Unsupported function in rule '{self.source}'")
+            for arg in node.args:
+                self._check(arg)
+        elif isinstance(node, ast.BinOp) and (type(node.op) in _BINARY_OPS or isinstance(node.op, ast.Div)):
+            self._check(node.left)
+            self._check(node.right)
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.USub, ast.UAdd)):
+            self._check(node.operand)
+        elif isinstance(node, ast.BoolOp):
+            for value in node.values:
+                self._check(value)
+        elif isinstance(node, ast.Compare) and all(type(op) in _COMPARISONS for op in node.ops):
+            for child in [node.left, *node.comparators]:
+                self._check(child)
+        elif not (isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str, bool))):
+            raise ValueError(f"Unsupported syntax in rule '{self.source}': {ast.dump(node)}")
+
+    def evaluate(self, batch: pa.RecordBatch):
+        return self._eval(self._tree, batch)
+
+    def _eval(self, node, batch):
+        if isinstance(node, ast.Name):
+            return batch.column(node.id)
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, ast.Call):
+            return _FUNCTIONS[node.func.id](*(self._eval(arg, batch) for arg in node.args))
+        if isinstance(node, ast.BinOp):
+            left, right = self._eval(node.left, batch), self._eval(node.right, batch)
+            if isinstance(node.op, ast.Div):
+                # True division, as in Python, even for integer columns
+                return pc.divide(pc.cast(left, pa.float64()), right)
+            return _BINARY_OPS[type(node.op)](left, right)
+        if isinstance(node, ast.UnaryOp):
+            operand = self._eval(node.operand, batch)
+            if isinstance(node.op, ast.Not):
+                return pc.invert(operand)
+            return pc.negate(operand) if isinstance(node.op, ast.USub) else operand
+        if isinstance(node, ast.BoolOp):
+            combine = pc.and_kleene if isinstance(node.op, ast.And) else pc.or_kleene
+            result = self._eval(node.values[0], batch)
+            for value in node.values[1:]:
+                result = combine(result, self._eval(value, batch))
+            return result
+        # Chained comparison: a < b < c means a < b and b < c
+        result, left = None, self._eval(node.left, batch)
+        for op, comparator in zip(node.ops, node.comparators):
+            right = self._eval(comparator, batch)
+            step = _COMPARISONS[type(op)](left, right)
+            result = step if result is None else pc.and_kleene(result, step)
+            left = right
+        return result
+
+
+def _parse(column, type_name: str):
+    """
+    Cast a column to a declared type
+
+    Values that do not match the type's pattern, and integers out of the
+    type's range, are malformed.
+
+    Returns:
+        (typed column, mask of malformed values or None if there are none);
+        malformed values become null in the typed column
+    """
+    target = pa.type_for_alias(type_name)
+    try:
+        # Fast path: every value is well-formed
+        return pc.cast(column, target), None
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        if not pa.types.is_string(column.type):
+            raise
+    column = pc.utf8_trim_whitespace(column)
+    column = pc.if_else(pc.is_in(column, value_set=NULL_TOKENS), pa.scalar(None, pa.string()), column)
+    malformed = pc.fill_null(pc.invert(pc.match_substring_regex(column, TYPE_PATTERNS[type_name],
+                                                                ignore_case=True)), False)
+    if pa.types.is_integer(target):
+        # Compare as decimals, which hold every int64 exactly
+        info = np.iinfo(type_name)
+        fits = pc.fill_null(pc.match_substring_regex(column, INTEGER_DIGITS), False)
+        value = pc.cast(pc.if_else(fits, column, pa.scalar(None, pa.string())), pa.decimal128(19, 0))
+        in_range = pc.and_(fits, pc.fill_null(pc.and_(pc.greater_equal(value, int(info.min)),
+                                                      pc.less_equal(value, int(info.max))), False))
+        malformed = pc.or_(malformed, pc.and_(pc.is_valid(column), pc.invert(in_range)))
+    return pc.cast(pc.if_else(malformed, pa.scalar(None, pa.string()), column), target), malformed
+
+
+class Validator:
+    """
+    Row checks for a stream of record batches
+
+    Checks per column run in the order null, type, range; expression rules
+    run last. A rule whose expression evaluates to null (a null input) is
+    treated as passed, as SQL CHECK constraints are.
+
+    Attributes:
+        columns: Per-column rules: ``type`` (one of TYPE_PATTERNS), ``min``,
+            ``max`` (inclusive) and ``max_null_rate`` (fraction of rows)
+        rules: Expression rules as ``{"name": ..., "expr": ...}``
+        counts: Rows failing each check in the current run (a row may fail
+            several; its reason code names the first)
+        rows_checked: Rows seen in the current run
+    """
+
+    def __init__(self, columns: dict = None, rules: list = None):
+        self.columns = {name: dict(spec) for name, spec in (columns or {}).items()}
+        for name, spec in self.columns.items():
+            unknown = set(spec) - {'type', 'min', 'max', 'max_null_rate'}
+            if unknown:
+                raise ValueError(f"Unknown rule keys for column '{name}': {sorted(unknown)}")
+            if 'type' in spec and spec['type'] not in TYPE_PATTERNS:
+                raise ValueError(f"Unsupported type '{spec['type']}' for column '{name}', "
+                                 f"expected one of {sorted(TYPE_PATTERNS)}")
+        self.rules = [(rule['name'], Expression(rule['expr'])) for rule in (rules or [])]
+        self.reset()
+
+    def reset(self):
+        """Forget the counts and input schema of the previous run"""
+        self.counts = {}
+        self.null_counts = {}
+        self.rows_checked = 0
+        self._bound = None
+
+    @classmethod
+    def from_dict(cls, settings: dict) -> "Validator":
+        return cls(settings.get('columns'), settings.get('rules'))
+
+    @classmethod
+    def from_json(cls, path: str) -> "Validator":
+        """Load rules from a JSON file (see the module docstring for the format)"""
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def csv_column_types(self, schema: pa.Schema = None) -> pa.Schema:
+        """
+        Column types for the CSV reader: ``schema``'s, with every column
+        that has a type rule read as a string
+        """
+        fields = {field.name: field for field in (schema or [])}
+        for name, spec in self.columns.items():
+            if 'type' in spec:
+                fields[name] = pa.field(name, pa.string())
+        return pa.schema(list(fields.values()))
+
+    def output_schema(self, schema: pa.Schema) -> pa.Schema:
+        """Schema of the rows that pass: type-ruled columns take their declared type"""
+        self._check_columns(schema)
+        for name, spec in self.columns.items():
+            if 'type' in spec:
+                schema = schema.set(schema.get_field_index(name), pa.field(name, pa.type_for_alias(spec['type'])))
+        return schema
+
+    def quarantine_schema(self, schema: pa.Schema) -> pa.Schema:
+        """Schema of quarantined rows: the input as read plus reason and row number"""
+        return schema.append(pa.field(REASON_COLUMN, pa.string())).append(pa.field(ROW_COLUMN, pa.int64()))
+
+    def _check_columns(self, schema: pa.Schema):
+        referenced = set(self.columns).union(*(expr.columns for _, expr in self.rules))
+        missing = sorted(c for c in referenced if schema.get_field_index(c) < 0)
+        if missing:
+            raise ValueError(f"Validation rules reference columns not in the data: {missing}")
+
+    def _bind(self, schema: pa.Schema):
+        self._check_columns(schema)
+        self.null_counts = dict.fromkeys(schema.names, 0)
+        self._bound = schema
+
+    def check(self, batch: pa.RecordBatch):
+        """
+        Split one batch into passing and failing rows
+
+        Returns:
+            (valid, quarantined): the passing rows with type-ruled columns
+            cast, and the failing rows as read with their reason codes and
+            source row numbers (None if every row passed)
+        """
+        if self._bound is None:
+            self._bind(batch.schema)
+        first_row = self.rows_checked
+        self.rows_checked += batch.num_rows
+        reason = pa.nulls(batch.num_rows, pa.string())
+        failed = False
+
+        def flag(mask, code):
+            nonlocal reason, failed
+            count = pc.sum(mask).as_py()
+            if count:
+                self.counts[code] = self.counts.get(code, 0) + count
+                reason = pc.coalesce(reason, pc.if_else(mask, code, pa.scalar(None, pa.string())))
+                failed = True
+
+        # Every null is reported, whether or not its column has a null rate limit
+        columns = {}
+        for name in batch.schema.names:
+            column = batch.column(name)
+            spec = self.columns.get(name, {})
+            malformed = None
+            if spec.get('type'):
+                column, malformed = _parse(column, spec['type'])
+            nulls = pc.is_null(column, nan_is_null=True)
+            if malformed is not None:
+                # Malformed values were set to null; they are reported as type failures
+                nulls = pc.and_(nulls, pc.invert(malformed))
+            null_count = pc.sum(nulls).as_py() or 0
+            self.null_counts[name] += null_count
+            if null_count:
+                flag(nulls, f'null:{name}')
+            if malformed is not None:
+                flag(malformed, f'type:{name}')
+            if 'min' in spec:
+                flag(pc.less(column, spec['min']), f'range:{name}')
+            if 'max' in spec:
+                flag(pc.greater(column, spec['max']), f'range:{name}')
+            columns[name] = column
+
+        typed = pa.RecordBatch.from_arrays(list(columns.values()), names=list(columns))
+        for name, expression in self.rules:
+            flag(pc.invert(pc.fill_null(expression.evaluate(typed), True)), f'rule:{name}')
+
+        if not failed:
+            return typed, None
+        passed = pc.is_null(reason)
+        quarantined = batch.filter(pc.invert(passed))
+        rows = pc.filter(pa.array(np.arange(first_row, first_row + batch.num_rows)), pc.invert(passed))
+        quarantined = pa.RecordBatch.from_arrays(
+            quarantined.columns + [pc.drop_null(reason), rows],
+            schema=self.quarantine_schema(batch.schema))
+        return typed.filter(passed), quarantined
+
+    def null_rates(self) -> dict:
+        return {name: count / self.rows_checked if self.rows_checked else 0.0
+                for name, count in self.null_counts.items()}
+
+    def summary(self) -> dict:
+        """Rows checked, failures per reason code and null rates over limit"""
+        rates = self.null_rates()
+        over = {name: rates[name] for name, spec in self.columns.items()
+                if 'max_null_rate' in spec and rates.get(name, 0.0) > spec['max_null_rate']}
+        return {
+            'rows_checked': self.rows_checked,
+            'failures': dict(self.counts),
+            'null_rates_exceeded': over
+        }
+
+
+def validated_batches(batches, validator: Validator, quarantine_path: str, summary: dict):
+    """
+    Pass the rows of each batch that validate, writing the rest to
+    ``quarantine_path`` (created only if a row fails; a file left there by
+    an earlier run is removed first)
+
+    The validator is reset first, so counts, null rates and source row
+    numbers cover this stream only. ``summary`` is filled in with
+    :meth:`Validator.summary` and the
+    quarantine path and row count once the batches are exhausted. Raises
+    ValueError at that point if a column's null rate is over its limit.
+    """
+    if os.path.exists(quarantine_path):
+        os.remove(quarantine_path)
+    validator.reset()
+    writer = None
+    quarantined_rows = 0
+    try:
+        for batch in batches:
+            valid, quarantined = validator.check(batch)
+            if quarantined is not None:
+                if writer is None:
+                    writer = pq.ParquetWriter(quarantine_path, quarantined.schema)
+                writer.write_batch(quarantined)
+                quarantined_rows += quarantined.num_rows
+            if valid.num_rows:
+                yield valid
+    finally:
+        if writer is not None:
+            writer.close()
+
+    summary.update(validator.summary())
+    summary['rows_quarantined'] = quarantined_rows
+    summary['quarantine_path'] = quarantine_path if writer is not None else None
+    if quarantined_rows:
+        print(f"Quarantined {quarantined_rows} of {summary['rows_checked']} rows to {quarantine_path}: "
+              + ", ".join(f"{code}={count}" for code, count in sorted(summary['failures'].items())))
+    if summary['null_rates_exceeded']:
+        raise ValueError(f"Null rate over limit: {summary['null_rates_exceeded']}")
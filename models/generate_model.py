@@ -1,10 +1,18 @@
 import os
+import sys
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 import joblib
 
+# Add repository root to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deployment.app.compact_forest import export_compact_forest
+from deployment.app.feature_transform import transform_path_for
+from deployment.app.grid_surrogate import GridSurrogate
+
 def generate_sample_data():
     """Generate synthetic sample data"""
     np.random.seed(42)
@@ -25,7 +33,31 @@ def generate_sample_data():
     
     return pd.DataFrame(data)
 
-def train_and_save_model(output_path='models/saved_model.pkl'):
+def build_surrogate(model, X_train, X_test, output_path, resolution=256, mode='nearest'):
+    """
+    Precompute a lookup-table surrogate of the model and report its accuracy
+    
+    The table spans the training feature ranges; the test split is the
+    held-out set for the error and latency figures saved with it.
+    """
+    print(f"Building {mode} lookup-table surrogate ({resolution} points per feature)...")
+    surrogate = GridSurrogate.build(
+        model.predict, X_train.to_numpy(), resolution=resolution, mode=mode,
+        feature_names=list(X_train.columns)
+    )
+    report = surrogate.validate(X_test.to_numpy(), model.predict)
+    surrogate.save(output_path)
+    
+    print(f"Surrogate saved to: {output_path} ({os.path.getsize(output_path) / 1024:.2f} KB)")
+    print(f"  Held-out rows in grid: {report['holdout_rows']}")
+    print(f"  Max abs error:  {report['max_abs_error']:.4f}")
+    print(f"  Mean abs error: {report['mean_abs_error']:.4f}")
+    print(f"  Latency per row: exact {report['exact_us_per_row']:.2f} us, "
+          f"lookup {report['lookup_us_per_row']:.2f} us")
+    
+    return surrogate
+
+def train_and_save_model(output_path='models/saved_model.pkl', with_surrogate=False):
     """Train a simple model and save it"""
     
     print("Generating sample dataset...")
@@ -65,7 +97,25 @@ def train_and_save_model(output_path='models/saved_model.pkl'):
     print(f"\nModel saved to: {output_path}")
     print(f"Model file size: {os.path.getsize(output_path) / 1024:.2f} KB")
     
+    # Export the compact serving artifact, verified against the test split
+    compact_path = os.path.splitext(output_path)[0] + '.npz'
+    compact = export_compact_forest(model, compact_path, X_check=X_test)
+    
+    print(f"Compact model saved to: {compact_path}")
+    print(f"Compact file size: {os.path.getsize(compact_path) / 1024:.2f} KB")
+    print(f"Compact node data in memory: {compact.nbytes / 1024:.2f} KB")
+    
+    # Trained on raw features: a transform sidecar from an earlier model must not scale its inputs
+    transform_path = transform_path_for(output_path)
+    if os.path.exists(transform_path):
+        os.remove(transform_path)
+        print(f"Removed stale feature transform {transform_path}")
+    
+    # Optional O(1) lookup table; served only when PULSEFLOW_SURROGATE_PATH is set
+    if with_surrogate:
+        build_surrogate(model, X_train, X_test, os.path.splitext(output_path)[0] + '.grid.npz')
+    
     return model
 
 if __name__ == "__main__":
-    train_and_save_model()
+    train_and_save_model(with_surrogate='--surrogate' in sys.argv)
@@ -0,0 +1,110 @@
+import os
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from etl.keyed_dataset import KeyedDataset, is_keyed_dataset
+
+def _filter_columns(filters) -> list:
+    """Columns referenced by ``pq.read_table`` style filters (flat or nested lists)"""
+    if not filters:
+        return []
+    conjunctions = filters if isinstance(filters[0], list) else [filters]
+    return sorted({name for conjunction in conjunctions for name, _, _ in conjunction})
+
+def open_dataset(data_path: str) -> ds.Dataset:
+    """A Parquet file or a (hive-partitioned) directory of Parquet files"""
+    if not os.path.exists(data_path):
+        raise FileNotFoundError(f"Data not found at {data_path}")
+    return ds.dataset(data_path, format='parquet', partitioning='hive')
+
+def default_feature_columns(dataset: ds.Dataset, target: str = 'target') -> list:
+    """Numeric columns other than the target, in schema order"""
+    return [field.name for field in dataset.schema
+            if field.name != target
+            and (pa.types.is_integer(field.type) or pa.types.is_floating(field.type))]
+
+def scan_bytes(dataset: ds.Dataset, columns: list, filter_expression=None) -> dict:
+    """
+    Bytes of Parquet column chunks a scan must read, from file footers
+
+    Files excluded by partition values and row groups excluded by min/max
+    statistics are skipped, as are columns outside ``columns`` (which must
+    include any column the filter reads).
+
+    Returns:
+        Dictionary with ``bytes_read`` for the scan, ``bytes_total`` for the
+        whole dataset, and the row groups read out of the total
+    """
+    stats = {'bytes_read': 0, 'bytes_total': 0, 'row_groups_read': 0, 'row_groups_total': 0}
+    selected = set()
+    for fragment in dataset.get_fragments(filter=filter_expression):
+        for row_group in fragment.split_by_row_group(filter_expression, schema=dataset.schema):
+            selected.add((fragment.path, row_group.row_groups[0].id))
+
+    for fragment in dataset.get_fragments():
+        metadata = fragment.metadata
+        names = metadata.schema.to_arrow_schema().names
+        wanted = [names.index(c) for c in set(columns) if c in names]
+        for i in range(metadata.num_row_groups):
+            row_group = metadata.row_group(i)
+            total = sum(row_group.column(j).total_compressed_size for j in range(row_group.num_columns))
+            stats['bytes_total'] += total
+            stats['row_groups_total'] += 1
+            if (fragment.path, i) in selected:
+                stats['bytes_read'] += sum(row_group.column(j).total_compressed_size for j in wanted)
+                stats['row_groups_read'] += 1
+    return stats
+
+def read_training_data(data_path: str, columns: list = None, filters=None, target: str = 'target'):
+    """
+    Load features and target, pushing column selection and row filters down
+    to the Parquet reader
+
+    Only the requested columns are decoded, and files or row groups whose
+    partition values or min/max statistics rule out the filter are never
+    read. A keyed dataset (see ``etl.keyed_dataset``) is read as of its
+    latest snapshot, merging upserts on read. The filter then applies to
+    the merged rows, and the reported bytes include every row group.
+
+    Args:
+        data_path: Parquet file, partitioned dataset directory or keyed
+            dataset directory
+        columns: Feature columns; defaults to every numeric non-target column
+        filters: Row filter as ``pq.read_table`` style tuples, e.g.
+            ``[('ingest_date', '>=', '2025-01-01')]``; may reference
+            columns that are not features
+        target: Target column name
+
+    Returns:
+        Tuple of (features DataFrame, target Series, scan statistics, with
+        the ``snapshot`` version read for a keyed dataset)
+    """
+    snapshot = KeyedDataset(data_path).snapshot() if is_keyed_dataset(data_path) else None
+    dataset = snapshot.dataset() if snapshot is not None else open_dataset(data_path)
+    if target not in dataset.schema.names:
+        raise ValueError(f"Target column '{target}' not found in dataset")
+    features = list(columns) if columns is not None else default_feature_columns(dataset, target)
+    if columns is None and snapshot is not None:
+        # Keys identify rows; they are not features
+        features = [c for c in features if c not in snapshot.key]
+    missing = [c for c in features + _filter_columns(filters) if c not in dataset.schema.names]
+    if missing:
+        raise ValueError(f"Columns not found in dataset: {missing}")
+
+    expression = pq.filters_to_expression(filters) if filters else None
+    if snapshot is None:
+        stats = scan_bytes(dataset, features + [target] + _filter_columns(filters), expression)
+        df = dataset.to_table(columns=features + [target], filter=expression).to_pandas()
+    else:
+        # Merging needs the key, and every row group is read before filtering
+        read = list(dict.fromkeys(features + [target] + _filter_columns(filters)))
+        stats = scan_bytes(dataset, read + snapshot.key)
+        stats['snapshot'] = snapshot.version
+        df = snapshot.to_table(read, expression).to_pandas()
+    stats['rows'] = len(df)
+
+    print(f"Read {stats['rows']} rows, {len(features)} feature columns: "
+          f"{stats['bytes_read']:,} of {stats['bytes_total']:,} bytes "
+          f"({stats['row_groups_read']}/{stats['row_groups_total']} row groups)")
+    return df[features], df[target], stats
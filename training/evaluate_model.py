@@ -1,12 +1,27 @@
 import os
-import pandas as pd
+import sys
 import joblib
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 import json
 
-def evaluate_model(model_path: str, data_path: str, output_metrics_path: str = 'models/metrics.json'):
+# Add repository root to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl.stage_cache import StageCache, run_stage
+from training.data_reader import read_training_data
+
+def evaluate_model(model_path: str, data_path: str, output_metrics_path: str = 'models/metrics.json',
+                   columns: list = None, filters=None):
     """
     Evaluate a trained model and save metrics
+
+    Args:
+        model_path: Pickled model
+        data_path: Parquet file or partitioned dataset directory
+        output_metrics_path: Where to write the metrics JSON
+        columns: Feature columns to read (default: the model's training
+            features, else all numeric non-target columns)
+        filters: Row filters pushed down to the Parquet reader
     """
     if not os.path.exists(model_path):
         raise FileNotFoundError(f"Model not found at {model_path}")
@@ -18,13 +33,9 @@ def evaluate_model(model_path: str, data_path: str, output_metrics_path: str = '
     model = joblib.load(model_path)
 
     print(f"Loading evaluation data from {data_path}...")
-    df = pd.read_parquet(data_path)
-
-    if 'target' not in df.columns:
-        raise ValueError("Target column 'target' not found in dataset")
-
-    X = df.drop('target', axis=1)
-    y = df['target']
+    if columns is None and hasattr(model, 'feature_names_in_'):
+        columns = list(model.feature_names_in_)
+    X, y, read_stats = read_training_data(data_path, columns=columns, filters=filters)
 
     print(f"Evaluating model on {len(X)} samples...")
     y_pred = model.predict(X)
@@ -39,7 +50,9 @@ def evaluate_model(model_path: str, data_path: str, output_metrics_path: str = '
         'mse': float(mse),
         'mae': float(mae),
         'rmse': float(rmse),
-        'r2_score': float(r2)
+        'r2_score': float(r2),
+        'data_bytes_read': read_stats['bytes_read'],
+        'data_bytes_total': read_stats['bytes_total']
     }
 
     print("\nEvaluation Results:")
@@ -62,4 +75,8 @@ if __name__ == "__main__":
     DATA_PATH = 'data/processed.parquet'
     METRICS_OUTPUT_PATH = 'models/metrics.json'
 
-    evaluate_model(MODEL_PATH, DATA_PATH, METRICS_OUTPUT_PATH)
+    # With --cache, an unchanged model and dataset reuse the saved metrics
+    run_stage('evaluation', lambda: evaluate_model(MODEL_PATH, DATA_PATH, METRICS_OUTPUT_PATH),
+              inputs=[MODEL_PATH, DATA_PATH],
+              outputs=[METRICS_OUTPUT_PATH],
+              cache=StageCache() if '--cache' in sys.argv else None)
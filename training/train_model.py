@@ -1,5 +1,5 @@
 import os
-import pandas as pd
+import sys
 import mlflow
 import mlflow.sklearn
 from sklearn.ensemble import RandomForestRegressor
@@ -7,27 +7,36 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 import joblib
 
+# Add repository root to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deployment.app.compact_forest import export_compact_forest
+from deployment.app.feature_transform import FeatureTransform, transform_path_for
+from etl.stage_cache import StageCache, run_stage
+from training.data_reader import read_training_data
+
 # MLflow tracking configuration
 MLFLOW_TRACKING_URI = os.getenv('MLFLOW_TRACKING_URI', 'http://localhost:5000')
 mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
 mlflow.set_experiment("enterprise_mlops_training")
 
-def train_model(data_path: str, model_output_path: str):
+def train_model(data_path: str, model_output_path: str, columns: list = None, filters=None):
     """
     Train a Random Forest model with MLflow tracking
+
+    Args:
+        data_path: Processed Parquet file or partitioned dataset directory
+        model_output_path: Where to save the pickled model
+        columns: Feature columns to read (default: all numeric non-target columns)
+        filters: Row filters pushed down to the Parquet reader, e.g.
+            ``[('ingest_date', '>=', '2025-01-01')]``
     """
     if not os.path.exists(data_path):
         raise FileNotFoundError(f"Processed data not found at {data_path}")
 
     print(f"Loading processed data from {data_path}...")
-    df = pd.read_parquet(data_path)
-
-    # Separate features and target
-    if 'target' not in df.columns:
-        raise ValueError("Target column 'target' not found in dataset")
-
-    X = df.drop('target', axis=1)
-    y = df['target']
+    # Only the needed columns and row groups are read from disk
+    X, y, read_stats = read_training_data(data_path, columns=columns, filters=filters)
 
     print(f"Dataset shape: {X.shape}")
 
@@ -67,6 +76,10 @@ def train_model(data_path: str, model_output_path: str):
 
         # Log parameters and metrics to MLflow
         mlflow.log_params(params)
+        mlflow.log_param("feature_columns", ",".join(X.columns))
+        mlflow.log_param("row_filters", str(filters))
+        mlflow.log_metric("data_bytes_read", read_stats['bytes_read'])
+        mlflow.log_metric("data_bytes_total", read_stats['bytes_total'])
         mlflow.log_metric("mse", mse)
         mlflow.log_metric("mae", mae)
         mlflow.log_metric("r2_score", r2)
@@ -83,10 +96,36 @@ def train_model(data_path: str, model_output_path: str):
         joblib.dump(model, model_output_path)
         print(f"Model saved to {model_output_path}")
 
+        # Export the NumPy-only serving artifact, verified on the test split
+        compact_path = os.path.splitext(model_output_path)[0] + '.npz'
+        export_compact_forest(model, compact_path, X_check=X_test)
+        mlflow.log_artifact(compact_path, artifact_path="compact_model")
+        print(f"Compact serving model saved to {compact_path}")
+
+        # Ship the preprocessing transform with the model so serving scales
+        # raw inputs exactly as the training data was scaled; without one, a
+        # sidecar left by an earlier model would scale this model's inputs
+        data_transform_path = transform_path_for(data_path)
+        model_transform_path = transform_path_for(model_output_path)
+        if os.path.exists(data_transform_path):
+            FeatureTransform.load(data_transform_path).bound_to(list(X.columns)).save(model_transform_path)
+            mlflow.log_artifact(model_transform_path, artifact_path="compact_model")
+            print(f"Feature transform saved to {model_transform_path}")
+        elif os.path.exists(model_transform_path):
+            os.remove(model_transform_path)
+            print(f"Removed stale feature transform {model_transform_path}")
+
         return model, mse, mae, r2
 
 if __name__ == "__main__":
     DATA_PATH = 'data/processed.parquet'
     MODEL_OUTPUT_PATH = 'models/saved_model.pkl'
 
-    train_model(DATA_PATH, MODEL_OUTPUT_PATH)
+    # With --cache, an unchanged dataset and training code restore the saved
+    # model instead of retraining (and logging another MLflow run)
+    data_transform = transform_path_for(DATA_PATH)
+    run_stage('training', lambda: train_model(DATA_PATH, MODEL_OUTPUT_PATH)[1:],
+              inputs=[DATA_PATH] + ([data_transform] if os.path.exists(data_transform) else []),
+              outputs=[MODEL_OUTPUT_PATH, os.path.splitext(MODEL_OUTPUT_PATH)[0] + '.npz',
+                       transform_path_for(MODEL_OUTPUT_PATH)],
+              cache=StageCache() if '--cache' in sys.argv else None)